@@ -0,0 +1,104 @@
+# benchmarks/bench_comparators.py
+#
+# Per-swap cost of compare_economic_factors: the old per-field key scan
+# versus the compiled per-product comparators.
+#
+# Run from backend/:  python -m benchmarks.bench_comparators
+
+import argparse
+import json
+import random
+import timeit
+
+from validators import swap_validator, cross_currency, amortised_swaps
+
+
+def legacy_compare(validator, current_swap, reference_swap):
+    """compare_economic_factors as it was before comparators were compiled"""
+    schedule_fields = getattr(validator, "SCHEDULE_FIELDS", [])
+    anomalies = []
+    for field in validator.ECONOMIC_FIELDS:
+        current_field = next((k for k in current_swap.keys() if k.lower() == field.lower()), field)
+        reference_field = next((k for k in reference_swap.keys() if k.lower() == field.lower()), field)
+
+        if field in schedule_fields:
+            cur_val = current_swap.get(current_field, "")
+            ref_val = reference_swap.get(reference_field, "")
+            if isinstance(cur_val, str) and (cur_val.startswith('[') or cur_val.startswith('{')):
+                try:
+                    cur_val = json.loads(cur_val)
+                except:
+                    pass
+            if isinstance(ref_val, str) and (ref_val.startswith('[') or ref_val.startswith('{')):
+                try:
+                    ref_val = json.loads(ref_val)
+                except:
+                    pass
+            if isinstance(cur_val, (list, dict)) and isinstance(ref_val, (list, dict)):
+                cur_val_str = json.dumps(cur_val, sort_keys=True)
+                ref_val_str = json.dumps(ref_val, sort_keys=True)
+            else:
+                cur_val_str = str(cur_val).strip()
+                ref_val_str = str(ref_val).strip()
+        else:
+            cur_val_str = str(current_swap.get(current_field, "")).strip()
+            ref_val_str = str(reference_swap.get(reference_field, "")).strip()
+
+        if cur_val_str != ref_val_str:
+            anomalies.append({
+                "field": field,
+                "current_value": cur_val_str,
+                "reference_value": ref_val_str,
+                "issue": f"Mismatch in {field}",
+                "severity": "high" if field in validator.HIGH_SEVERITY_FIELDS else "medium"
+            })
+    return anomalies
+
+
+def random_value(field):
+    if field in ("reduction_dates",):
+        return json.dumps([f"2026-{m:02d}-01" for m in range(1, 13)])
+    if field in ("reduction_amounts",):
+        return json.dumps([100000] * 12)
+    return random.choice([1000000, 0.0425, "2025-01-15", " SOFR ", "Quarterly", "ACT/360"])
+
+
+def make_pair(validator, extra_keys):
+    reference = {"tradeId": "SWAP1"}
+    current = {"TradeId": "SWAP1", "derivative_type": "x"}
+    for field in validator.ECONOMIC_FIELDS:
+        reference[field] = random_value(field)
+        current[field.upper() if random.random() < 0.3 else field] = (
+            reference[field] if random.random() < 0.7 else random_value(field)
+        )
+    # Termsheets carry plenty of fields that are not economic factors
+    for i in range(extra_keys):
+        current[f"Extra Field {i}"] = f"value {i}"
+    return current, reference
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--swaps", type=int, default=2000)
+    parser.add_argument("--extra-keys", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    for validator in (swap_validator, cross_currency, amortised_swaps):
+        pairs = [make_pair(validator, args.extra_keys) for _ in range(args.swaps)]
+        for current, reference in pairs:
+            assert legacy_compare(validator, current, reference) == validator.compare_economic_factors(current, reference)
+
+        before = min(timeit.repeat(
+            lambda: [legacy_compare(validator, c, r) for c, r in pairs], number=1, repeat=5
+        ))
+        after = min(timeit.repeat(
+            lambda: [validator.compare_economic_factors(c, r) for c, r in pairs], number=1, repeat=5
+        ))
+        name = validator.__name__.split(".")[-1]
+        print(f"{name:16s} before {before / args.swaps * 1e6:7.1f} us/swap   "
+              f"after {after / args.swaps * 1e6:7.1f} us/swap   ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
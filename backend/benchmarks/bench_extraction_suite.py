@@ -0,0 +1,235 @@
+# benchmarks/bench_extraction_suite.py
+#
+# Throughput, latency and memory of every extraction path on a synthetic
+# corpus (benchmarks/corpus.py): PDFExtractor on termsheet PDFs (text and
+# layout modes, with and without early exit), the email body parser from
+# fetch_and_send_text, and the MarkItDown conversion that
+# extraction_routes.process_termsheet runs before its LLM calls. Each stage
+# runs in its own process so peak RSS is per stage.
+#
+# Results can be stored as a baseline and later runs compared against it:
+#
+#   Run from backend/:  python -m benchmarks.bench_extraction_suite --docs 60 --pages 8 --save-baseline
+#                       python -m benchmarks.bench_extraction_suite --docs 60 --pages 8 --compare
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import MANIFEST_FILE, load_corpus, write_corpus
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(BACKEND_DIR, "benchmarks", "baselines", "extraction_suite.json")
+
+STAGES = ["pdf", "pdf_early_exit", "pdf_layout", "pdf_layout_early_exit", "email", "markitdown"]
+
+# Relative change that counts as a regression when comparing to a baseline
+TOLERANCE = 0.20
+
+# (metric, higher is better) compared against the baseline
+COMPARED_METRICS = [("docs_per_sec", True), ("p50_ms", False), ("p99_ms", False), ("peak_rss_mb", False)]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * fraction // 1))
+    return sorted_values[int(rank) - 1]
+
+
+def field_scores(extracted, expected):
+    """(fields found, fields with the exact value) over the generated fields"""
+    found = sum(field in extracted for field in expected)
+    exact = sum(extracted.get(field) == value for field, value in expected.items())
+    return found, exact
+
+
+def stage_runner(stage):
+    """Returns run(entry, path) -> extracted pairs, or None when extracted text is not pairs"""
+    if stage.startswith("pdf"):
+        from pdf_kv import PDFExtractor
+        extractor = PDFExtractor(setup_directories=False, early_exit=stage.endswith("early_exit"),
+                                 layout=stage.startswith("pdf_layout"))
+        return lambda entry, path: extractor.extract_all_kv_pairs(entry["pdf"], save_to_file=False)[0]
+
+    if stage == "email":
+        from fetch_and_send_text import clean_and_extract_relevant_text, extract_key_value_pairs
+        return lambda entry, path: extract_key_value_pairs(clean_and_extract_relevant_text(entry["body"]))
+
+    if stage == "markitdown":
+        # process_termsheet converts the file first, then classifies and
+        # extracts with the LLM; only the conversion is local work
+        from markitdown import MarkItDown
+        md = MarkItDown(enablePlugins=False)
+
+        def convert(entry, path):
+            md.convert(path).text_content
+            return None
+        return convert
+
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def run_stage(stage, corpus_dir, repeat):
+    """Runs one stage in this process and returns its measurements"""
+    corpus = load_corpus(corpus_dir)
+    documents = corpus["documents"]
+    try:
+        run = stage_runner(stage)
+    except ImportError as e:
+        return {"skipped": f"{e.name or e} is not installed"}
+
+    # Warm up imports and caches on one document
+    run(documents[0], os.path.join(corpus_dir, documents[0]["filename"]))
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    latencies = []
+    found = exact = total_fields = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for entry in documents:
+            path = os.path.join(corpus_dir, entry["filename"])
+            doc_start = time.perf_counter()
+            extracted = run(entry, path)
+            latencies.append(time.perf_counter() - doc_start)
+            if extracted is not None:
+                doc_found, doc_exact = field_scores(extracted, entry["expected"])
+                found += doc_found
+                exact += doc_exact
+                total_fields += len(entry["expected"])
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    latencies.sort()
+    return {
+        "docs": len(latencies),
+        "seconds": round(elapsed, 4),
+        "docs_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+        "rss_growth_mb": round((peak_kb - baseline_kb) / 1024, 1),
+        "fields_found": round(found / total_fields, 4) if total_fields else None,
+        "fields_exact": round(exact / total_fields, 4) if total_fields else None
+    }
+
+
+def run_stage_subprocess(stage, corpus_dir, repeat):
+    command = [sys.executable, "-m", "benchmarks.bench_extraction_suite",
+               "--worker", stage, "--corpus", corpus_dir, "--repeat", str(repeat)]
+    output = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout
+    line = next(line for line in output.splitlines() if line.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def corpus_config(corpus_dir):
+    with open(os.path.join(corpus_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return {"docs": manifest["docs"], "pages": manifest["pages"], "seed": manifest["seed"]}
+
+
+def machine_info():
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def compare(results, baseline, tolerance):
+    """Prints the change of each metric against the baseline; returns the regressions"""
+    regressions = []
+    for stage, result in results.items():
+        before = baseline["stages"].get(stage)
+        if "skipped" in result or not before or "skipped" in before:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS:
+            if not before.get(metric):
+                continue
+            change = (result[metric] - before[metric]) / before[metric]
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > tolerance else ""
+            print(f"  {stage:22} {metric:13} {before[metric]:>10} -> {result[metric]:>10}  {change:+7.1%} {flag}")
+            if flag:
+                regressions.append((stage, metric, change))
+        for metric in ("fields_found", "fields_exact"):
+            if before.get(metric) is not None and result[metric] != before[metric]:
+                print(f"  {stage:22} {metric:13} {before[metric]:>10} -> {result[metric]:>10}  extraction output changed")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=60)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--corpus", help="reuse a corpus written by benchmarks.corpus")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--worker", choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print("RESULT", json.dumps(run_stage(args.worker, args.corpus, args.repeat)))
+        return
+
+    work_dir = None
+    corpus_dir = args.corpus
+    try:
+        if corpus_dir is None:
+            work_dir = tempfile.mkdtemp()
+            corpus_dir = work_dir
+            write_corpus(corpus_dir, args.docs, args.pages, args.seed)
+        config = corpus_config(corpus_dir)
+        config["repeat"] = args.repeat
+
+        print(f"{config['docs']} termsheets x {config['pages']} pages, {args.repeat} repeat(s)")
+        print(f"{'stage':22} {'docs/sec':>9} {'p50 ms':>9} {'p99 ms':>9} {'peak RSS':>9} {'found':>7} {'exact':>7}")
+        results = {}
+        for stage in args.stages:
+            result = run_stage_subprocess(stage, corpus_dir, args.repeat)
+            results[stage] = result
+            if "skipped" in result:
+                print(f"{stage:22} skipped: {result['skipped']}")
+                continue
+            found = f"{result['fields_found']:.1%}" if result["fields_found"] is not None else "-"
+            exact = f"{result['fields_exact']:.1%}" if result["fields_exact"] is not None else "-"
+            print(f"{stage:22} {result['docs_per_sec']:9.1f} {result['p50_ms']:9.2f} {result['p99_ms']:9.2f} "
+                  f"{result['peak_rss_mb']:7.1f}MB {found:>7} {exact:>7}")
+
+        if args.compare:
+            if not os.path.exists(args.baseline):
+                print(f"No baseline at {args.baseline}; run with --save-baseline first")
+                sys.exit(1)
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+            if baseline["config"] != config:
+                print(f"Warning: baseline was recorded with {baseline['config']}")
+            if baseline["machine"] != machine_info():
+                print(f"Warning: baseline was recorded on {baseline['machine']}")
+            print(f"\nCompared with {args.baseline}:")
+            regressions = compare(results, baseline, args.tolerance)
+            if regressions:
+                print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+                sys.exit(1)
+
+        if args.save_baseline:
+            os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+            with open(args.baseline, "w", encoding="utf-8") as f:
+                json.dump({"machine": machine_info(), "config": config, "stages": results}, f, indent=2)
+            print(f"\nBaseline saved to {args.baseline}")
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
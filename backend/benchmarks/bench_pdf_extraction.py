@@ -0,0 +1,150 @@
+# benchmarks/bench_pdf_extraction.py
+#
+# Pages/sec of PDFExtractor key-value extraction on multi-page termsheets:
+# the old per-key regex searches versus the single precompiled pass, and
+# reading every page versus the early-exit mode.
+#
+# Run from backend/:  python -m benchmarks.bench_pdf_extraction --docs 20 --pages 12 [--page-budget N]
+
+import argparse
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+import fitz
+
+from pdf_kv import PDFExtractor
+
+
+def legacy_page_pairs(extractor, text, all_kv_pairs):
+    """The page loop of extract_all_kv_pairs before the patterns were precompiled"""
+    for section, keys in extractor.sections.items():
+        for key in keys:
+            patterns = [
+                rf"{key}:?\s*([^•\n]+)",
+                rf"[•]\s*{key}:?\s*([^•\n]+)",
+                rf"{key}\s*=\s*([^•\n]+)"
+            ]
+
+            for pattern in patterns:
+                match = re.search(pattern, text, re.IGNORECASE)
+                if match:
+                    value = match.group(1).strip()
+                    if value and len(value) > 1:
+                        all_kv_pairs[key] = value
+                        break
+
+    additional_pairs = re.findall(r'[•]\s*([^:]+):\s*([^•\n]+)', text)
+    for key, value in additional_pairs:
+        key = key.strip()
+        value = value.strip()
+        if key and value and len(value) > 1 and key not in all_kv_pairs:
+            all_kv_pairs[key] = value
+
+
+def termsheet_pages(extractor, doc_index, pages, rng):
+    """Page texts: the terms on the first page, then long schedules and legal boilerplate"""
+    lines = [f"TERM SHEET {doc_index}", f"Trade ID: TRADE-{doc_index:06d}"]
+    for section, keys in extractor.sections.items():
+        lines.append(section)
+        for key in keys:
+            lines.append(f"• {key}: {key.split()[0]}-{rng.randint(100, 999)}")
+    texts = ["\n".join(lines)]
+    for page in range(1, pages):
+        body = [f"Schedule {page}"]
+        for row in range(45):
+            body.append(f"{row + 1}. Period {row + 1} accrual of notional at the agreed rate, "
+                        f"payable in arrears subject to the business day convention")
+        texts.append("\n".join(body))
+    return texts
+
+
+def write_corpus(directory, extractor, docs, pages):
+    rng = random.Random(7)
+    paths = []
+    for i in range(docs):
+        doc = fitz.open()
+        for text in termsheet_pages(extractor, i, pages, rng):
+            page = doc.new_page()
+            page.insert_text((40, 40), text, fontsize=7)
+        path = os.path.join(directory, f"termsheet_{i}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def page_texts(paths):
+    texts = []
+    for path in paths:
+        with fitz.open(path) as doc:
+            texts.append([page.get_text() for page in doc])
+    return texts
+
+
+def run(extract, extractor, documents, repeat):
+    best = float("inf")
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = []
+        for pages in documents:
+            pairs = {}
+            for text in pages:
+                extract(extractor, text, pairs)
+            results.append(pairs)
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--page-budget", type=int, default=None)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+        # PDFExtractor creates files/, metadata/ and blobs/ in the working directory
+        os.chdir(work_dir)
+        extractor = PDFExtractor()
+        paths = write_corpus(work_dir, extractor, args.docs, args.pages)
+        documents = page_texts(paths)
+        total_pages = sum(len(pages) for pages in documents)
+
+        legacy_time, legacy_results = run(legacy_page_pairs, extractor, documents, args.repeat)
+        compiled_time, compiled_results = run(PDFExtractor.extract_page_pairs, extractor, documents, args.repeat)
+        assert legacy_results == compiled_results, "compiled extraction changed the output"
+
+        start = time.perf_counter()
+        for path in paths:
+            extractor.extract_all_kv_pairs(path, save_to_file=False)
+        end_to_end = time.perf_counter() - start
+
+        early = PDFExtractor(setup_directories=False, early_exit=True, page_budget=args.page_budget)
+        pages_skipped = 0
+        start = time.perf_counter()
+        for path in paths:
+            early.extract_all_kv_pairs(path, save_to_file=False)
+            pages_skipped += early.last_extraction_stats["pages_skipped"]
+        early_exit = time.perf_counter() - start
+
+        print(f"{args.docs} termsheets, {total_pages} pages")
+        print(f"per-key regex searches: {total_pages / legacy_time:10.0f} pages/sec")
+        print(f"single compiled pass:   {total_pages / compiled_time:10.0f} pages/sec")
+        print(f"speedup:                {legacy_time / compiled_time:10.1f}x")
+        print(f"end to end (with fitz): {total_pages / end_to_end:10.0f} pages/sec, {end_to_end * 1000:.0f} ms")
+        print(f"early exit (with fitz): {total_pages / early_exit:10.0f} pages/sec, {early_exit * 1000:.0f} ms, "
+              f"{pages_skipped}/{total_pages} pages skipped, {(end_to_end - early_exit) * 1000:.0f} ms saved")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
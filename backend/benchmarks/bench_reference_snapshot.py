@@ -0,0 +1,84 @@
+# benchmarks/bench_reference_snapshot.py
+#
+# Time-to-first-validation for a fresh worker, parsing risk_system.xlsx
+# versus memory-mapping its columnar snapshot.
+#
+# Run from backend/:  python -m benchmarks.bench_reference_snapshot --rows 100000
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import pandas as pd
+
+from validators.swap_validator import ECONOMIC_FIELDS
+from validators.reference_snapshot import snapshot_root
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = """
+import time
+start = time.perf_counter()
+import validators.swap_validator as swap_validator
+swap_validator.RISK_FILE = {risk_file!r}
+result, status = swap_validator.validate_swap_against_risk_file({{"tradeId": {trade_id!r}}})
+print("ELAPSED", time.perf_counter() - start, status)
+"""
+
+
+def generate_workbook(path, rows):
+    data = {"tradeId": [f"SWAP{i:08d}" for i in range(rows)]}
+    for field in ECONOMIC_FIELDS:
+        if field == "notional_amount":
+            data[field] = [1_000_000 + i for i in range(rows)]
+        elif field == "fixed_rate":
+            data[field] = [round(0.01 + (i % 500) / 10000, 4) for i in range(rows)]
+        elif field.endswith("_date"):
+            data[field] = [f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}" for i in range(rows)]
+        else:
+            data[field] = [f"{field}-{i % 7}" for i in range(rows)]
+    pd.DataFrame(data).to_excel(path, sheet_name="interest_risk_swap", index=False)
+
+
+def first_validation(risk_file, trade_id):
+    code = WORKER.format(risk_file=risk_file, trade_id=trade_id)
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    line = next(l for l in output.splitlines() if l.startswith("ELAPSED"))
+    return float(line.split()[1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        risk_file = os.path.join(work_dir, "risk_system.xlsx")
+        print(f"Generating workbook with {args.rows} rows...")
+        generate_workbook(risk_file, args.rows)
+        trade_id = f"SWAP{args.rows - 1:08d}"
+
+        xlsx_times = []
+        snapshot_times = []
+        for _ in range(args.repeat):
+            shutil.rmtree(snapshot_root(risk_file), ignore_errors=True)
+            xlsx_times.append(first_validation(risk_file, trade_id))
+            snapshot_times.append(first_validation(risk_file, trade_id))
+
+        xlsx_best = min(xlsx_times)
+        snapshot_best = min(snapshot_times)
+        print(f"xlsx path (parse + write snapshot): {xlsx_best:.3f}s")
+        print(f"snapshot path (mmap):               {snapshot_best:.3f}s")
+        print(f"speedup:                            {xlsx_best / snapshot_best:.1f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_streaming_loader.py
+#
+# Peak memory and time to load a large risk sheet with the old loader
+# (pandas.read_excel of every column) versus the streaming read-only loader
+# that keeps only tradeId and the economic fields.
+#
+# Run from backend/:  python -m benchmarks.bench_streaming_loader --rows 200000
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from openpyxl import Workbook
+
+from validators.swap_validator import ECONOMIC_FIELDS, SHEET_NAME
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Columns a real risk extract carries that the validators never compare
+EXTRA_COLUMNS = [f"{name}_{i}" for i in range(4) for name in ("counterparty", "book", "trader", "comment", "pv")]
+
+WORKER = """
+import json, resource, time, tracemalloc
+import pandas as pd
+from validators.reference_data import find_trade_id_column
+from validators.streaming_loader import load_sheets
+from validators.swap_validator import ECONOMIC_FIELDS
+
+baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if {trace!r}:
+    tracemalloc.start()
+start = time.perf_counter()
+if {loader!r} == "pandas":
+    df = pd.read_excel({risk_file!r}, sheet_name={sheet!r})
+    rows = len(df)
+else:
+    columns, data = load_sheets({risk_file!r}, [{sheet!r}], {{{sheet!r}: ECONOMIC_FIELDS}}, find_trade_id_column)[{sheet!r}]
+    rows = len(data[columns[0]])
+elapsed = time.perf_counter() - start
+traced_peak = tracemalloc.get_traced_memory()[1] if {trace!r} else float("nan")
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print("RESULT", json.dumps({{"rows": rows, "seconds": elapsed, "traced_mb": traced_peak / 2**20, "rss_mb": (peak_kb - baseline_kb) / 1024}}))
+"""
+
+
+def generate_workbook(path, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET_NAME)
+    sheet.append(["tradeId"] + ECONOMIC_FIELDS + EXTRA_COLUMNS)
+    for i in range(rows):
+        values = [f"SWAP{i:08d}"]
+        for field in ECONOMIC_FIELDS:
+            if field == "notional_amount":
+                values.append(1_000_000 + i)
+            elif field == "fixed_rate":
+                values.append(round(0.01 + (i % 500) / 10000, 4))
+            elif field.endswith("_date"):
+                values.append(f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}")
+            else:
+                values.append(f"{field}-{i % 7}")
+        for col, name in enumerate(EXTRA_COLUMNS):
+            values.append(i * 0.37 + col if name.startswith("pv") else f"{name}-{i % 97}")
+        sheet.append(values)
+    workbook.save(path)
+
+
+def measure(loader, risk_file, trace):
+    code = WORKER.format(loader=loader, risk_file=risk_file, sheet=SHEET_NAME, trace=trace)
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    line = next(l for l in output.splitlines() if l.startswith("RESULT"))
+    return json.loads(line[len("RESULT"):])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="also report Python-level allocation peaks (slows both loaders down a lot)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        risk_file = os.path.join(work_dir, "risk_system.xlsx")
+        print(f"Generating workbook with {args.rows} rows x {1 + len(ECONOMIC_FIELDS) + len(EXTRA_COLUMNS)} columns...")
+        generate_workbook(risk_file, args.rows)
+        print(f"Workbook size: {os.path.getsize(risk_file) / 2**20:.1f} MB")
+
+        results = {loader: measure(loader, risk_file, args.tracemalloc) for loader in ("pandas", "streaming")}
+        print(f"{'loader':<12}{'rows':>10}{'seconds':>10}{'traced MB':>12}{'peak RSS MB':>14}")
+        for loader, result in results.items():
+            print(f"{loader:<12}{result['rows']:>10}{result['seconds']:>10.2f}"
+                  f"{result['traced_mb']:>12.1f}{result['rss_mb']:>14.1f}")
+        print(f"peak RSS reduction: {results['pandas']['rss_mb'] / max(results['streaming']['rss_mb'], 0.1):.1f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# benchmarks/corpus.py
+#
+# Synthetic termsheets for the extraction benchmarks: a PDF and a termsheet
+# email per trade, cycling through every product in DERIVATIVE_PARAMETERS,
+# with the PDFExtractor section fields on every document and legal and
+# schedule pages padding each PDF to the requested length.
+#
+# Run from backend/:  python -m benchmarks.corpus --out /tmp/corpus --docs 60 --pages 8
+
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+import fitz
+
+from derivative_parameters import DERIVATIVE_PARAMETERS
+from pdf_kv import PDFExtractor
+
+MANIFEST_FILE = "corpus.json"
+
+# The section fields PDFExtractor looks for
+SECTIONS = PDFExtractor(setup_directories=False).sections
+
+# Text layout of the generated pages (A4, 9pt Helvetica)
+FONT_SIZE = 9
+LINES_PER_PAGE = 60
+MARGIN = (50, 60)
+LINE_SPACING = 1.25
+
+CURRENCIES = ["USD", "EUR", "GBP", "JPY", "CHF", "AUD"]
+BANKS = ["Northbridge Capital", "Helvetia Markets", "Kite Street Bank", "Meridian Securities", "Orchard Trust"]
+FLOATING_INDICES = ["SOFR", "EURIBOR 6M", "SONIA", "TONA", "SARON"]
+FREQUENCIES = ["Monthly", "Quarterly", "Semi-Annual", "Annual"]
+DAY_COUNTS = ["ACT/360", "ACT/365", "30/360", "ACT/ACT"]
+
+BOILERPLATE = [
+    "This term sheet is indicative and for discussion purposes only",
+    "and does not constitute an offer to enter into any transaction",
+    "Final terms will be set out in the confirmation, which will prevail",
+    "in the event of any inconsistency with this summary of terms",
+    "Each party represents that it is acting for its own account",
+    "and has made its own independent decision to enter into the trade",
+    "Payments are subject to the applicable business day convention",
+    "This document is governed by the laws of England and Wales",
+]
+
+# Section fields whose generated value depends on the field name
+VALUE_STYLES = [
+    ("Date", "date"), ("Maturity", "date"), ("Notional", "amount"), ("Principal", "amount"),
+    ("Amount", "amount"), ("Value", "amount"), ("Fee", "amount"), ("Charges", "amount"),
+    ("Premium", "amount"), ("Rate Index", "index"), ("Rate", "rate"), ("Price", "price"),
+    ("Currency Pair", "pair"), ("Currency", "currency"), ("Frequency", "frequency"),
+    ("Day Count", "day_count"), ("Counterparty", "bank"), ("Buyer", "bank"), ("Seller", "bank"),
+    ("Broker", "bank"), ("Quantity", "quantity"),
+]
+
+
+def field_value(field, rng):
+    """A plausible value for a termsheet field, chosen by its name"""
+    style = next((style for marker, style in VALUE_STYLES if marker in field), "text")
+    if style == "date":
+        return (date(2025, 1, 1) + timedelta(days=rng.randint(0, 3650))).isoformat()
+    if style == "amount":
+        return f"{rng.choice(CURRENCIES)} {rng.randint(1, 500) * 100_000:,}"
+    if style == "rate":
+        return f"{rng.randint(5, 900) / 100}%"
+    if style == "price":
+        return f"{rng.choice(CURRENCIES)} {rng.randint(10, 9000) / 10}"
+    if style == "index":
+        return rng.choice(FLOATING_INDICES)
+    if style == "pair":
+        return "/".join(rng.sample(CURRENCIES, 2))
+    if style == "currency":
+        return rng.choice(CURRENCIES)
+    if style == "frequency":
+        return rng.choice(FREQUENCIES)
+    if style == "day_count":
+        return rng.choice(DAY_COUNTS)
+    if style == "bank":
+        return rng.choice(BANKS)
+    if style == "quantity":
+        return f"{rng.randint(1, 900) * 100:,}"
+    return f"{field.split()[0]} {rng.choice(['Standard', 'European', 'Physical', 'Cash', 'Fixed'])} {rng.randint(1, 99)}"
+
+
+def termsheet_terms(index, product, rng):
+    """(trade_id, {section: {field: value}}) for one trade"""
+    trade_id = f"TRADE-{index:06d}"
+    sections = {}
+    seen = set()
+    for section, keys in SECTIONS.items():
+        sections[section] = {key: field_value(key, rng) for key in keys}
+        seen.update(keys)
+    sections[f"{product} Terms"] = {
+        field: field_value(field, rng) for field in DERIVATIVE_PARAMETERS[product] if field not in seen
+    }
+    return trade_id, sections
+
+
+def termsheet_pages(trade_id, product, sections, pages, rng):
+    """Page texts: the terms first, then schedules and boilerplate up to `pages`"""
+    lines = [f"{product.upper()} TERM SHEET", f"Trade ID: {trade_id}", f"Product: {product}", ""]
+    for section, fields in sections.items():
+        lines.append(section)
+        lines.extend(f"• {field}: {value}" for field, value in fields.items())
+        lines.append("")
+
+    texts = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)]
+    page = len(texts)
+    while len(texts) < pages:
+        page += 1
+        body = [f"Schedule {page - 1}"]
+        for row in range(LINES_PER_PAGE // 2):
+            body.append(f"Period {row + 1} from {field_value('Date', rng)} "
+                        f"accrual on {field_value('Notional', rng)}")
+        body.extend(rng.sample(BOILERPLATE, 4))
+        texts.append(body)
+    return ["\n".join(text) for text in texts]
+
+
+def render_pdf(page_texts):
+    # TextWriter embeds the font, so "•" survives text extraction; the
+    # base-14 insert_text path turns it into "·"
+    font = fitz.Font("helv")
+    doc = fitz.open()
+    for text in page_texts:
+        page = doc.new_page()
+        writer = fitz.TextWriter(page.rect)
+        x, y = MARGIN
+        for line in text.split("\n"):
+            writer.append((x, y), line, font=font, fontsize=FONT_SIZE)
+            y += FONT_SIZE * LINE_SPACING
+        writer.write_text(page)
+    payload = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return payload
+
+
+def termsheet_email(trade_id, product, sections, rng):
+    """(subject, body) of a termsheet email, with a signature and quoted reply to strip"""
+    subject = f"Termsheet {trade_id} - {product}"
+    lines = ["Hi team,", "", f"Please find the termsheet details below for our {product}:", "",
+             f"Trade ID: {trade_id}"]
+    for fields in sections.values():
+        lines.extend(f"{field}: {value}" for field, value in fields.items())
+    lines += ["", "Let us know if anything needs amending.", "", "Best regards,", rng.choice(BANKS),
+              "-- ", "Sent from the trading desk", "", "> Previous message:", "> Trade ID: TRADE-000000"]
+    return subject, "\n".join(lines)
+
+
+def generate(docs, pages, seed=7):
+    """
+    Yields one dict per trade: trade_id, product, pdf (bytes), subject,
+    body and the expected {field: value} pairs, products taken in turn.
+    """
+    rng = random.Random(seed)
+    products = list(DERIVATIVE_PARAMETERS)
+    for index in range(docs):
+        product = products[index % len(products)]
+        trade_id, sections = termsheet_terms(index + 1, product, rng)
+        subject, body = termsheet_email(trade_id, product, sections, rng)
+        expected = {"Trade ID": trade_id}
+        for fields in sections.values():
+            expected.update(fields)
+        yield {
+            "trade_id": trade_id,
+            "product": product,
+            "pdf": render_pdf(termsheet_pages(trade_id, product, sections, pages, rng)),
+            "subject": subject,
+            "body": body,
+            "expected": expected
+        }
+
+
+def write_corpus(directory, docs, pages, seed=7):
+    """Writes <trade_id>.pdf files and corpus.json (emails and expected fields)"""
+    os.makedirs(directory, exist_ok=True)
+    entries = []
+    for document in generate(docs, pages, seed):
+        filename = f"{document['trade_id']}.pdf"
+        with open(os.path.join(directory, filename), "wb") as f:
+            f.write(document["pdf"])
+        entries.append({
+            "filename": filename,
+            "trade_id": document["trade_id"],
+            "product": document["product"],
+            "subject": document["subject"],
+            "body": document["body"],
+            "expected": document["expected"]
+        })
+    manifest = {"docs": docs, "pages": pages, "seed": seed, "documents": entries}
+    with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return manifest
+
+
+def load_corpus(directory):
+    """The corpus manifest with each document's PDF bytes under "pdf" """
+    with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    for entry in manifest["documents"]:
+        with open(os.path.join(directory, entry["filename"]), "rb") as f:
+            entry["pdf"] = f.read()
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--docs", type=int, default=60)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    manifest = write_corpus(args.out, args.docs, args.pages, args.seed)
+    products = sorted({entry["product"] for entry in manifest["documents"]})
+    print(f"Wrote {args.docs} termsheets ({args.pages} pages) and emails to {args.out} "
+          f"covering {len(products)} products")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# backend/blob_store.py
+#
+# Content-addressed store for ingested documents. A document is kept once,
+# as blobs/<aa>/<sha256>, under however many names it arrives; the index
+# (blobs/index.sqlite) records every (collection, filename, sha256) a name
+# has held, so a same-named document supersedes the earlier one without
+# replacing it. Blobs are reference counted by those rows. The hash is
+# computed while a document is read into memory, so a duplicate is known
+# before anything is extracted; the document is extracted from those bytes
+# and its blob file is written afterwards by a single writer thread, off the
+# request. Each blob remembers the version its first extraction produced; a
+# blob with a version is never deleted, as it is the original of that
+# version.
+#
+# Collections name where a document came from: uploads (/upload), downloads
+# (mail attachments) and files (the batch folder, stored only when a file is
+# extracted).
+#
+#   python blob_store.py      # dedup stats
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from json_store import write_atomic
+
+BLOB_DIR = "blobs"
+INDEX_FILE = "index.sqlite"
+CHUNK_SIZE = 1 << 20
+
+UPLOADS = "uploads"
+DOWNLOADS = "downloads"
+FILES = "files"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    trade_id TEXT,
+    version INTEGER
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS names (
+    collection TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    stored_at TEXT NOT NULL,
+    superseded_at TEXT,
+    PRIMARY KEY (collection, filename, sha256)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stats (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# puts: documents stored; hits: those whose content was already there;
+# bytes_saved: their size, neither written nor extracted again
+COUNTERS = ("puts", "hits", "bytes_received", "bytes_saved")
+
+# A document is checked for a recorded extraction, extracted and recorded
+# under its hash's stripe, so copies ingested at once (an upload, a mail
+# attachment, the batch) produce a single version
+_extraction_locks = [threading.Lock() for _ in range(64)]
+
+# One writer thread for blob files: they are written once, in order
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="blob-writer")
+
+
+def extraction_lock(sha256):
+    return _extraction_locks[int(sha256[:8], 16) % len(_extraction_locks)]
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    """Hashes a file in place, without storing it"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_hashed(stream, chunk_size=CHUNK_SIZE):
+    """Reads a binary stream into memory, hashing it as it goes; returns (bytes, sha256)"""
+    digest = hashlib.sha256()
+    payload = bytearray()
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        digest.update(chunk)
+        payload += chunk
+    return bytes(payload), digest.hexdigest()
+
+
+class BlobStore:
+    """
+    Documents under root, stored once per SHA-256. put() returns the blob
+    as {"sha256", "size", "path", "duplicate", "trade_id", "version"};
+    duplicate is whether the content was already stored, and trade_id /
+    version are set once an extraction of it has been recorded. The file at
+    path is written in the background; flush() waits for it.
+    """
+
+    def __init__(self, root=BLOB_DIR):
+        self.root = root
+        self.path = os.path.join(root, INDEX_FILE)
+        os.makedirs(root, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """A write transaction; blob files are only created or deleted inside one"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def put(self, collection, filename, source, sha256=None, chunk_size=CHUNK_SIZE):
+        """
+        Stores source (bytes, or a binary file object read into memory) as
+        collection/filename; sha256 may be given for bytes hashed already.
+        Content already stored is not written again.
+        """
+        if hasattr(source, "read"):
+            source, sha256 = read_hashed(source, chunk_size)
+        elif sha256 is None:
+            sha256 = hashlib.sha256(source).hexdigest()
+        size = len(source)
+        path = self.blob_path(sha256)
+        now = datetime.now().isoformat()
+
+        with self._transaction() as conn:
+            row = conn.execute("SELECT * FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            duplicate = row is not None
+            if not duplicate:
+                conn.execute("INSERT INTO blobs (sha256, size, refs, created_at) VALUES (?, ?, 0, ?)",
+                             (sha256, size, now))
+            self._link(conn, collection, filename, sha256, now)
+            self._count(conn, puts=1, bytes_received=size,
+                        hits=1 if duplicate else 0, bytes_saved=size if duplicate else 0)
+
+        if not os.path.exists(path):
+            future = _writer.submit(self._write_blob, sha256, bytes(source))
+
+            def report_failure(done):
+                if done.exception() is not None:
+                    print(f"Error storing {collection}/{filename}: {done.exception()}")
+
+            future.add_done_callback(report_failure)
+
+        return {"sha256": sha256, "size": size, "path": path, "duplicate": duplicate,
+                "trade_id": row["trade_id"] if duplicate else None,
+                "version": row["version"] if duplicate else None}
+
+    def _write_blob(self, sha256, payload):
+        """Writes a blob file on the writer thread, unless it was written or dropped meanwhile"""
+        path = self.blob_path(sha256)
+        with self._transaction() as conn:
+            if os.path.exists(path):
+                return
+            if conn.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,)).fetchone() is None:
+                return
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, payload)
+
+    def flush(self):
+        """Waits until every blob file queued so far is on disk"""
+        _writer.submit(lambda: None).result()
+
+    def _link(self, conn, collection, filename, sha256, now):
+        """Makes sha256 the name's current content; what it held before stays in its history"""
+        current = conn.execute(
+            "SELECT sha256 FROM names WHERE collection = ? AND filename = ? AND superseded_at IS NULL",
+            (collection, filename)
+        ).fetchone()
+        if current is not None and current["sha256"] == sha256:
+            return
+        if current is not None:
+            conn.execute("UPDATE names SET superseded_at = ? WHERE collection = ? AND filename = ? AND sha256 = ?",
+                         (now, collection, filename, current["sha256"]))
+        held_before = conn.execute("SELECT 1 FROM names WHERE collection = ? AND filename = ? AND sha256 = ?",
+                                   (collection, filename, sha256)).fetchone()
+        if held_before is not None:
+            conn.execute("UPDATE names SET stored_at = ?, superseded_at = NULL "
+                         "WHERE collection = ? AND filename = ? AND sha256 = ?", (now, collection, filename, sha256))
+        else:
+            conn.execute("INSERT INTO names (collection, filename, sha256, stored_at) VALUES (?, ?, ?, ?)",
+                         (collection, filename, sha256, now))
+            conn.execute("UPDATE blobs SET refs = refs + 1 WHERE sha256 = ?", (sha256,))
+
+    def _release(self, conn, sha256):
+        conn.execute("UPDATE blobs SET refs = refs - 1 WHERE sha256 = ?", (sha256,))
+        row = conn.execute("SELECT refs, trade_id FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        # The original of an extracted version is kept for audit
+        if row["refs"] <= 0 and row["trade_id"] is None:
+            conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+            try:
+                os.remove(self.blob_path(sha256))
+            except FileNotFoundError:
+                pass
+
+    def _count(self, conn, **increments):
+        conn.executemany(
+            "INSERT INTO stats (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+            list(increments.items())
+        )
+
+    def add_file(self, collection, filename, path, sha256):
+        """
+        Stores a file already hashed in place as collection/filename. Content
+        the store holds is only linked to the name, not read again.
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT size FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is not None and os.path.exists(self.blob_path(sha256)):
+                self._link(conn, collection, filename, sha256, datetime.now().isoformat())
+                self._count(conn, puts=1, hits=1, bytes_received=row["size"], bytes_saved=row["size"])
+                return
+        with open(path, "rb") as f:
+            self.put(collection, filename, f)
+
+    def remove(self, collection, filename):
+        """
+        Drops a name and its history; a blob goes once nothing references it
+        and no version was extracted from it. Returns whether the name existed.
+        """
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT sha256 FROM names WHERE collection = ? AND filename = ?",
+                                (collection, filename)).fetchall()
+            conn.execute("DELETE FROM names WHERE collection = ? AND filename = ?", (collection, filename))
+            for row in rows:
+                self._release(conn, row["sha256"])
+            return bool(rows)
+
+    def resolve(self, collection, filename):
+        """The blob collection/filename holds now, or None"""
+        history = self.history(collection, filename)
+        return history[-1] if history and history[-1]["superseded_at"] is None else None
+
+    def history(self, collection, filename):
+        """Every blob the name has held, oldest first, with when it was stored and superseded"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT b.*, n.stored_at, n.superseded_at FROM names n JOIN blobs b ON b.sha256 = n.sha256 "
+                "WHERE n.collection = ? AND n.filename = ? "
+                "ORDER BY n.superseded_at IS NULL, n.superseded_at, n.stored_at", (collection, filename)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [{**dict(row), "path": self.blob_path(row["sha256"])} for row in rows]
+
+    def result(self, sha256):
+        """{"trade_id", "version"} recorded for a blob's extraction, or None"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT trade_id, version FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        finally:
+            conn.close()
+        if row is None or row["trade_id"] is None:
+            return None
+        return dict(row)
+
+    def record_result(self, sha256, trade_id, version):
+        """Remembers the version extracted from a blob, so its duplicates are not extracted again"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE blobs SET trade_id = ?, version = ? WHERE sha256 = ?", (trade_id, version, sha256))
+
+    def clear_results(self):
+        """Forgets every recorded extraction, e.g. once the metadata tree is rebuilt"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE blobs SET trade_id = NULL, version = NULL")
+
+    def stats(self):
+        """Dedup hit rate, bytes saved and what the store holds"""
+        conn = self._connect()
+        try:
+            counters = {row["key"]: row["value"] for row in conn.execute("SELECT key, value FROM stats")}
+            blobs, stored = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            names = conn.execute("SELECT COUNT(*) FROM names WHERE superseded_at IS NULL").fetchone()[0]
+        finally:
+            conn.close()
+        stats = {counter: counters.get(counter, 0) for counter in COUNTERS}
+        stats["hit_rate"] = round(stats["hits"] / stats["puts"], 4) if stats["puts"] else None
+        stats.update(blobs=blobs, names=names, bytes_stored=stored)
+        return stats
+
+
+if __name__ == "__main__":
+    print(json.dumps(BlobStore().stats(), indent=2))
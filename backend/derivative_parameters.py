@@ -0,0 +1,42 @@
+# backend/derivative_parameters.py
+#
+# The parameters extracted for each derivative type. Kept apart from
+# extraction_routes so code that only needs the table does not pull in the
+# LLM client and the database.
+
+# Define the characteristic parameters for each derivative type
+DERIVATIVE_PARAMETERS = {
+    "Interest Rate Swap": [
+        "Effective Date", "Termination Date/Maturity", "Notional Amount", 
+        "Fixed Rate", "Floating Rate Index", "Payment Frequency", 
+        "Day Count Convention", "Reset Dates", "Discount Curve", 
+        "Counterparty Details"
+    ],
+    "Cross Currency Swap": [
+        "Effective Date", "Termination Date", "Notional Amount (Currency 1)", 
+        "Notional Amount (Currency 2)", "Exchange Rate", "Fixed Rate (Currency 1)", 
+        "Fixed Rate (Currency 2)", "Payment Frequency", "Day Count Convention", 
+        "Initial Exchange", "Final Exchange", "Counterparty Details"
+    ],
+    "Amortised Schedule Swap": [
+        "Effective Date", "Termination Date", "Initial Notional Amount", 
+        "Amortization Schedule", "Fixed Rate", "Floating Rate Index", 
+        "Payment Frequency", "Day Count Convention", "Reset Dates", 
+        "Counterparty Details"
+    ],
+    "Money Market Deposit": [
+        "Value Date", "Maturity Date", "Principal Amount", "Currency", 
+        "Interest Rate", "Day Count Convention", "Interest Payment Date", 
+        "Counterparty Details"
+    ],
+    "Single Spread Options": [
+        "Trade Date", "Option Style", "Option Type", "Expiry Date", 
+        "Strike Price", "Underlying", "Notional Amount", "Premium", 
+        "Settlement Method", "Counterparty Details"
+    ],
+    "FX Digital": [
+        "Trade Date", "Expiry Date", "Settlement Date", "Currency Pair", 
+        "Strike Rate", "Notional Amount", "Payout Amount", "Payout Currency", 
+        "Barrier Type", "Counterparty Details"
+    ]
+}
@@ -1,35 +1,32 @@
 from imap_tools import MailBox, AND
-import requests
 import os
 from dotenv import load_dotenv
+from ingest import deliver_pdfs
 
 load_dotenv()
 
 EMAIL = os.getenv("EMAIL") 
 PASSWORD = os.getenv("EMAIL_PASSWORD")
 IMAP_SERVER = os.getenv("IMAP_SERVER")
-UPLOAD_URL = os.getenv("FLASK_SERVER_URL")
 
-DOWNLOAD_DIR = "files"
-os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+def pdf_attachments(msg):
+    return [att for att in msg.attachments if att.filename.endswith('.pdf')]
 
-def send_to_flask(file_path):
-    with open(file_path, 'rb') as f:
-        files = {'file': (os.path.basename(file_path), f, 'application/pdf')}
-        response = requests.post(UPLOAD_URL, files=files)
-        print(f"Sent {file_path} → {response.status_code} | {response.text}")
+def send_pdf_attachments(msg):
+    """Hands every PDF attached to msg to the pipeline (ingest); returns (count delivered, bytes)"""
+    attachments = pdf_attachments(msg)
+    for att in attachments:
+        print(f"Downloaded: {att.filename}")
+    # The attachments go out from memory; the pipeline keeps the originals
+    outcomes = deliver_pdfs([(att.filename, att.payload) for att in attachments])
+    sent = sum(1 for outcome in outcomes if outcome is not None)
+    return sent, sum(len(att.payload) for att in attachments)
 
 def fetch_and_send_pdfs():
     print("Fetching and sending PDFs...")
     with MailBox(IMAP_SERVER).login(EMAIL, PASSWORD, 'INBOX') as mailbox:
         for msg in mailbox.fetch(AND(seen=False)):
-            for att in msg.attachments:
-                if att.filename.endswith('.pdf'):
-                    filepath = os.path.join(DOWNLOAD_DIR, att.filename)
-                    with open(filepath, 'wb') as f:
-                        f.write(att.payload)
-                    print(f"Downloaded: {att.filename}")
-                    send_to_flask(filepath)
+            send_pdf_attachments(msg)
 
 # if __name__ == "__main__":
 #     fetch_and_send_pdfs()
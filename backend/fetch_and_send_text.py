@@ -1,43 +1,30 @@
 from imap_tools import MailBox, AND 
-import requests 
 import os 
 import re 
-import json
 from datetime import datetime
 import shutil
 from dotenv import load_dotenv 
+from ingest import deliver_text
+from json_store import store
+from version_history import VersionHistory
+from version_index import VersionIndex
  
 load_dotenv() 
  
 EMAIL = os.getenv("EMAIL")  
 PASSWORD = os.getenv("EMAIL_PASSWORD") 
 IMAP_SERVER = os.getenv("IMAP_SERVER") 
-UPLOAD_TEXT_URL = os.getenv("FLASK_TEXT_UPLOAD_URL")   
 
 class EmailExtractor:
     def __init__(self):
         self.metadata_dir = "email_metadata"
         self._create_directories()
+        self.history = VersionHistory(self.metadata_dir, VersionIndex(self.metadata_dir), "subject")
         
     def _create_directories(self):
         if not os.path.exists(self.metadata_dir):
             os.makedirs(self.metadata_dir)
     
-    def _get_trade_folder(self, trade_id):
-        trade_folder = os.path.join(self.metadata_dir, trade_id)
-        if not os.path.exists(trade_folder):
-            os.makedirs(trade_folder)
-            os.makedirs(os.path.join(trade_folder, "versions"))
-        return trade_folder
-    
-    def _get_next_version(self, trade_folder):
-        versions_folder = os.path.join(trade_folder, "versions")
-        existing_versions = [f for f in os.listdir(versions_folder) if f.startswith("v")]
-        if not existing_versions:
-            return 1
-        latest_version = max([int(v.replace("v", "").split("_")[0]) for v in existing_versions])
-        return latest_version + 1
-    
     def extract_trade_id(self, key_value_pairs, subject):
         # First try to find Trade ID in the key-value pairs
         for key, value in key_value_pairs.items():
@@ -56,74 +43,21 @@ class EmailExtractor:
         # Extract trade ID from data or generate one
         trade_id = self.extract_trade_id(key_value_pairs, subject)
         
-        trade_folder = self._get_trade_folder(trade_id)
-        current_version = self._get_next_version(trade_folder)
-        
-        version_info = {
+        status, current_version = self.history.save(trade_id, key_value_pairs, subject,
+                                                     f"{subject.replace(' ', '_')}.json")
+        if status == "updated":
+            message = f"Updated to version {current_version} for Trade ID: {trade_id}"
+        else:
+            message = f"Created version {current_version} for Trade ID: {trade_id}"
+        return {
+            "status": status,
+            "trade_id": trade_id,
             "version": current_version,
-            "timestamp": datetime.now().isoformat(),
-            "subject": subject,
-            "data": key_value_pairs
+            "message": message
         }
-        
-        terms_file = os.path.join(trade_folder, "extracted_terms.json")
-        version_file = os.path.join(trade_folder, "versions", f"v{current_version}_{subject.replace(' ', '_')}.json")
-        changes_file = os.path.join(trade_folder, "changes.json")
-        
-        if os.path.exists(terms_file):
-            with open(terms_file, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-            
-            differences = {
-                "version": current_version,
-                "timestamp": version_info["timestamp"],
-                "added": {},
-                "removed": {},
-                "modified": {}
-            }
-            
-            for key, value in existing_data["data"].items():
-                if key in key_value_pairs:
-                    if value != key_value_pairs[key]:
-                        differences["modified"][key] = {
-                            "old": value,
-                            "new": key_value_pairs[key]
-                        }
-                else:
-                    differences["removed"][key] = value
-            
-            for key, value in key_value_pairs.items():
-                if key not in existing_data["data"]:
-                    differences["added"][key] = value
-            
-            # Save changes
-            self.save_to_json(differences, changes_file)
-            
-            # Save new version
-            self.save_to_json(version_info, version_file)
-            self.save_to_json(version_info, terms_file)
-            
-            return {
-                "status": "updated",
-                "trade_id": trade_id,
-                "version": current_version,
-                "message": f"Updated to version {current_version} for Trade ID: {trade_id}"
-            }
-        else:
-            # First version
-            self.save_to_json(version_info, version_file)
-            self.save_to_json(version_info, terms_file)
-            
-            return {
-                "status": "created",
-                "trade_id": trade_id,
-                "version": current_version,
-                "message": f"Created version {current_version} for Trade ID: {trade_id}"
-            }
     
     def save_to_json(self, data, output_file):
-        with open(output_file, "w", encoding="utf-8") as json_file:
-            json.dump(data, json_file, indent=4, ensure_ascii=False)
+        store.write(output_file, data)
 
 def clean_and_extract_relevant_text(body_text): 
     """ 
@@ -165,37 +99,37 @@ def extract_key_value_pairs(text):
  
     return key_value_pairs 
  
-def send_text_to_flask(subject, key_value_pairs, processing_result): 
-    data = { 
-        'subject': subject, 
-        'key_value_pairs': key_value_pairs,
-        'processing_info': processing_result
-    } 
-    response = requests.post(UPLOAD_TEXT_URL, json=data) 
-    print(f"Sent text for '{subject}' → {response.status_code} | {response.text}") 
- 
+def is_termsheet_email(msg):
+    return 'termsheet' in (msg.subject or "").lower()
+
+def process_termsheet_email(extractor, msg):
+    """Extracts and saves the terms in a termsheet email's body; returns the processing result or None"""
+    subject = msg.subject or "" 
+    body = msg.text or "" 
+    clean_text = clean_and_extract_relevant_text(body) 
+    key_value_pairs = extract_key_value_pairs(clean_text) 
+    
+    if not key_value_pairs: 
+        print(f"No key-value pairs found in email: {subject}") 
+        return None
+    # Process the email data (similar to PDF processing)
+    processing_result = extractor.process_email_data(subject, key_value_pairs)
+    # Hand over to the pipeline with processing info
+    deliver_text(subject, key_value_pairs, processing_result)
+    print(f"{processing_result['status'].capitalize()}: {processing_result['message']}")
+    return processing_result
+
 def fetch_and_process_emails(): 
     extractor = EmailExtractor()
     print("Fetching emails...")
-    with MailBox(IMAP_SERVER).login(EMAIL, PASSWORD, 'INBOX') as mailbox: 
+    # Versions of a trade amended several times in one run are written once
+    with store.batch(), MailBox(IMAP_SERVER).login(EMAIL, PASSWORD, 'INBOX') as mailbox: 
         for msg in mailbox.fetch(AND(seen=False)): 
             if not msg.attachments: 
-                subject = msg.subject or "" 
-                if 'termsheet' in subject.lower(): 
-                    body = msg.text or "" 
-                    clean_text = clean_and_extract_relevant_text(body) 
-                    key_value_pairs = extract_key_value_pairs(clean_text) 
-                    
-                    if key_value_pairs: 
-                        # Process the email data (similar to PDF processing)
-                        processing_result = extractor.process_email_data(subject, key_value_pairs)
-                        # Send to Flask with processing info
-                        send_text_to_flask(subject, key_value_pairs, processing_result)
-                        print(f"{processing_result['status'].capitalize()}: {processing_result['message']}")
-                    else: 
-                        print(f"No key-value pairs found in email: {subject}") 
+                if is_termsheet_email(msg): 
+                    process_termsheet_email(extractor, msg)
                 else: 
-                    print(f"Skipping email as subject does not contain 'termsheet': {subject}") 
+                    print(f"Skipping email as subject does not contain 'termsheet': {msg.subject or ''}") 
 
 # if __name__ == "__main__":
 #     fetch_and_process_emails()
\ No newline at end of file
@@ -4,6 +4,8 @@ import json
 from pathlib import Path
 import re
 from typing import Dict, Set, List, Tuple, Any, Optional
+from version_history import VersionHistory
+from version_index import VersionIndex
 
 # --- Configuration ---
 
@@ -319,7 +321,12 @@ def classify_term_sheet_from_file(
     file_path = Path(file_path_str)
     print(f"Attempting to load JSON from: {file_path.resolve()}")
 
-    input_data = load_json_data(file_path)
+    return classify_term_sheet_data(load_json_data(file_path))
+
+def classify_term_sheet_data(
+    input_data: Any
+) -> Optional[Dict[str, List[Tuple[str, Dict[str, Any]]]]]:
+    """Classifies already loaded term sheet JSON."""
     normalized_input_keys = extract_all_keys_normalized(input_data)
 
     if not normalized_input_keys:
@@ -355,34 +362,32 @@ def classify_termsheet():
         return results
         
     print("hello")
-    # Walk through all trade ID folders
-    for trade_id_folder in base_path.iterdir():
-        if not trade_id_folder.is_dir():
-            continue
-            
-        # Check for versions folder
-        versions_folder = trade_id_folder / "versions"
-        if not versions_folder.exists() or not versions_folder.is_dir():
-            continue
-            
-        # Process all JSON files in the versions folder
-        for version_file in versions_folder.glob("*.json"):
-            try:
-                print(f"Processing: {version_file}")
-                classification_result = classify_term_sheet_from_file(version_file)
-                
-                if classification_result:
-                    # Add trade ID and version info to results
-                    classification_result["trade_id"] = trade_id_folder.name
-                    classification_result["version"] = version_file.stem
-                    
-                    # Display individual results
-                    display_results(classification_result)
-                    
-                    # Add to overall results
-                    results.append(classification_result)
-            except Exception as e:
-                print(f"Error processing {version_file}: {e}")
+    # Walk through every indexed version, rebuilt from the version history
+    history = VersionHistory(str(base_path), VersionIndex(str(base_path)), "filename")
+    for entry in history.versions.all_versions():
+        version_file = Path(entry["path"])
+        try:
+            print(f"Processing: {version_file}")
+            version_info = {
+                "version": entry["version"],
+                "timestamp": entry["timestamp"],
+                "filename": entry["source"],
+                "data": history.version_data(entry["trade_id"], entry["version"])
+            }
+            classification_result = classify_term_sheet_data(version_info)
+
+            if classification_result:
+                # Add trade ID and version info to results
+                classification_result["trade_id"] = entry["trade_id"]
+                classification_result["version"] = version_file.stem
+
+                # Display individual results
+                display_results(classification_result)
+
+                # Add to overall results
+                results.append(classification_result)
+        except Exception as e:
+            print(f"Error processing {version_file}: {e}")
     
     for result in results:
         print(f"\nFinal Classification Result for Trade ID {result['trade_id']} Version {result['version']}:")
@@ -0,0 +1,165 @@
+# backend/ingest.py
+#
+# Where documents enter the pipeline. The upload routes and the mail
+# fetchers share these entry points: the fetchers run inside the Flask
+# process (scheduler and mail listener), so they hand documents over with a
+# function call instead of POSTing them back to the same server.
+#
+# REMOTE_INGEST=1 sends them to FLASK_SERVER_URL / FLASK_TEXT_UPLOAD_URL
+# instead, for fetchers deployed apart from the server: one pooled
+# keep-alive session, bounded retries and UPLOAD_WORKERS uploads at a time.
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from blob_store import DOWNLOADS, UPLOADS, extraction_lock, read_hashed
+from json_store import store
+from main import EARLY_EXIT, PAGE_BUDGET, LAYOUT_EXTRACTION
+from pdf_kv import PDFExtractor
+
+load_dotenv()
+
+TEXT_FOLDER = "texts"
+
+REMOTE_INGEST = os.getenv("REMOTE_INGEST", "").lower() in ("1", "true", "yes")
+UPLOAD_URL = os.getenv("FLASK_SERVER_URL")
+UPLOAD_TEXT_URL = os.getenv("FLASK_TEXT_UPLOAD_URL")
+
+# Remote uploads: concurrency, connect/read timeouts (s), and retries of
+# failed connections and gateway errors, backing off 0.5s, 1s, 2s. A request
+# that timed out reading the response is not replayed: the server may have
+# extracted it already.
+UPLOAD_WORKERS = 4
+UPLOAD_TIMEOUT = (5, 120)
+UPLOAD_RETRIES = 3
+RETRY_STATUSES = (502, 503, 504)
+
+_lock = threading.Lock()
+_pdf_extractor = None
+_session = None
+_upload_pool = None
+
+
+def pdf_extractor():
+    """The process's PDFExtractor for uploaded and mailed documents"""
+    global _pdf_extractor
+    with _lock:
+        if _pdf_extractor is None:
+            _pdf_extractor = PDFExtractor(early_exit=EARLY_EXIT, page_budget=PAGE_BUDGET, layout=LAYOUT_EXTRACTION)
+    return _pdf_extractor
+
+
+def ingest_pdf(filename, source, collection=UPLOADS):
+    """
+    Extracts a PDF (bytes, or a file object read into memory and hashed on
+    the way) as the next version of its trade, from memory; its original is
+    kept in the blob store under collection, written in the background.
+    Returns the extractor's result and raises if extraction fails. Content
+    extracted before comes back as a "duplicate" result without extraction.
+    """
+    filename = os.path.basename(filename)
+    extractor = pdf_extractor()
+    if hasattr(source, "read"):
+        payload, sha256 = read_hashed(source)
+    else:
+        payload, sha256 = bytes(source), None
+    blob = extractor.blobs.put(collection, filename, payload, sha256)
+    # Copies arriving together are extracted once: the later ones wait on
+    # the hash's stripe and find the recorded result
+    with extraction_lock(blob["sha256"]):
+        result = extractor.duplicate_result(filename, blob["sha256"])
+        if result is not None:
+            return result
+        result = extractor.process_document(filename, payload)
+        # Duplicates are answered from the recorded result, so it may only
+        # be recorded once the version is on disk, even inside a batch
+        store.flush()
+        extractor.blobs.record_result(blob["sha256"], result["trade_id"], result["version"])
+    return result
+
+
+def ingest_text(subject, key_value_pairs):
+    """Keeps the key-value pairs of a termsheet email under texts/; returns the file path"""
+    safe_subject = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in subject)
+    os.makedirs(TEXT_FOLDER, exist_ok=True)
+    save_path = os.path.join(TEXT_FOLDER, f"{safe_subject}.json")
+    store.write(save_path, key_value_pairs)
+    print(f"Saved text key-values for: {subject}")
+    return save_path
+
+
+def _remote_session():
+    global _session, _upload_pool
+    with _lock:
+        if _session is None:
+            retry = Retry(total=UPLOAD_RETRIES, read=0, backoff_factor=0.5, status_forcelist=RETRY_STATUSES,
+                          allowed_methods=None, raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=UPLOAD_WORKERS, max_retries=retry)
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _upload_pool = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="ingest-upload")
+    return _session
+
+
+def _upload_pdf(filename, payload):
+    files = {'file': (filename, payload, 'application/pdf')}
+    response = _remote_session().post(UPLOAD_URL, files=files, timeout=UPLOAD_TIMEOUT)
+    print(f"Sent {filename} → {response.status_code} | {response.text}")
+    response.raise_for_status()
+    return response.json().get("result")
+
+
+def _deliver_pdf(filename, payload):
+    if REMOTE_INGEST:
+        return _upload_pdf(filename, payload)
+    result = ingest_pdf(filename, payload, DOWNLOADS)
+    print(f"[OK] {result['message']}")
+    return result
+
+
+def deliver_pdfs(documents):
+    """
+    Hands [(filename, payload)] to the pipeline, in-process or uploaded
+    concurrently with REMOTE_INGEST. Returns a result (or None on error)
+    per document, in order; one failure does not stop the rest.
+    """
+    if REMOTE_INGEST and len(documents) > 1:
+        _remote_session()
+        futures = [_upload_pool.submit(_deliver_pdf, filename, payload) for filename, payload in documents]
+        outcomes = []
+        for (filename, _), future in zip(documents, futures):
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                print(f"Error delivering {filename}: {str(e)}")
+                outcomes.append(None)
+        return outcomes
+
+    outcomes = []
+    for filename, payload in documents:
+        try:
+            outcomes.append(_deliver_pdf(filename, payload))
+        except Exception as e:
+            print(f"Error delivering {filename}: {str(e)}")
+            outcomes.append(None)
+    return outcomes
+
+
+def deliver_text(subject, key_value_pairs, processing_info=None):
+    """Hands an email's key-value pairs to the pipeline, in-process or over HTTP"""
+    if not REMOTE_INGEST:
+        return ingest_text(subject, key_value_pairs)
+    data = {
+        'subject': subject,
+        'key_value_pairs': key_value_pairs,
+        'processing_info': processing_info
+    }
+    response = _remote_session().post(UPLOAD_TEXT_URL, json=data, timeout=UPLOAD_TIMEOUT)
+    print(f"Sent text for '{subject}' → {response.status_code} | {response.text}")
+    response.raise_for_status()
+    return None
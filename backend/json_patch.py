@@ -0,0 +1,55 @@
+# backend/json_patch.py
+#
+# The subset of JSON Patch (RFC 6902) the version history needs: diffs
+# between two extracted-terms objects, and applying them back. Patches are
+# standard, so any RFC 6902 library can read the stored versions too.
+
+
+def _pointer(key):
+    """JSON Pointer (RFC 6901) of a top-level key"""
+    return "/" + str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _tokens(pointer):
+    if not pointer.startswith("/"):
+        raise ValueError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def make_patch(old, new):
+    """Operations turning dict old into dict new; changed values are replaced whole"""
+    patch = []
+    for key, value in old.items():
+        if key not in new:
+            patch.append({"op": "remove", "path": _pointer(key)})
+        elif new[key] != value:
+            patch.append({"op": "replace", "path": _pointer(key), "value": new[key]})
+    for key, value in new.items():
+        if key not in old:
+            patch.append({"op": "add", "path": _pointer(key), "value": value})
+    return patch
+
+
+def apply_patch(data, patch):
+    """A copy of data with the add/remove/replace operations of patch applied"""
+    result = dict(data)
+    for operation in patch:
+        *parents, key = _tokens(operation["path"])
+        target = result
+        for token in parents:
+            # Copy nested objects on the way down so data is left untouched
+            target[token] = dict(target[token])
+            target = target[token]
+        op = operation["op"]
+        if op == "remove":
+            del target[key]
+        elif op == "add":
+            target[key] = operation["value"]
+        elif op == "replace":
+            if key not in target:
+                raise ValueError(f"Cannot replace missing {operation['path']}")
+            target[key] = operation["value"]
+        else:
+            raise ValueError(f"Unsupported JSON patch operation: {op}")
+    return result
+
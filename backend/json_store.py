@@ -0,0 +1,262 @@
+# backend/json_store.py
+#
+# How metadata reaches disk. Files are replaced atomically (temp file,
+# fsync, rename), so a crash leaves either the old file or the new one.
+# JSON is written compact, with orjson when it is installed; set
+# METADATA_PRETTY_JSON=1 for indented files.
+#
+# JsonStore queues writes for a background thread so ingest threads do not
+# wait on the disk. A path written again before it reached disk is written
+# once, with the latest content, and inside batch() nothing is written until
+# the batch ends, so a trade amended several times in one run costs one
+# write of its terms. Reads through the store see queued writes.
+
+import atexit
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PRETTY_JSON = os.getenv("METADATA_PRETTY_JSON", "").lower() in ("1", "true", "yes")
+
+# Queued paths that make a batch write out early, bounding its memory
+MAX_PENDING = 1000
+
+
+def dumps(data, pretty=PRETTY_JSON):
+    """UTF-8 JSON bytes of data, compact unless pretty"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(payload):
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def _fsync_directory(directory):
+    # Makes a rename in directory durable; not every platform can open one
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path, payload, sync_directory=True):
+    """Replaces path with payload (bytes) via an fsynced temp file and a rename"""
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if sync_directory:
+        _fsync_directory(os.path.dirname(path))
+    return path
+
+
+def write_json(path, data, pretty=PRETTY_JSON):
+    """Atomically writes data as JSON, on the calling thread"""
+    return write_atomic(path, dumps(data, pretty))
+
+
+class _Pending:
+    __slots__ = ("payload", "append", "callbacks")
+
+    def __init__(self, payload, append):
+        self.payload = payload
+        self.append = append
+        self.callbacks = []
+
+
+class JsonStore:
+    """
+    Write-behind JSON files. write() replaces a file and append() adds a
+    JSON line to one; both return at once and a single writer thread does
+    the I/O. on_written callbacks run on that thread once the file is on
+    disk. flush() waits for everything queued so far and raises the first
+    write error since the last flush. Reads see queued writes; a read of a
+    file being written waits for it, so callbacks must not read the store.
+    """
+
+    def __init__(self, pretty=PRETTY_JSON, max_pending=MAX_PENDING):
+        self.pretty = pretty
+        self.max_pending = max_pending
+        self._pending = {}
+        # What the writer thread is writing now; readers of those paths wait
+        # for it instead of reading a file that is about to be replaced
+        self._in_flight = {}
+        self._batches = 0
+        self._flush_requests = 0
+        self._writing = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self.stats = {"queued": 0, "written": 0, "coalesced": 0, "bytes": 0}
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="json-store", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def write(self, path, data, on_written=None):
+        """Queues data to replace the JSON file at path"""
+        self._queue(path, dumps(data, self.pretty), False, on_written)
+
+    def append(self, path, record, on_written=None):
+        """Queues record as one more line of the JSON-lines file at path"""
+        self._queue(path, dumps(record, False) + b"\n", True, on_written)
+
+    def _queue(self, path, payload, append, on_written):
+        with self._condition:
+            self._start()
+            self.stats["queued"] += 1
+            pending = self._pending.get(path)
+            if pending is None:
+                pending = self._pending[path] = _Pending(payload, append)
+            elif append:
+                # Appends after a queued write or append extend its payload
+                pending.payload += payload
+            else:
+                pending.payload, pending.append = payload, False
+                self.stats["coalesced"] += 1
+            if on_written is not None:
+                pending.callbacks.append(on_written)
+            self._condition.notify_all()
+
+    def _queued(self, path):
+        """The queued entry for path, once no write of it is in flight; call holding the condition"""
+        while path in self._in_flight:
+            self._condition.wait()
+        return self._pending.get(path)
+
+    def exists(self, path):
+        with self._condition:
+            pending = self._queued(path)
+            if pending is not None and not pending.append:
+                return True
+        return os.path.exists(path)
+
+    def load(self, path):
+        """The JSON at path, including a write still in the queue"""
+        with self._condition:
+            pending = self._queued(path)
+            if pending is not None and not pending.append:
+                return loads(pending.payload)
+        with open(path, "rb") as f:
+            return loads(f.read())
+
+    def load_lines(self, path):
+        """The records of a JSON-lines file, including appends still in the queue"""
+        with self._condition:
+            pending = self._queued(path)
+            queued = pending.payload if pending is not None else b""
+            replaced = pending is not None and not pending.append
+        payload = b""
+        if not replaced and os.path.exists(path):
+            with open(path, "rb") as f:
+                payload = f.read()
+        return [loads(line) for line in (payload + queued).splitlines() if line.strip()]
+
+    @contextmanager
+    def batch(self):
+        """Holds queued writes until the outermost batch ends"""
+        with self._condition:
+            self._batches += 1
+        try:
+            yield self
+        finally:
+            with self._condition:
+                self._batches -= 1
+                outermost = self._batches == 0
+                self._condition.notify_all()
+            if outermost:
+                self.flush()
+
+    def flush(self):
+        """Writes everything queued so far, including inside a batch"""
+        with self._condition:
+            if self._thread is None:
+                return
+            self._flush_requests += 1
+            self._condition.notify_all()
+            try:
+                while self._pending or self._writing:
+                    self._condition.wait()
+            finally:
+                self._flush_requests -= 1
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _ready(self):
+        if not self._pending:
+            return False
+        return self._batches == 0 or self._flush_requests > 0 or len(self._pending) >= self.max_pending
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._ready():
+                    self._condition.wait()
+                pending, self._pending = self._pending, {}
+                self._in_flight = pending
+                self._writing = True
+            try:
+                self._write_pending(pending)
+            finally:
+                with self._condition:
+                    self._in_flight = {}
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def _write_pending(self, pending):
+        directories = set()
+        written = []
+        for path, entry in pending.items():
+            try:
+                if entry.append:
+                    with open(path, "ab") as f:
+                        f.write(entry.payload)
+                        f.flush()
+                        os.fsync(f.fileno())
+                else:
+                    write_atomic(path, entry.payload, sync_directory=False)
+                    directories.add(os.path.dirname(path))
+            except Exception as e:
+                print(f"Error writing {path}: {str(e)}")
+                with self._condition:
+                    if self._error is None:
+                        self._error = e
+                continue
+            self.stats["written"] += 1
+            self.stats["bytes"] += len(entry.payload)
+            written.append(entry)
+
+        # One directory sync per batch makes its renames durable
+        for directory in directories:
+            _fsync_directory(directory)
+        for entry in written:
+            for callback in entry.callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"Error after writing metadata: {str(e)}")
+
+
+# Shared by every extractor in the process, so reads see each other's queued writes
+store = JsonStore()
@@ -0,0 +1,74 @@
+# backend/mail_checkpoints.py
+#
+# How far each mailbox has been synced, so a scan fetches only mail that
+# arrived since the last one instead of relying on the \Seen flag.
+
+import json
+import os
+import threading
+from datetime import datetime
+from json_store import write_json
+
+CHECKPOINT_FILE = "mail_checkpoints.json"
+
+# Syncs a message that failed to ingest is retried in before it is dropped
+MAX_ATTEMPTS = 5
+
+
+class MailCheckpoints:
+    """
+    {account: {folder: {"uidvalidity", "last_uid", "backfill_uid", "failed", "synced_at"}}}
+    stored as mail_checkpoints.json. last_uid is the highest UID handled by
+    incremental sync; backfill_uid is where the last backfill got to.
+    failed maps the UIDs at or below them whose ingest failed to the
+    attempts so far; they are retried on later syncs. A checkpoint only
+    holds while the folder's UIDVALIDITY is unchanged.
+    """
+
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+        self.accounts = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.accounts = json.load(f)
+        self._lock = threading.Lock()
+
+    def get(self, account, folder, uidvalidity):
+        """The folder's checkpoint, or None if there is none for this UIDVALIDITY"""
+        with self._lock:
+            checkpoint = self.accounts.get(account, {}).get(folder)
+            if checkpoint is None or checkpoint["uidvalidity"] != uidvalidity:
+                return None
+            return dict(checkpoint)
+
+    def failed(self, account, folder, uidvalidity):
+        """UIDs of the folder waiting to be retried, in ascending order"""
+        checkpoint = self.get(account, folder, uidvalidity)
+        if checkpoint is None:
+            return []
+        return sorted(checkpoint.get("failed", {}), key=int)
+
+    def advance(self, account, folder, uidvalidity, last_uid=None, backfill_uid=None, failed=(), succeeded=()):
+        """
+        Moves the folder's checkpoint forward (never back), records the UIDs
+        that failed and clears those that succeeded, and saves it
+        """
+        with self._lock:
+            folders = self.accounts.setdefault(account, {})
+            checkpoint = folders.get(folder)
+            if checkpoint is None or checkpoint["uidvalidity"] != uidvalidity:
+                checkpoint = folders[folder] = {"uidvalidity": uidvalidity, "last_uid": 0, "backfill_uid": None}
+            if last_uid is not None:
+                checkpoint["last_uid"] = max(checkpoint["last_uid"], last_uid)
+            if backfill_uid is not None:
+                checkpoint["backfill_uid"] = backfill_uid
+            retries = checkpoint.setdefault("failed", {})
+            for uid in succeeded:
+                retries.pop(uid, None)
+            for uid in failed:
+                retries[uid] = retries.get(uid, 0) + 1
+                if retries[uid] >= MAX_ATTEMPTS:
+                    print(f"[{account}] Giving up on UID {uid} after {MAX_ATTEMPTS} failed attempts")
+                    del retries[uid]
+            checkpoint["synced_at"] = datetime.now().isoformat()
+            write_json(self.path, self.accounts)
@@ -0,0 +1,94 @@
+# backend/mail_listener.py
+#
+# Push ingestion. One thread per mailbox account keeps an IMAP connection in
+# IDLE and syncs it (mailbox_scanner.sync_account) as soon as the server
+# reports new mail, instead of waiting for the 5-minute scan, and again each
+# time IDLE is re-issued, to retry messages that failed to ingest. A dropped
+# connection is reopened with exponential backoff and caught up on
+# reconnect; a server without IDLE is polled every POLL_INTERVAL seconds.
+# Each ingested message logs its time from arrival on the server.
+#
+#   python mail_listener.py             # every configured account, until Ctrl+C
+
+import os
+import random
+import re
+import threading
+import time
+from imap_tools import MailBox
+from mailbox_scanner import FOLDER, configured_accounts, email_extractor, new_metrics, report, sync_account
+
+# Listen with IDLE instead of the scheduled scan; MAIL_IDLE=0 goes back to polling
+MAIL_IDLE = os.getenv("MAIL_IDLE", "1").lower() not in ("0", "false", "no")
+
+# IDLE is re-issued this often (RFC 2177 allows at most 29 minutes)
+IDLE_TIMEOUT = 5 * 60
+POLL_INTERVAL = 60
+BACKOFF_INITIAL = 1
+BACKOFF_MAX = 5 * 60
+
+# Untagged IDLE responses announcing new mail
+NEW_MAIL = re.compile(rb"^\* \d+ (EXISTS|RECENT)")
+
+
+def _sync(mailbox, name, extractor):
+    metrics = new_metrics(name)
+    start = time.perf_counter()
+    sync_account(mailbox, name, extractor, metrics)
+    if metrics["headers"]:
+        report(metrics, time.perf_counter() - start)
+
+
+def listen_account(name, address, password, server, stop):
+    """Ingests an account's new mail as it arrives until stop is set"""
+    extractor = email_extractor()
+    backoff = BACKOFF_INITIAL
+    while not stop.is_set():
+        try:
+            with MailBox(server).login(address, password, FOLDER) as mailbox:
+                backoff = BACKOFF_INITIAL
+                idle = "IDLE" in mailbox.client.capabilities
+                print(f"[{name}] Listening for new mail "
+                      f"{'with IDLE' if idle else f'by polling every {POLL_INTERVAL}s (no IDLE support)'}")
+                # Mail that arrived while disconnected
+                _sync(mailbox, name, extractor)
+                while not stop.is_set():
+                    if idle:
+                        responses = mailbox.idle.wait(timeout=IDLE_TIMEOUT)
+                        # A timeout (no responses) syncs too, so messages that
+                        # failed to ingest are retried without waiting for new mail
+                        if responses and not any(NEW_MAIL.match(response) for response in responses):
+                            continue
+                    elif stop.wait(POLL_INTERVAL):
+                        break
+                    _sync(mailbox, name, extractor)
+        except Exception as e:
+            if stop.is_set():
+                break
+            delay = backoff * random.uniform(0.5, 1.0)
+            print(f"[{name}] Mailbox connection lost ({str(e)}); reconnecting in {delay:.1f}s")
+            stop.wait(delay)
+            backoff = min(backoff * 2, BACKOFF_MAX)
+
+
+def start_listeners(stop=None):
+    """Starts a daemon listener thread per configured account; returns (stop event, threads)"""
+    stop = stop or threading.Event()
+    threads = []
+    for name, account in configured_accounts().items():
+        thread = threading.Thread(target=listen_account, args=(name, *account, stop),
+                                  name=f"mail-listener-{name}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    if not threads:
+        print("No mailbox accounts configured")
+    return stop, threads
+
+
+if __name__ == "__main__":
+    stop, threads = start_listeners()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop.set()
@@ -0,0 +1,323 @@
+# backend/mailbox_scanner.py
+#
+# Scans every configured mailbox for termsheets in one pass. Each account
+# gets a single IMAP connection and messages are routed once: PDF
+# attachments go to the PDF pipeline (fetch_and_send, through ingest),
+# termsheet emails without attachments to the email extractor
+# (fetch_and_send_text).
+# Accounts are scanned concurrently.
+#
+# Sync is incremental by UID (mail_checkpoints), so reading a message in the
+# mailbox no longer hides it, and nothing is marked seen. Headers and
+# BODYSTRUCTURE are fetched first, in bulk; whole messages are downloaded
+# only when they carry a PDF or have a termsheet subject. A message whose
+# ingest fails is kept in the checkpoint and retried on later syncs.
+#
+#   python mailbox_scanner.py                       # every configured account
+#   python mailbox_scanner.py outlook
+#   python mailbox_scanner.py primary --backfill 1200   # every message from UID 1200 on
+#   python mailbox_scanner.py primary --backfill        # resume the last backfill
+
+import argparse
+import imaplib
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from imap_tools import MailBox, AND
+from fetch_and_send import send_pdf_attachments, pdf_attachments
+from fetch_and_send_text import EmailExtractor, is_termsheet_email, process_termsheet_email
+from json_store import store
+from mail_checkpoints import MailCheckpoints
+
+load_dotenv()
+
+# Environment variables holding each account's (address, password, IMAP server)
+ACCOUNTS = {
+    "primary": ("EMAIL", "EMAIL_PASSWORD", "IMAP_SERVER"),
+    "outlook": ("OUTLOOK_EMAIL", "OUTLOOK_PASSWORD", "IMAP_SERVER2")
+}
+FOLDER = "INBOX"
+
+# Messages per header/BODYSTRUCTURE round trip, and per full-message fetch;
+# the checkpoint is saved after each header chunk
+HEADER_BULK = 200
+BODY_BULK = 20
+
+# A BODYSTRUCTURE with a PDF part: its type, or a .pdf file name
+PDF_PART = re.compile(rb'"application"\s+"pdf"|\.pdf"', re.IGNORECASE)
+FETCH_START = re.compile(rb"^\d+ \(")
+FETCH_UID = re.compile(rb"UID (\d+)")
+
+# Accounts share one EmailExtractor; saves to the same trade must not interleave
+_text_lock = threading.Lock()
+_email_extractor = None
+_checkpoints = None
+
+
+def configured_accounts():
+    """{name: (address, password, server)} for the accounts with every variable set"""
+    accounts = {}
+    for name, variables in ACCOUNTS.items():
+        values = tuple(os.getenv(variable) for variable in variables)
+        if all(values):
+            accounts[name] = values
+    return accounts
+
+
+def email_extractor():
+    global _email_extractor
+    with _text_lock:
+        if _email_extractor is None:
+            _email_extractor = EmailExtractor()
+    return _email_extractor
+
+
+def checkpoints():
+    global _checkpoints
+    with _text_lock:
+        if _checkpoints is None:
+            _checkpoints = MailCheckpoints()
+    return _checkpoints
+
+
+def fetch_structures(mailbox, uids):
+    """
+    (UIDs among uids whose BODYSTRUCTURE has a PDF part, {uid: arrival time})
+    from one UID FETCH; arrival is the server's INTERNALDATE as a Unix time.
+    imaplib splits a response around literals (e.g. unusual file names), so
+    the pieces are regrouped per message first.
+    """
+    result = mailbox.client.uid("FETCH", ",".join(uids), "(UID INTERNALDATE BODYSTRUCTURE)")
+    if result[0] != "OK":
+        raise RuntimeError(f"BODYSTRUCTURE fetch failed: {result}")
+
+    messages = []
+    for item in result[1]:
+        if item is None:
+            continue
+        piece = b"".join(item) if isinstance(item, tuple) else item
+        head = item[0] if isinstance(item, tuple) else item
+        if FETCH_START.match(head) or not messages:
+            messages.append(piece)
+        else:
+            messages[-1] += piece
+
+    with_pdf = set()
+    arrived = {}
+    for message in messages:
+        uid = FETCH_UID.search(message)
+        if not uid:
+            continue
+        uid = uid.group(1).decode()
+        if PDF_PART.search(message):
+            with_pdf.add(uid)
+        internal_date = imaplib.Internaldate2tuple(message)
+        if internal_date is not None:
+            arrived[uid] = time.mktime(internal_date)
+    return with_pdf, arrived
+
+
+def wanted_uids(mailbox, uids, metrics):
+    """
+    (UIDs worth downloading in full, judged from headers and BODYSTRUCTURE,
+    {uid: arrival time})
+    """
+    with_pdf, arrived = fetch_structures(mailbox, uids)
+    wanted = []
+    for header in mailbox.fetch(uid_list=uids, headers_only=True, mark_seen=False, bulk=True):
+        metrics["headers"] += 1
+        if header.uid in with_pdf or is_termsheet_email(header):
+            wanted.append(header.uid)
+        else:
+            metrics["skipped"] += 1
+    return wanted, arrived
+
+
+def route_message(msg, extractor, metrics, arrived=None):
+    """
+    Sends a message down the PDF or text path, counting it in metrics and
+    logging its time-to-ingest when its arrival time is known. Returns
+    False if a PDF attachment could not be delivered.
+    """
+    metrics["messages"] += 1
+    metrics["bytes"] += msg.size_rfc822 or msg.size
+    attachments = pdf_attachments(msg)
+    if attachments:
+        sent, size = send_pdf_attachments(msg)
+        metrics["pdfs"] += sent
+        metrics["pdf_bytes"] += size
+        if sent < len(attachments):
+            metrics["errors"] += 1
+            return False
+    elif not msg.attachments and is_termsheet_email(msg):
+        with _text_lock:
+            result = process_termsheet_email(extractor, msg)
+        if result is not None:
+            metrics["texts"] += 1
+        else:
+            metrics["skipped"] += 1
+    else:
+        print(f"Skipping email without a PDF or termsheet subject: {msg.subject or ''}")
+        metrics["skipped"] += 1
+        return True
+
+    if arrived is not None:
+        latency = time.time() - arrived
+        metrics["ingest_seconds"].append(latency)
+        print(f"[{metrics['account']}] Ingested '{msg.subject}' {latency:.1f}s after it arrived")
+    return True
+
+
+def _pending_uids(mailbox, checkpoint, backfill_from):
+    """(uids to scan in ascending order, whether this is a backfill)"""
+    if backfill_from is not None:
+        start = backfill_from
+    elif checkpoint is not None:
+        start = checkpoint["last_uid"] + 1
+    else:
+        # First sync of this folder (or its UIDs were reset): take the unread
+        # mail, as the flag-based scan did, then continue by UID
+        return sorted(mailbox.uids(AND(seen=False)), key=int), False
+    # "N:*" always matches the newest message, even below N
+    uids = [uid for uid in mailbox.uids(AND(uid=f"{start}:*")) if int(uid) >= start]
+    return sorted(uids, key=int), backfill_from is not None
+
+
+def _ingest_chunk(mailbox, name, chunk, extractor, metrics):
+    """Routes the wanted messages among chunk; returns the UIDs that failed to ingest"""
+    failed = []
+    wanted, arrived = wanted_uids(mailbox, chunk, metrics)
+    if wanted:
+        for msg in mailbox.fetch(uid_list=wanted, mark_seen=False, bulk=BODY_BULK):
+            metrics["downloaded"] += 1
+            try:
+                if not route_message(msg, extractor, metrics, arrived.get(msg.uid)):
+                    failed.append(msg.uid)
+            except Exception as e:
+                print(f"[{name}] Error processing '{msg.subject}': {str(e)}")
+                metrics["errors"] += 1
+                failed.append(msg.uid)
+    return failed
+
+
+def sync_account(mailbox, name, extractor, metrics, backfill_from=None):
+    """
+    Scans the folder from its checkpoint (or backfill_from), saving progress
+    per chunk. Messages that failed to ingest stay in the checkpoint and are
+    retried first on the next sync.
+    """
+    status = mailbox.folder.status(FOLDER, ["UIDVALIDITY", "UIDNEXT"])
+    uidvalidity = status["UIDVALIDITY"]
+    sync_state = checkpoints()
+    checkpoint = sync_state.get(name, FOLDER, uidvalidity)
+
+    retries = sync_state.failed(name, FOLDER, uidvalidity)
+    if retries:
+        # Deleted messages are simply not returned; they count as done
+        present = set(mailbox.uids(AND(uid=retries)))
+        print(f"[{name}] Retrying {len(present)} message(s) that failed to ingest")
+        failed = _ingest_chunk(mailbox, name, [uid for uid in retries if uid in present], extractor, metrics) \
+            if present else []
+        sync_state.advance(name, FOLDER, uidvalidity, failed=failed,
+                           succeeded=[uid for uid in retries if uid not in failed])
+
+    uids, backfill = _pending_uids(mailbox, checkpoint, backfill_from)
+    if uids:
+        print(f"[{name}] {len(uids)} message(s) to scan"
+              f"{f' from UID {backfill_from}' if backfill else ''} (UIDVALIDITY {uidvalidity})")
+
+    for start in range(0, len(uids), HEADER_BULK):
+        chunk = uids[start:start + HEADER_BULK]
+        failed = _ingest_chunk(mailbox, name, chunk, extractor, metrics)
+        last = int(chunk[-1])
+        if backfill:
+            sync_state.advance(name, FOLDER, uidvalidity, backfill_uid=last, failed=failed)
+        else:
+            sync_state.advance(name, FOLDER, uidvalidity, last_uid=last, failed=failed)
+
+    if not backfill and checkpoint is None:
+        # Mail read before the first sync is not picked up later either
+        sync_state.advance(name, FOLDER, uidvalidity, last_uid=status["UIDNEXT"] - 1)
+
+
+def new_metrics(name):
+    return {"account": name, "headers": 0, "downloaded": 0, "messages": 0, "pdfs": 0, "texts": 0,
+            "skipped": 0, "errors": 0, "bytes": 0, "pdf_bytes": 0, "ingest_seconds": [], "error": None}
+
+
+def report(metrics, elapsed):
+    """Adds rates and time-to-ingest to metrics and prints the summary line"""
+    name = metrics["account"]
+    metrics["seconds"] = round(elapsed, 3)
+    metrics["messages_per_sec"] = round(metrics["headers"] / elapsed, 2) if elapsed > 0 else None
+    print(f"[{name}] {metrics['headers']} messages in {elapsed:.2f}s ({metrics['messages_per_sec']}/sec), "
+          f"{metrics['downloaded']} downloaded: {metrics['pdfs']} PDFs, {metrics['texts']} termsheet emails, "
+          f"{metrics['skipped']} skipped, {metrics['errors']} errors, {metrics['bytes'] / 1024:.0f} KB fetched")
+    latencies = sorted(metrics["ingest_seconds"])
+    if latencies:
+        metrics["ingest_p50_s"] = round(latencies[len(latencies) // 2], 1)
+        metrics["ingest_max_s"] = round(latencies[-1], 1)
+        print(f"[{name}] Time-to-ingest p50 {metrics['ingest_p50_s']}s, max {metrics['ingest_max_s']}s")
+    return metrics
+
+
+def scan_account(name, address, password, server, backfill_from=None):
+    """Syncs an account over one connection; returns its metrics"""
+    metrics = new_metrics(name)
+    start = time.perf_counter()
+    extractor = email_extractor()
+    try:
+        with MailBox(server).login(address, password, FOLDER) as mailbox:
+            sync_account(mailbox, name, extractor, metrics, backfill_from)
+    except Exception as e:
+        print(f"[{name}] Mailbox scan failed: {str(e)}")
+        metrics["error"] = str(e)
+    return report(metrics, time.perf_counter() - start)
+
+
+def backfill_start(name, uid=None):
+    """uid, or the UID after the account's last backfill"""
+    if uid is not None:
+        return uid
+    for checkpoint in checkpoints().accounts.get(name, {}).values():
+        if checkpoint.get("backfill_uid") is not None:
+            return checkpoint["backfill_uid"] + 1
+    raise ValueError(f"No backfill to resume for {name}; give a starting UID")
+
+
+def scan_mailboxes(names=None, backfill_from=None):
+    """
+    Scans the configured accounts (or just names) concurrently; returns
+    their metrics. backfill_from rescans every message from that UID on,
+    without moving the incremental checkpoint.
+    """
+    accounts = configured_accounts()
+    if names:
+        accounts = {name: account for name, account in accounts.items() if name in names}
+    if not accounts:
+        print("No mailbox accounts configured")
+        return []
+
+    print(f"Scanning {len(accounts)} mailbox(es): {', '.join(accounts)}")
+    # Emails amending the same trade in one scan write its terms once
+    with store.batch(), ThreadPoolExecutor(max_workers=len(accounts), thread_name_prefix="mailbox") as pool:
+        futures = [pool.submit(scan_account, name, *account, backfill_from) for name, account in accounts.items()]
+        return [future.result() for future in futures]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan mailboxes for termsheets")
+    parser.add_argument("accounts", nargs="*", help=f"any of {', '.join(ACCOUNTS)} (default: all configured)")
+    parser.add_argument("--backfill", nargs="?", type=int, const=-1, metavar="UID",
+                        help="rescan from UID, or resume the last backfill when no UID is given")
+    args = parser.parse_args()
+
+    if args.backfill is None:
+        scan_mailboxes(args.accounts)
+    else:
+        for account in args.accounts or configured_accounts():
+            start_uid = backfill_start(account, None if args.backfill == -1 else args.backfill)
+            scan_mailboxes([account], backfill_from=start_uid)
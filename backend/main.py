@@ -1,43 +1,237 @@
 from pdf_kv import PDFExtractor
+from concurrent.futures import ProcessPoolExecutor
+from blob_store import extraction_lock
+from json_store import store
 import os
+import time
 
-def process_pdf_files():
+# Below this many PDFs the pool start-up costs more than it saves
+PARALLEL_THRESHOLD = 8
+
+# Processed files between manifest saves, bounding rework after a crash
+MANIFEST_SAVE_EVERY = 100
+
+# EXTRACTION_EARLY_EXIT=1 stops reading a PDF once the Trade ID and every
+# section key are found; pairs and overrides on later pages are then not
+# read, so it is opt-in. PAGE_BUDGET caps the pages read per PDF (None reads
+# up to the last page).
+EARLY_EXIT = os.getenv("EXTRACTION_EARLY_EXIT", "").lower() in ("1", "true", "yes")
+PAGE_BUDGET = None
+
+# Pair labels with values by their position on the page instead of matching
+# the flattened text (see pdf_layout); handles two-column and table layouts
+LAYOUT_EXTRACTION = False
+
+_worker_extractor = None
+
+
+def _init_worker():
+    global _worker_extractor
+    _worker_extractor = PDFExtractor(setup_directories=False, early_exit=EARLY_EXIT, page_budget=PAGE_BUDGET,
+                                     layout=LAYOUT_EXTRACTION)
+
+
+def _extract_pdf(extractor, pdf_path):
+    """
+    Returns (extracted_pairs, trade_id, seconds, page_stats, error) so one bad
+    file never stops a batch
+    """
+    start = time.perf_counter()
+    try:
+        extracted_pairs, trade_id = extractor.extract_all_kv_pairs(pdf_path, save_to_file=False)
+        return extracted_pairs, trade_id, time.perf_counter() - start, extractor.last_extraction_stats, None
+    except Exception as e:
+        return None, None, time.perf_counter() - start, None, str(e)
+
+
+def _extract_in_worker(pdf_path):
+    return _extract_pdf(_worker_extractor, pdf_path)
+
+
+def _extract_files(extractor, pdf_paths, workers):
+    """Yields extraction results in input order, from a process pool when workers > 1"""
+    if workers <= 1:
+        for pdf_path in pdf_paths:
+            yield _extract_pdf(extractor, pdf_path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        chunksize = max(1, len(pdf_paths) // (workers * 4))
+        yield from pool.map(_extract_in_worker, pdf_paths, chunksize=chunksize)
+
+
+def _save_file(extractor, filename, stat, sha256, extraction, timings):
+    """Saves one extracted file as a new version and records it in the manifest"""
+    extracted_pairs, trade_id, extract_seconds, page_stats, error = extraction
+    timings.append({
+        "filename": filename,
+        "extract_ms": extract_seconds * 1000,
+        "save_ms": 0.0,
+        "pages_read": page_stats["pages_read"] if page_stats else 0,
+        "pages_skipped": page_stats["pages_skipped"] if page_stats else 0,
+        "ms_saved": page_stats["seconds_saved"] * 1000 if page_stats else 0.0
+    })
+    try:
+        print(f"\nProcessing {filename}...")
+        if error is not None:
+            raise RuntimeError(error)
+        # An upload or mail copy of this content may have been extracted
+        # since the batch was listed; it keeps the version that one made
+        with extraction_lock(sha256):
+            duplicate = extractor.duplicate_result(filename, sha256)
+            if duplicate is not None:
+                print(f"[OK] {duplicate['message']}")
+                extractor.record_processed(filename, stat, sha256, duplicate)
+                return True
+            save_start = time.perf_counter()
+            result = extractor.save_extraction(filename, extracted_pairs, trade_id)
+            save_seconds = time.perf_counter() - save_start
+            timings[-1]["save_ms"] = save_seconds * 1000
+            extractor.record_processed(filename, stat, sha256, result)
+
+        print(f"[OK] {result['message']}")
+        print(f"[OK] Files saved in metadata/{result['trade_id']}/")
+        print(f"[OK] Version: {result['version']}")
+        print(f"[OK] Extracted in {extract_seconds * 1000:.1f} ms, saved in {save_seconds * 1000:.1f} ms")
+        if page_stats["pages_skipped"]:
+            print(f"[OK] Read {page_stats['pages_read']}/{page_stats['pages']} pages "
+                  f"(~{page_stats['seconds_saved'] * 1000:.1f} ms saved)")
+
+        if result['status'] == 'updated':
+            print("[OK] Changes file created with modifications")
+            print(f"[OK] Version history available in metadata/{result['trade_id']}/versions/")
+        return True
+
+    except Exception as e:
+        print(f"Error processing {filename}: {str(e)}")
+        extractor.record_processed(filename, stat, sha256, error=str(e))
+        return False
+
+
+def _record_duplicate(extractor, filename, stat, sha256, first_copy):
+    """Records a file whose content was already extracted, as the version that extraction made"""
+    result = extractor.duplicate_result(filename, sha256)
+    if result is not None:
+        print(f"[OK] {result['message']}")
+        extractor.record_processed(filename, stat, sha256, result)
+    else:
+        # Its first copy in this batch failed; so would it
+        extractor.record_processed(filename, stat, sha256, error=f"Same content as {first_copy}, which failed")
+
+
+def process_pdf_files(workers=None):
     try:
-        extractor = PDFExtractor()
+        extractor = PDFExtractor(early_exit=EARLY_EXIT, page_budget=PAGE_BUDGET, layout=LAYOUT_EXTRACTION)
         files_dir = "files"
-        
+
         if not os.path.exists(files_dir):
             print("Error: files directory not found!")
             return
-            
+
         pdf_files = [f for f in os.listdir(files_dir) if f.lower().endswith('.pdf')]
-        
+
         if not pdf_files:
             print("No PDF files found in the files directory!")
             return
-            
-        print(f"\nFound {len(pdf_files)} PDF files to process.")
-        
+
+        start = time.perf_counter()
+
+        # Files the manifest has seen with the same size/mtime or content are skipped
+        pending = []
+        unchanged = 0
         for filename in pdf_files:
             try:
-                print(f"\nProcessing {filename}...")
-                result = extractor.process_new_document(filename)
-                print(f"[OK] {result['message']}")
-                print(f"[OK] Files saved in metadata/{result['trade_id']}/")
-                print(f"[OK] Version: {result['version']}")
-                
-                if result['status'] == 'updated':
-                    print("[OK] Changes file created with modifications")
-                    print(f"[OK] Version history available in metadata/{result['trade_id']}/versions/")
-                    
-            except Exception as e:
-                print(f"Error processing {filename}: {str(e)}")
+                needs_processing, stat, sha256 = extractor.check_processed(filename)
+            except OSError as e:
+                print(f"Error reading {filename}: {str(e)}")
                 continue
-        
-        print("\nAll files processed successfully!")
-        
+            if needs_processing:
+                pending.append((filename, stat, sha256))
+            else:
+                unchanged += 1
+
+        # Content extracted before, under any name, or earlier in this batch
+        # is not extracted again; it takes the version its first copy made
+        duplicates = []
+        first_copies = {}
+        unique = []
+        for item in pending:
+            sha256 = item[2]
+            if sha256 in first_copies or extractor.blobs.result(sha256) is not None:
+                duplicates.append(item)
+            else:
+                first_copies[sha256] = item[0]
+                unique.append(item)
+        pending = unique
+
+        if not pending and not duplicates:
+            extractor.manifest.save()
+            print(f"No new or changed PDF files ({unchanged} unchanged).")
+            return {"files": len(pdf_files), "unchanged": unchanged, "processed": 0}
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+            if len(pending) < PARALLEL_THRESHOLD:
+                workers = 1
+        workers = max(1, min(workers, len(pending)))
+
+        print(f"\nFound {len(pdf_files)} PDF files, {len(pending)} new or changed "
+              f"({unchanged} unchanged, {len(duplicates)} duplicates). Processing with {workers} worker(s).")
+
+        # Workers only extract; versions are written here, one file at a time and
+        # in listing order, so duplicate Trade IDs in a batch cannot race.
+        # Metadata writes are held for the batch and coalesced per file; they
+        # reach disk before every manifest save, so the manifest never lists
+        # a file whose versions could still be lost.
+        pdf_paths = [os.path.join(files_dir, filename) for filename, _, _ in pending]
+        timings = []
+        processed = 0
+        try:
+            with store.batch():
+                for (filename, stat, sha256), extraction in zip(pending, _extract_files(extractor, pdf_paths, workers)):
+                    if _save_file(extractor, filename, stat, sha256, extraction, timings):
+                        processed += 1
+                    if len(timings) % MANIFEST_SAVE_EVERY == 0:
+                        store.flush()
+                        extractor.manifest.save()
+                for filename, stat, sha256 in duplicates:
+                    _record_duplicate(extractor, filename, stat, sha256, first_copies.get(sha256))
+        finally:
+            store.flush()
+            extractor.manifest.save()
+
+        elapsed = time.perf_counter() - start
+        extract_times = sorted(timing["extract_ms"] for timing in timings)
+        failed = len(pending) - processed
+        summary = {
+            "files": len(pdf_files),
+            "unchanged": unchanged,
+            "duplicates": len(duplicates),
+            "processed": processed,
+            "failed": failed,
+            "workers": workers,
+            "seconds": round(elapsed, 3),
+            "files_per_second": round(len(pending) / elapsed, 2) if elapsed > 0 else None,
+            "extract_ms_p50": round(extract_times[len(extract_times) // 2], 1) if extract_times else None,
+            "extract_ms_max": round(extract_times[-1], 1) if extract_times else None,
+            "pages_skipped": sum(timing["pages_skipped"] for timing in timings),
+            "ms_saved": round(sum(timing["ms_saved"] for timing in timings), 1),
+            "timings": timings
+        }
+
+        if failed:
+            print(f"\n{failed} of {len(pending)} files failed; see the errors above")
+        else:
+            print("\nAll files processed successfully!")
+        print(f"Processed {processed}/{len(pending)} new or changed files in {elapsed:.2f}s "
+              f"({summary['files_per_second']} files/sec, {workers} worker(s))")
+        if summary["pages_skipped"]:
+            print(f"Early exit skipped {summary['pages_skipped']} pages (~{summary['ms_saved']:.0f} ms saved)")
+        return summary
+
     except Exception as e:
         print(f"Error during processing: {str(e)}")
 
+
 # if __name__ == "__main__":
-#     process_pdf_files()
\ No newline at end of file
+#     process_pdf_files()
@@ -1,16 +1,62 @@
 import re
 import fitz
-import json
 import os
 import shutil
-from datetime import datetime
+import threading
+import time
+from blob_store import BlobStore, FILES, extraction_lock, file_sha256
+from json_store import store
+from processed_manifest import ProcessedManifest
+from version_history import VersionHistory
+from version_index import VersionIndex
+from pdf_layout import page_segments, pair_fields
+
+# What may follow a section key: "Key: value" / "Key value", and "Key = value"
+VALUE_TAIL = re.compile(r":?\s*([^•\n]+)", re.IGNORECASE)
+ASSIGNMENT_TAIL = re.compile(r"\s*=\s*([^•\n]+)", re.IGNORECASE)
+TRADE_ID_PATTERN = re.compile(r'Trade ID:?\s*(TRADE-[^\s]+)')
+BULLET_PAIR_PATTERN = re.compile(r'[•]\s*([^:]+):\s*([^•\n]+)')
+
+# Characters re.IGNORECASE matches to an ASCII letter although str.lower()
+# leaves them alone (dotless i, long s)
+CASE_ALIASES = ("\u0131", "\u017f")
+
+# Plain text without ligature or image handling, for the early-exit mode
+TEXT_ONLY_FLAGS = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_LIGATURES & ~fitz.TEXT_PRESERVE_IMAGES
+
+# Uploads and the scheduled batch both write versions from this process
+_save_lock = threading.Lock()
 
 class PDFExtractor:
-    def __init__(self):
+    def __init__(self, setup_directories=True, early_exit=False, page_budget=None, required_keys=None,
+                 layout=False):
         self.files_dir = "files"
         self.metadata_dir = "metadata"
-        self._create_directories()
-        self._clear_metadata()
+        # early_exit stops reading pages once the Trade ID and every required
+        # key have a value, and reads text with TEXT_ONLY_FLAGS. page_budget
+        # caps the pages read per document in any mode.
+        self.early_exit = early_exit
+        self.page_budget = page_budget
+        # layout pairs labels with values by their position on the page
+        # (pdf_layout) instead of matching the flattened text, and records
+        # each field's bounding box in last_field_boxes
+        self.layout = layout
+        self.last_extraction_stats = None
+        self.last_field_boxes = None
+        self.manifest = None
+        self.blobs = None
+        self._history = None
+        # Extraction-only instances (e.g. in worker processes) leave the directories alone
+        if setup_directories:
+            self._create_directories()
+            self.manifest = ProcessedManifest(self.metadata_dir)
+            self.blobs = BlobStore()
+            if not self.manifest.exists:
+                # A tree from before the manifest was rebuilt from scratch on
+                # every run; clear it once so versions restart cleanly
+                self._clear_metadata()
+                self.blobs.clear_results()
+                self.manifest.save(force=True)
 
         self.sections = {
             "Parties Involved": ["Buyer", "Seller", "Broker"],
@@ -19,6 +65,34 @@ class PDFExtractor:
             "Settlement Details": ["Settlement Date", "Settlement Method", "Currency", "Clearing House"],
             "Fees and Costs": ["Brokerage Fee", "Exchange Fee", "Other Charges"]
         }
+        self._compile_section_patterns()
+        self.required_keys = list(required_keys) if required_keys is not None else self.section_keys
+
+    def _compile_section_patterns(self):
+        """
+        Builds one alternation over every section key, so a single scan of a
+        page finds where each key occurs. Pages are matched lowercased against
+        the lowercased keys, and the key is told apart by the matched text:
+        both re.IGNORECASE and capture groups turn off the regex engine's fast
+        prefix scan. A named-group IGNORECASE version handles the rare page
+        where lowercasing is not exact.
+        """
+        self.section_keys = list(dict.fromkeys(key for keys in self.sections.values() for key in keys))
+        longest_first = sorted(self.section_keys, key=len, reverse=True)
+        self._key_regex = re.compile("|".join(key.lower() for key in longest_first))
+        self._key_regex_ignorecase = re.compile(
+            "|".join(f"(?P<k{self.section_keys.index(key)}>{key})" for key in longest_first), re.IGNORECASE
+        )
+
+        # The alternation reports the longest key at a position; shorter keys
+        # that are prefixes of it start there too
+        self._key_by_lower = {key.lower(): key for key in self.section_keys}
+        self._keys_at_match = {}
+        self._keys_at_group = {}
+        for i, key in enumerate(self.section_keys):
+            keys = [other for other in self.section_keys if key.lower().startswith(other.lower())]
+            self._keys_at_match[key.lower()] = keys
+            self._keys_at_group[f"k{i}"] = keys
 
     def _clear_metadata(self):
         if os.path.exists(self.metadata_dir):
@@ -30,20 +104,57 @@ class PDFExtractor:
             if not os.path.exists(directory):
                 os.makedirs(directory)
 
-    def _get_trade_folder(self, trade_id):
-        trade_folder = os.path.join(self.metadata_dir, trade_id)
-        if not os.path.exists(trade_folder):
-            os.makedirs(trade_folder)
-            os.makedirs(os.path.join(trade_folder, "versions"))
-        return trade_folder
-
-    def _get_next_version(self, trade_folder):
-        versions_folder = os.path.join(trade_folder, "versions")
-        existing_versions = [f for f in os.listdir(versions_folder) if f.startswith("v")]
-        if not existing_versions:
-            return 1
-        latest_version = max([int(v.replace("v", "").split("_")[0]) for v in existing_versions])
-        return latest_version + 1
+    def check_processed(self, filename):
+        """
+        Returns (needs_processing, stat, sha256). A file whose size and mtime
+        match the manifest is skipped without being read; sha256 is None then.
+        Otherwise the file is hashed in place; it is copied into the blob
+        store only once it is extracted (record_processed).
+        """
+        pdf_path = os.path.join(self.files_dir, filename)
+        stat = os.stat(pdf_path)
+        if self.manifest.is_unchanged(filename, stat):
+            return False, stat, None
+        sha256 = file_sha256(pdf_path)
+        if self.manifest.matches_content(filename, stat, sha256):
+            return False, stat, sha256
+        return True, stat, sha256
+
+    def record_processed(self, filename, stat, sha256, result=None, error=None):
+        """Records a files/ document in the manifest, storing its original in the blob store"""
+        try:
+            self.blobs.add_file(FILES, filename, os.path.join(self.files_dir, filename), sha256)
+        except OSError as e:
+            print(f"Error storing {filename}: {str(e)}")
+        if result is not None:
+            self.manifest.record(filename, stat, sha256, result["trade_id"], result["version"])
+            if result["status"] != "duplicate":
+                self.blobs.record_result(sha256, result["trade_id"], result["version"])
+        else:
+            self.manifest.record(filename, stat, sha256, error=error)
+
+    def duplicate_result(self, filename, sha256):
+        """
+        The result for a document whose content was already extracted (under
+        any name), without extracting it again; None if it was not
+        """
+        known = self.blobs.result(sha256)
+        if known is None:
+            return None
+        return {
+            "status": "duplicate",
+            "trade_id": known["trade_id"],
+            "version": known["version"],
+            "sha256": sha256,
+            "message": f"{filename} duplicates version {known['version']} of Trade ID: {known['trade_id']}"
+        }
+
+    @property
+    def history(self):
+        """The metadata tree's VersionHistory, its index opened (and built if missing) on first use"""
+        if self._history is None:
+            self._history = VersionHistory(self.metadata_dir, VersionIndex(self.metadata_dir), "filename")
+        return self._history
 
     def process_new_document(self, filename):
         pdf_path = os.path.join(self.files_dir, filename)
@@ -51,121 +162,266 @@ class PDFExtractor:
         if not os.path.exists(pdf_path):
             raise FileNotFoundError(f"File {filename} not found in {self.files_dir} directory")
 
-        extracted_pairs, trade_id = self.extract_all_kv_pairs(pdf_path, save_to_file=False)
-        
+        needs_processing, stat, sha256 = self.check_processed(filename)
+        if not needs_processing:
+            entry = self.manifest.entry(filename)
+            return {
+                "status": "unchanged",
+                "trade_id": entry["trade_id"],
+                "version": entry["version"],
+                "message": f"{filename} is unchanged since it was processed"
+            }
+
+        with extraction_lock(sha256):
+            duplicate = self.duplicate_result(filename, sha256)
+            if duplicate is not None:
+                self.record_processed(filename, stat, sha256, duplicate)
+                self.manifest.save()
+                return duplicate
+
+            try:
+                extracted_pairs, trade_id = self.extract_all_kv_pairs(pdf_path, save_to_file=False)
+                result = self.save_extraction(filename, extracted_pairs, trade_id)
+            except Exception as e:
+                self.record_processed(filename, stat, sha256, error=str(e))
+                self.manifest.save()
+                raise
+            # The manifest and the blob store may only list a file once its
+            # version is on disk
+            store.flush()
+            self.record_processed(filename, stat, sha256, result)
+        self.manifest.save()
+        return result
+
+    def process_document(self, filename, source):
+        """
+        Extracts a PDF from outside files/ (an upload or mail attachment, as
+        a path, bytes or file object) and saves it as the next version of its
+        trade. Keeping the original is up to the caller.
+        """
+        extracted_pairs, trade_id = self.extract_all_kv_pairs(source, save_to_file=False)
+        return self.save_extraction(filename, extracted_pairs, trade_id)
+
+    def save_extraction(self, filename, extracted_pairs, trade_id):
+        """
+        Writes an extracted document as the next version of its trade. Saves
+        are serialized within the process; batch runs extract in parallel but
+        save from a single thread.
+        """
         if not trade_id:
             raise ValueError("Could not extract Trade ID from the document")
 
-        trade_folder = self._get_trade_folder(trade_id)
-        current_version = self._get_next_version(trade_folder)
-        
-        version_info = {
+        with _save_lock:
+            return self._save_version(filename, extracted_pairs, trade_id)
+
+    def _save_version(self, filename, extracted_pairs, trade_id):
+        status, current_version = self.history.save(trade_id, extracted_pairs, filename,
+                                                    filename.replace('.pdf', '.json'))
+        if status == "updated":
+            message = f"Updated to version {current_version} for Trade ID: {trade_id}"
+        else:
+            message = f"Created version {current_version} for Trade ID: {trade_id}"
+        return {
+            "status": status,
+            "trade_id": trade_id,
             "version": current_version,
-            "timestamp": datetime.now().isoformat(),
-            "filename": filename,
-            "data": extracted_pairs
+            "message": message
         }
 
-        terms_file = os.path.join(trade_folder, "extracted_terms.json")
-        version_file = os.path.join(trade_folder, "versions", f"v{current_version}_{filename.replace('.pdf', '.json')}")
-        changes_file = os.path.join(trade_folder, "changes.json")
-        
-        if os.path.exists(terms_file):
-            with open(terms_file, 'r', encoding='utf-8') as f:
-                existing_data = json.load(f)
-            
-            differences = {
-                "version": current_version,
-                "timestamp": version_info["timestamp"],
-                "added": {},
-                "removed": {},
-                "modified": {}
-            }
+    def extract_trade_id(self, text):
+        trade_id_match = TRADE_ID_PATTERN.search(text)
+        return trade_id_match.group(1) if trade_id_match else None
 
-            for key, value in existing_data["data"].items():
-                if key in extracted_pairs:
-                    if value != extracted_pairs[key]:
-                        differences["modified"][key] = {
-                            "old": value,
-                            "new": extracted_pairs[key]
-                        }
-                else:
-                    differences["removed"][key] = value
-
-            for key, value in extracted_pairs.items():
-                if key not in existing_data["data"]:
-                    differences["added"][key] = value
-
-            self.save_to_json(differences, changes_file)
-            self.save_to_json(version_info, version_file)
-            self.save_to_json(version_info, terms_file)
-            
-            return {
-                "status": "updated",
-                "trade_id": trade_id,
-                "version": current_version,
-                "message": f"Updated to version {current_version} for Trade ID: {trade_id}"
-            }
+    def _find_section_keys(self, text):
+        """{key: [start of each occurrence]} from one pass over the page"""
+        occurrences = {}
+        folded = text.lower()
+        if len(folded) == len(text) and not any(alias in text for alias in CASE_ALIASES):
+            search = self._key_regex.search
+            keys_at = lambda match: self._keys_at_match[match.group()]
         else:
-            self.save_to_json(version_info, version_file)
-            self.save_to_json(version_info, terms_file)
-            return {
-                "status": "created",
-                "trade_id": trade_id,
-                "version": current_version,
-                "message": f"Created version {current_version} for Trade ID: {trade_id}"
-            }
+            folded = text
+            search = self._key_regex_ignorecase.search
+            keys_at = lambda match: self._keys_at_group[match.lastgroup]
+        match = search(folded)
+        while match:
+            start = match.start()
+            for key in keys_at(match):
+                occurrences.setdefault(key, []).append(start)
+            # Resume right after the start, not the end: keys can overlap
+            match = search(folded, start + 1)
+        return occurrences
 
-    def extract_trade_id(self, text):
-        trade_id_match = re.search(r'Trade ID:?\s*(TRADE-[^\s]+)', text)
-        return trade_id_match.group(1) if trade_id_match else None
+    @staticmethod
+    def _after_bullet(text, start):
+        pos = start
+        while pos > 0 and text[pos - 1].isspace():
+            pos -= 1
+        return pos > 0 and text[pos - 1] == "•"
+
+    def _section_value(self, text, key, starts):
+        """
+        The value for a key, tried like the three per-key patterns were:
+        "Key: value", then "• Key: value", then "Key = value", each at the
+        first occurrence where it matches and kept only if longer than one char.
+        """
+        for tail, bulleted in ((VALUE_TAIL, False), (VALUE_TAIL, True), (ASSIGNMENT_TAIL, False)):
+            for start in starts:
+                if bulleted and not self._after_bullet(text, start):
+                    continue
+                match = tail.match(text, start + len(key))
+                if match:
+                    value = match.group(1).strip()
+                    if value and len(value) > 1:
+                        return value
+                    break
+        return None
+
+    def _has_required_keys(self, all_kv_pairs):
+        return all(key in all_kv_pairs for key in self.required_keys)
+
+    @staticmethod
+    def _open_document(source):
+        """Opens a path, raw PDF bytes or a binary file object"""
+        if hasattr(source, "read"):
+            source = source.read()
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return fitz.open(stream=source, filetype="pdf")
+        return fitz.open(source)
 
     def extract_all_kv_pairs(self, pdf_path, save_to_file=True):
-        doc = fitz.open(pdf_path)
+        """pdf_path may also be the document's bytes or a binary file object"""
+        start = time.perf_counter()
+        doc = self._open_document(pdf_path)
         all_kv_pairs = {}
         trade_id = None
+        page_count = len(doc)
+        pages_to_read = page_count if self.page_budget is None else min(page_count, self.page_budget)
+        pages_read = 0
         
-        for page_num in range(len(doc)):
+        field_boxes = {}
+        
+        for page_num in range(pages_to_read):
             page = doc[page_num]
-            text = page.get_text()
-            
-            if not trade_id:
-                trade_id = self.extract_trade_id(text)
-                if trade_id:
-                    all_kv_pairs["Trade ID"] = trade_id
-
-            for section, keys in self.sections.items():
-                for key in keys:
-                    patterns = [
-                        rf"{key}:?\s*([^•\n]+)",
-                        rf"[•]\s*{key}:?\s*([^•\n]+)",
-                        rf"{key}\s*=\s*([^•\n]+)"
-                    ]
-                    
-                    for pattern in patterns:
-                        match = re.search(pattern, text, re.IGNORECASE)
-                        if match:
-                            value = match.group(1).strip()
-                            if value and len(value) > 1:
-                                all_kv_pairs[key] = value
-                                break
-
-            additional_pairs = re.findall(r'[•]\s*([^:]+):\s*([^•\n]+)', text)
-            for key, value in additional_pairs:
-                key = key.strip()
-                value = value.strip()
-                if key and value and len(value) > 1 and key not in all_kv_pairs:
-                    all_kv_pairs[key] = value
+            pages_read += 1
+
+            if self.layout:
+                page_trade_id = self.extract_page_layout(page, page_num, all_kv_pairs, field_boxes, trade_id)
+                trade_id = trade_id or page_trade_id
+            else:
+                text = page.get_text(flags=TEXT_ONLY_FLAGS) if self.early_exit else page.get_text()
+
+                if not trade_id:
+                    trade_id = self.extract_trade_id(text)
+                    if trade_id:
+                        all_kv_pairs["Trade ID"] = trade_id
+
+                self.extract_page_pairs(text, all_kv_pairs)
+
+            if self.early_exit and trade_id and self._has_required_keys(all_kv_pairs):
+                break
 
         doc.close()
 
+        seconds = time.perf_counter() - start
+        pages_skipped = page_count - pages_read
+        self.last_extraction_stats = {
+            "pages": page_count,
+            "pages_read": pages_read,
+            "pages_skipped": pages_skipped,
+            "seconds": seconds,
+            # Skipped pages would have cost about as much as the ones read
+            "seconds_saved": seconds / pages_read * pages_skipped if pages_read else 0.0
+        }
+
         cleaned_pairs = self._clean_pairs(all_kv_pairs)
+        self.last_field_boxes = None
+        if self.layout:
+            self.last_field_boxes = {
+                key: {"page": page_number, "label_bbox": list(label_bbox), "value_bbox": list(value_bbox)}
+                for key, (page_number, label_bbox, value_bbox) in field_boxes.items() if key in cleaned_pairs
+            }
 
         if save_to_file and trade_id:
             self.save_to_json(cleaned_pairs, f"extracted_terms_{trade_id}.json")
 
         return cleaned_pairs, trade_id
 
+    def extract_page_pairs(self, text, all_kv_pairs):
+        """Adds the section keys and bulleted pairs found in one page's text"""
+        occurrences = self._find_section_keys(text)
+        for key in self.section_keys:
+            starts = occurrences.get(key)
+            if starts:
+                value = self._section_value(text, key, starts)
+                if value is not None:
+                    all_kv_pairs[key] = value
+
+        additional_pairs = BULLET_PAIR_PATTERN.findall(text)
+        for key, value in additional_pairs:
+            key = key.strip()
+            value = value.strip()
+            if key and value and len(value) > 1 and key not in all_kv_pairs:
+                all_kv_pairs[key] = value
+
+    def _match_section_key(self, text):
+        """(key, end) when text starts with a section key followed by a separator"""
+        folded = text.lower()
+        if text.isascii() or (len(folded) == len(text) and not any(alias in text for alias in CASE_ALIASES)):
+            match = self._key_regex.match(folded)
+            key = self._key_by_lower[match.group()] if match else None
+        else:
+            match = self._key_regex_ignorecase.match(text)
+            key = self.section_keys[int(match.lastgroup[1:])] if match else None
+        if match is None:
+            return None
+        end = match.end()
+        if end < len(text) and not (text[end].isspace() or text[end] in ":="):
+            return None
+        return key, end
+
+    def _has_layout_candidates(self, textpage):
+        """Whether a page has anything to pair, judged from its cheap block text"""
+        text = "".join(block[4] for block in textpage.extractBLOCKS())
+        return ":" in text or "=" in text or bool(self._find_section_keys(text))
+
+    def extract_page_layout(self, page, page_num, all_kv_pairs, field_boxes, trade_id=None):
+        """
+        Layout mode for one page: adds the fields paired by position, with
+        their boxes, and returns the Trade ID if it was first found here.
+        Later pages without a colon, "=" or section key skip the word-level
+        pass.
+        """
+        textpage = page.get_textpage(flags=TEXT_ONLY_FLAGS)
+        # The first page nearly always carries the terms, so only later pages
+        # are checked before paying for the word-level pass
+        if page_num > 0 and not self._has_layout_candidates(textpage):
+            return None
+
+        segments = page_segments(textpage.extractWORDS())
+        page_keys = set()
+        page_trade_id = None
+        for label, value, label_bbox, value_bbox, known in pair_fields(segments, self._match_section_key):
+            box = (page_num + 1, label_bbox, value_bbox)
+            if not trade_id and not page_trade_id:
+                page_trade_id = self.extract_trade_id(f"{label}: {value}")
+                if page_trade_id:
+                    all_kv_pairs["Trade ID"] = page_trade_id
+                    field_boxes["Trade ID"] = box
+                    continue
+
+            # As in the text path: a section key keeps its first value on a
+            # page and later pages override it; other labels keep the first
+            if known:
+                if label in page_keys:
+                    continue
+                page_keys.add(label)
+            elif label in all_kv_pairs:
+                continue
+            all_kv_pairs[label] = value
+            field_boxes[label] = box
+        return page_trade_id
+
     def _clean_pairs(self, pairs):
         cleaned_pairs = {}
         for key, value in pairs.items():
@@ -182,5 +438,4 @@ class PDFExtractor:
         return cleaned_pairs
 
     def save_to_json(self, data, output_file):
-        with open(output_file, "w", encoding="utf-8") as json_file:
-            json.dump(data, json_file, indent=4, ensure_ascii=False)
\ No newline at end of file
+        store.write(output_file, data)
\ No newline at end of file
@@ -0,0 +1,196 @@
+# backend/pdf_layout.py
+#
+# Pairs termsheet labels with their values by position on the page, for
+# PDFExtractor's layout mode. MuPDF already splits table cells and columns
+# into separate lines; those lines are indexed by row, and each label is
+# paired with the rest of its own line, the nearest line to its right on the
+# same row, or the cell directly below it.
+
+import re
+
+# Bullets and list numbering in front of a label
+BULLETS = "•·▪*- "
+NUMBERING = re.compile(r"^(?:\d+\.\s+)+")
+HAS_LETTER = re.compile(r"[^\W\d_]")
+LABEL_MAX_WORDS = 6
+SEPARATOR = re.compile(r"\s*[:=]?\s*")
+
+# How far below a label its value may start, in line heights
+BELOW_LINES = 1.6
+
+
+class Segment:
+    """One line of text on the page and its bounding box"""
+
+    __slots__ = ("x0", "y0", "x1", "y1", "text", "used")
+
+    def __init__(self, x0, y0, x1, y1, text):
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.text = text
+        self.used = False
+
+
+def page_segments(words):
+    """Segments from TextPage.extractWORDS() tuples, one per MuPDF line"""
+    segments = []
+    segment = None
+    parts = None
+    current_block = current_line = None
+    for x0, y0, x1, y1, word, block_no, line_no, _ in words:
+        if line_no == current_line and block_no == current_block:
+            parts.append(word)
+            if x1 > segment.x1:
+                segment.x1 = x1
+            if y0 < segment.y0:
+                segment.y0 = y0
+            if y1 > segment.y1:
+                segment.y1 = y1
+            continue
+        if parts:
+            segment.text = " ".join(parts)
+        segment = Segment(x0, y0, x1, y1, None)
+        segments.append(segment)
+        parts = [word]
+        current_block, current_line = block_no, line_no
+    if parts:
+        segment.text = " ".join(parts)
+    return segments
+
+
+class RowIndex:
+    """
+    Segments bucketed into horizontal bands one line high, so the lines on a
+    label's row, or just below it, are found without scanning the page
+    """
+
+    def __init__(self, segments):
+        heights = sorted(segment.y1 - segment.y0 for segment in segments)
+        self.line_height = heights[len(heights) // 2] if heights else 1.0
+        self.rows = {}
+        for segment in segments:
+            for row in range(self._row(segment.y0), self._row(segment.y1) + 1):
+                self.rows.setdefault(row, []).append(segment)
+
+    def _row(self, y):
+        return int(y // self.line_height)
+
+    def _between(self, y0, y1):
+        seen = set()
+        for row in range(self._row(y0), self._row(y1) + 1):
+            for segment in self.rows.get(row, ()):
+                if id(segment) not in seen:
+                    seen.add(id(segment))
+                    yield segment
+
+    def right_of(self, label):
+        """The nearest segment to the right that shares most of the label's row"""
+        best = None
+        half_height = (label.y1 - label.y0) / 2
+        for segment in self._between(label.y0, label.y1):
+            if segment is label or segment.x0 < label.x1 - 0.5:
+                continue
+            overlap = min(label.y1, segment.y1) - max(label.y0, segment.y0)
+            if overlap >= half_height and (best is None or segment.x0 < best.x0):
+                best = segment
+        return best
+
+    def below(self, label):
+        """The nearest segment under the label that overlaps it horizontally"""
+        best = None
+        limit = label.y1 + BELOW_LINES * self.line_height
+        middle = (label.y0 + label.y1) / 2
+        for segment in self._between(label.y1, limit):
+            if segment is label or segment.y0 <= middle or segment.y0 > limit:
+                continue
+            if segment.x0 >= label.x1 or segment.x1 <= label.x0:
+                continue
+            rank = (segment.y0, abs(segment.x0 - label.x0))
+            if best is None or rank < best[0]:
+                best = (rank, segment)
+        return best[1] if best else None
+
+
+def _strip_prefix(text):
+    text = text.lstrip(BULLETS)
+    if text[:1].isdigit():
+        text = NUMBERING.sub("", text).lstrip(BULLETS)
+    return text
+
+
+def _is_label(text):
+    # A short phrase starting like a heading, not the tail of a sentence.
+    # Segment text is joined with single spaces.
+    return ((text[:1].isupper() or text[:1].isdigit()) and text.count(" ") < LABEL_MAX_WORDS
+            and HAS_LETTER.search(text) is not None)
+
+
+def split_label(text, match_known_key):
+    """
+    (label, value_start, known) when text starts with a label, else None.
+    Known section keys may be followed by ":", "=" or just a space; any
+    other label needs a colon. A known key that only begins a longer label
+    ("Currency Pair:") gives way to that label.
+    """
+    colon = text.find(":")
+    known = match_known_key(text)
+    if known is not None and (colon < 0 or not text[known[1]:colon].strip()):
+        label, end = known
+        return label, SEPARATOR.match(text, end).end(), True
+    if colon > 0 and _is_label(text[:colon].strip()):
+        return text[:colon].strip(), SEPARATOR.match(text, colon).end(), False
+    return None
+
+
+def _value_text(text):
+    """A value runs to the end of the line or the next bullet, like the text patterns"""
+    return text.split("•", 1)[0].strip()
+
+
+def _box(segment, x0=None, x1=None):
+    return (segment.x0 if x0 is None else x0, segment.y0, segment.x1 if x1 is None else x1, segment.y1)
+
+
+def pair_fields(segments, match_known_key):
+    """
+    Yields (label, value, label_bbox, value_bbox, known) for a page in
+    reading order, boxes as (x0, y0, x1, y1). match_known_key(text) returns
+    (key, end) when text starts with a known section key, else None. A label
+    with nothing after it takes its value from the right neighbour or the
+    cell below, provided that line is not a label itself.
+    """
+    index = None
+
+    for segment in segments:
+        if segment.used:
+            continue
+        raw = segment.text
+        text = _strip_prefix(raw)
+        found = split_label(text, match_known_key)
+        if found is None:
+            continue
+        label, value_start, known = found
+
+        value = _value_text(text[value_start:])
+        if value:
+            if len(value) > 1:
+                # Label and value share the line; split its box by character count
+                start = len(raw) - len(text) + value_start
+                split_x = segment.x0 + (segment.x1 - segment.x0) * start / len(raw)
+                yield label, value, _box(segment, x1=split_x), _box(segment, x0=split_x), known
+            continue
+
+        if index is None:
+            index = RowIndex(segments)
+        for neighbour in (index.right_of(segment), index.below(segment)):
+            if neighbour is None or neighbour.used:
+                continue
+            if split_label(_strip_prefix(neighbour.text), match_known_key) is not None:
+                continue
+            value = _value_text(neighbour.text)
+            if len(value) > 1:
+                neighbour.used = True
+                yield label, value, _box(segment), _box(neighbour), known
+                break
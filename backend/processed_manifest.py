@@ -0,0 +1,76 @@
+# backend/processed_manifest.py
+#
+# Durable record of the PDFs already turned into metadata versions, so the
+# scheduled run only extracts files that are new or have changed.
+
+import json
+import os
+from datetime import datetime
+from json_store import write_json
+
+MANIFEST_FILE = "processed_files.json"
+MANIFEST_FORMAT = 1
+
+
+class ProcessedManifest:
+    """
+    {filename: {"sha256", "size", "mtime_ns", "trade_id", "version", ...}}
+    stored as metadata/processed_files.json.
+
+    A file whose size and mtime match its entry is skipped without being
+    read. If only the mtime changed (touched, copied back) the content hash
+    decides. Failed extractions are recorded too, so a broken PDF is retried
+    only once it changes.
+    """
+
+    def __init__(self, metadata_dir):
+        self.path = os.path.join(metadata_dir, MANIFEST_FILE)
+        self.files = {}
+        self.exists = os.path.exists(self.path)
+        if self.exists:
+            with open(self.path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("format") == MANIFEST_FORMAT:
+                self.files = manifest.get("files", {})
+        self._dirty = False
+
+    def __len__(self):
+        return len(self.files)
+
+    def entry(self, filename):
+        return self.files.get(filename)
+
+    def is_unchanged(self, filename, stat):
+        entry = self.files.get(filename)
+        return entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def matches_content(self, filename, stat, sha256):
+        """Same content under a new mtime: refresh the stat so the next run skips it cheaply"""
+        entry = self.files.get(filename)
+        if entry is None or entry["sha256"] != sha256:
+            return False
+        entry["size"] = stat.st_size
+        entry["mtime_ns"] = stat.st_mtime_ns
+        self._dirty = True
+        return True
+
+    def record(self, filename, stat, sha256, trade_id=None, version=None, error=None):
+        self.files[filename] = {
+            "sha256": sha256,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "trade_id": trade_id,
+            "version": version,
+            "error": error,
+            "processed_at": datetime.now().isoformat()
+        }
+        self._dirty = True
+
+    def save(self, force=False):
+        """Atomically replaces the manifest file, if anything changed (or force)"""
+        if not self._dirty and not force:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        write_json(self.path, {"format": MANIFEST_FORMAT, "files": self.files})
+        self.exists = True
+        self._dirty = False
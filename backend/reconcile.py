@@ -0,0 +1,272 @@
+# backend/reconcile.py
+#
+# Reconciles the whole termsheet book against risk_system.xlsx.
+#
+#   python reconcile.py                      # termsheets from Mongo
+#   python reconcile.py --source metadata    # metadata/<trade>/extracted_terms.json
+#   python reconcile.py --format parquet --workers 8
+
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import pandas as pd
+from validators.batch_validator import validate_swaps_against_risk_file
+from validators.products import resolve_product
+
+REPORT_DIR = "reports"
+METADATA_DIR = "metadata"
+BATCH_SIZE = 1000
+
+# Below this many trades a single process is faster than starting a pool
+PARALLEL_THRESHOLD = 5000
+
+# Mongo fields that are bookkeeping rather than trade terms
+IGNORED_FIELDS = {"_id", "file_path", "staus", "status"}
+
+# Extracted labels (derivative_parameters.DERIVATIVE_PARAMETERS) that are
+# named differently in each product validator's ECONOMIC_FIELDS. A label
+# may feed several fields; labels not listed go through to_field_name.
+TERMSHEET_FIELDS = {
+    "Interest Rate Swap": {
+        "Termination Date/Maturity": ("maturity_date",),
+    },
+    "Cross Currency Swap": {
+        "Termination Date": ("maturity_date",),
+        "Notional Amount (Currency 1)": ("base_notional_amount",),
+        "Notional Amount (Currency 2)": ("quote_notional_amount",),
+        "Exchange Rate": ("fx_spot_rate",),
+        "Fixed Rate (Currency 1)": ("base_leg_fixed_rate",),
+        "Fixed Rate (Currency 2)": ("quote_leg_fixed_rate",),
+        "Payment Frequency": ("base_payment_frequency", "quote_payment_frequency"),
+        "Initial Exchange": ("principal_exchange_initial",),
+        "Final Exchange": ("principal_exchange_final",),
+    },
+    "Amortised Schedule Swap": {
+        "Termination Date": ("maturity_date",),
+        "Initial Notional Amount": ("initial_notional",),
+        "Floating Rate Index": ("reference_rate",),
+    },
+}
+
+
+def to_field_name(key):
+    """'Effective Date' -> 'effective_date', matching the validators' ECONOMIC_FIELDS"""
+    return re.sub(r"[^0-9a-zA-Z]+", "_", key).strip("_").lower()
+
+
+def termsheet_fields(key, labels):
+    """The validator fields an extracted label fills, given its product's TERMSHEET_FIELDS"""
+    fields = labels.get(key.strip().lower())
+    if fields is not None:
+        return fields
+    field = to_field_name(key)
+    if field in ("tradeid", "trade_id"):
+        field = "tradeId"
+    return (field,)
+
+
+def termsheet_to_swap(document):
+    """Builds a validator payload from a stored termsheet"""
+    product = resolve_product(document)
+    labels = {label.lower(): fields for label, fields in TERMSHEET_FIELDS.get(product, {}).items()}
+    swap = {}
+    for key, value in document.items():
+        if key in IGNORED_FIELDS:
+            continue
+        # Fields stored as {"value": ..., "validated": ...} by the dashboard
+        if isinstance(value, dict) and "value" in value:
+            value = value["value"]
+        for field in termsheet_fields(key, labels):
+            swap.setdefault(field, value)
+    return swap
+
+
+def stream_mongo_termsheets(batch_size=BATCH_SIZE):
+    from db import db
+
+    batch = []
+    for document in db["termsheet"].find({}, batch_size=batch_size):
+        batch.append(termsheet_to_swap(document))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_metadata_termsheets(metadata_dir=METADATA_DIR, batch_size=BATCH_SIZE):
+    if not os.path.exists(metadata_dir):
+        print(f"Error: {metadata_dir} directory not found!")
+        return
+
+    batch = []
+    for trade_id in sorted(os.listdir(metadata_dir)):
+        terms_file = os.path.join(metadata_dir, trade_id, "extracted_terms.json")
+        if not os.path.exists(terms_file):
+            continue
+        with open(terms_file, "r", encoding="utf-8") as f:
+            terms = json.load(f)
+        batch.append(termsheet_to_swap({"tradeId": trade_id, **terms.get("data", {})}))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def count_termsheets(source, metadata_dir=METADATA_DIR):
+    if source == "mongo":
+        from db import db
+        return db["termsheet"].estimated_document_count()
+    if not os.path.exists(metadata_dir):
+        return 0
+    # What stream_metadata_termsheets yields: trade folders with extracted terms
+    return sum(1 for entry in os.scandir(metadata_dir)
+               if entry.is_dir() and os.path.exists(os.path.join(entry.path, "extracted_terms.json")))
+
+
+def reconcile_batch(swaps, risk_file=None):
+    """Validates one batch and flattens the results into report rows"""
+    rows = []
+    for swap, (result, status) in zip(swaps, validate_swaps_against_risk_file(swaps, risk_file)):
+        anomalies = result.get("anomalies", [])
+        rows.append({
+            "trade_id": str(swap.get("tradeId", "")),
+            "derivative_type": swap.get("derivative_type", ""),
+            "status": status,
+            "valid": bool(result.get("valid", False)),
+            "anomaly_count": len(anomalies),
+            "anomaly_fields": ";".join(a["field"] for a in anomalies),
+            "message": result.get("message", result.get("error", "")),
+            "anomalies": json.dumps(anomalies, default=str)
+        })
+    return rows
+
+
+def _run_batches(batches, risk_file, workers):
+    """Yields report rows per batch, using a process pool when workers > 1"""
+    if workers <= 1:
+        for swaps in batches:
+            yield reconcile_batch(swaps, risk_file)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for swaps in batches:
+            pending.append(pool.submit(reconcile_batch, swaps, risk_file))
+            # Keep a bounded number of batches in flight so memory stays flat
+            if len(pending) >= workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def write_report(rows, report_format="csv", report_dir=REPORT_DIR):
+    os.makedirs(report_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    df = pd.DataFrame(rows, columns=[
+        "trade_id", "derivative_type", "status", "valid",
+        "anomaly_count", "anomaly_fields", "message", "anomalies"
+    ])
+
+    if report_format == "parquet":
+        path = os.path.join(report_dir, f"reconciliation_{stamp}.parquet")
+        try:
+            df.to_parquet(path, index=False)
+            return path
+        except ImportError as e:
+            print(f"Parquet output unavailable ({e}), writing CSV instead")
+
+    path = os.path.join(report_dir, f"reconciliation_{stamp}.csv")
+    df.to_csv(path, index=False)
+    return path
+
+
+def save_summary(summary):
+    from db import db
+
+    result = db["reconciliation_runs"].insert_one(dict(summary))
+    if result.acknowledged:
+        print("Reconciliation summary inserted with ID:", result.inserted_id)
+    else:
+        print("Failed to insert reconciliation summary.")
+
+
+def run_reconciliation(source="mongo", report_format="csv", workers=None, risk_file=None,
+                       batch_size=BATCH_SIZE, save_to_mongo=True):
+    started_at = datetime.now()
+    start = time.perf_counter()
+
+    if source == "mongo":
+        batches = stream_mongo_termsheets(batch_size)
+    else:
+        batches = stream_metadata_termsheets(batch_size=batch_size)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+        if count_termsheets(source) < PARALLEL_THRESHOLD:
+            workers = 1
+
+    print(f"Reconciling {source} termsheets against the risk file with {workers} worker(s)...")
+    rows = []
+    for batch_rows in _run_batches(batches, risk_file, workers):
+        rows.extend(batch_rows)
+        elapsed = time.perf_counter() - start
+        print(f"  {len(rows)} trades reconciled ({len(rows) / elapsed:.0f} trades/sec)")
+
+    elapsed = time.perf_counter() - start
+    report_path = write_report(rows, report_format)
+
+    summary = {
+        "started_at": started_at.isoformat(),
+        "finished_at": datetime.now().isoformat(),
+        "source": source,
+        "workers": workers,
+        "total": len(rows),
+        "valid": sum(1 for row in rows if row["valid"]),
+        "mismatched": sum(1 for row in rows if row["status"] == 200 and not row["valid"]),
+        "not_found": sum(1 for row in rows if row["status"] == 404),
+        "errors": sum(1 for row in rows if row["status"] not in (200, 404)),
+        "elapsed_seconds": round(elapsed, 3),
+        "trades_per_sec": round(len(rows) / elapsed, 1) if elapsed > 0 else 0,
+        "report_path": report_path
+    }
+
+    print(f"[OK] Reconciled {summary['total']} trades in {summary['elapsed_seconds']}s "
+          f"({summary['trades_per_sec']} trades/sec)")
+    print(f"[OK] Valid: {summary['valid']}, mismatched: {summary['mismatched']}, "
+          f"not found: {summary['not_found']}, errors: {summary['errors']}")
+    print(f"[OK] Report saved to {report_path}")
+
+    if save_to_mongo:
+        try:
+            save_summary(summary)
+        except Exception as e:
+            print(f"Error saving reconciliation summary: {e}")
+
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile all termsheets against the risk system")
+    parser.add_argument("--source", choices=["mongo", "metadata"], default="mongo")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: all cores for large books)")
+    parser.add_argument("--risk-file", default=None, help="validate against this workbook instead of the validators' RISK_FILE")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--no-mongo-summary", action="store_true")
+    args = parser.parse_args()
+
+    run_reconciliation(
+        source=args.source,
+        report_format=args.format,
+        workers=args.workers,
+        risk_file=args.risk_file,
+        batch_size=args.batch_size,
+        save_to_mongo=not args.no_mongo_summary
+    )
@@ -0,0 +1,76 @@
+# backend/revalidate.py
+#
+# Re-runs validation only for the trades touched by a risk workbook edit.
+
+from datetime import datetime
+from db import db
+from reconcile import termsheet_to_swap
+from validators.batch_validator import validate_swaps_against_risk_file
+from validators.products import PRODUCT_VALIDATORS
+from validators.reference_data import affected_trade_ids, get_reference_data
+
+termsheet_collection = db["termsheet"]
+validation_results_collection = db["validation_results"]
+
+# Field names termsheets have been stored with for the trade ID
+TRADE_ID_FIELDS = ["tradeId", "TradeId", "trade_id", "Trade ID"]
+
+
+def risk_files():
+    return sorted({validator.RISK_FILE for validator in PRODUCT_VALIDATORS.values()})
+
+
+def find_termsheets(trade_ids):
+    query = {"$or": [{field: {"$in": trade_ids}} for field in TRADE_ID_FIELDS]}
+    return [termsheet_to_swap(document) for document in termsheet_collection.find(query)]
+
+
+def revalidate_trades(trade_ids, reference_hash=None):
+    """Validates the stored termsheets for the given trades and upserts their results"""
+    if not trade_ids:
+        return 0
+
+    swaps = find_termsheets(trade_ids)
+    if not swaps:
+        print(f"No stored termsheets for {len(trade_ids)} changed trades")
+        return 0
+
+    validated_at = datetime.now().isoformat()
+    for swap, (result, status) in zip(swaps, validate_swaps_against_risk_file(swaps)):
+        trade_id = str(swap.get("tradeId", ""))
+        validation_results_collection.update_one(
+            {"trade_id": trade_id},
+            {"$set": {
+                "trade_id": trade_id,
+                "derivative_type": swap.get("derivative_type", ""),
+                "status": status,
+                "result": result,
+                "reference_hash": reference_hash,
+                "validated_at": validated_at
+            }},
+            upsert=True
+        )
+    print(f"[OK] Revalidated {len(swaps)} termsheets affected by the risk workbook change")
+    return len(swaps)
+
+
+def revalidate_changed_trades(diff):
+    """Reference data listener: revalidates trades added, removed or changed in the workbook"""
+    trade_ids = sorted({trade_id for ids in affected_trade_ids(diff).values() for trade_id in ids})
+    print(f"Risk workbook changed: {len(trade_ids)} trades affected")
+    return revalidate_trades(trade_ids, diff.get("to_hash"))
+
+
+def register_revalidation():
+    """Hooks revalidation into every risk workbook the validators use"""
+    for risk_file in risk_files():
+        get_reference_data(risk_file).add_listener(revalidate_changed_trades)
+
+
+def refresh_reference_data():
+    """Picks up workbook edits; listeners fire if the content changed"""
+    for risk_file in risk_files():
+        try:
+            get_reference_data(risk_file).snapshot()
+        except OSError as e:
+            print(f"Could not refresh risk workbook {risk_file}: {e}")
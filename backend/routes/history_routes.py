@@ -0,0 +1,68 @@
+# routes/history_routes.py
+
+from flask import Blueprint, request, jsonify
+from version_history import VersionHistory
+from version_index import VersionIndex
+
+history_bp = Blueprint('history_bp', __name__)
+
+# Metadata tree and source field of each ingest path
+HISTORY_SOURCES = {
+    "pdf": ("metadata", "filename"),
+    "email": ("email_metadata", "subject")
+}
+
+_histories = {}
+
+
+def get_history(source):
+    if source not in _histories:
+        metadata_dir, source_field = HISTORY_SOURCES[source]
+        _histories[source] = VersionHistory(metadata_dir, VersionIndex(metadata_dir), source_field)
+    return _histories[source]
+
+
+@history_bp.route("/history/<source>/<trade_id>", methods=["GET"])
+def list_versions(source, trade_id):
+    try:
+        if source not in HISTORY_SOURCES:
+            return jsonify({"error": f"Unknown source: {source}"}), 400
+
+        versions = get_history(source).versions.history(trade_id)
+        if not versions:
+            return jsonify({"error": f"No versions of {trade_id}"}), 404
+
+        return jsonify(versions), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@history_bp.route("/history/<source>/<trade_id>/versions/<int:version>", methods=["GET"])
+def get_version(source, trade_id, version):
+    try:
+        if source not in HISTORY_SOURCES:
+            return jsonify({"error": f"Unknown source: {source}"}), 400
+
+        data = get_history(source).version_data(trade_id, version)
+        if data is None:
+            return jsonify({"error": f"Version {version} of {trade_id} not found"}), 404
+
+        return jsonify({"trade_id": trade_id, "version": version, "data": data}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@history_bp.route("/history/<source>/<trade_id>/changes", methods=["GET"])
+def list_changes(source, trade_id):
+    try:
+        if source not in HISTORY_SOURCES:
+            return jsonify({"error": f"Unknown source: {source}"}), 400
+
+        since = request.args.get("since", 0, type=int)
+        field = request.args.get("field")
+        return jsonify(get_history(source).changes(trade_id, since=since, field=field)), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
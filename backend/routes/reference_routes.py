@@ -0,0 +1,30 @@
+# routes/reference_routes.py
+
+from flask import Blueprint, jsonify
+from revalidate import risk_files
+from validators.reference_data import affected_trade_ids, get_reference_data
+
+reference_bp = Blueprint('reference_bp', __name__)
+
+
+@reference_bp.route("/reference/diff", methods=["GET"])
+def reference_diff():
+    try:
+        diffs = []
+        for risk_file in risk_files():
+            diff = get_reference_data(risk_file).last_diff()
+            if diff is None:
+                continue
+            diffs.append({
+                "risk_file": risk_file,
+                **diff,
+                "affected": affected_trade_ids(diff)
+            })
+
+        if not diffs:
+            return jsonify({"message": "No risk workbook changes recorded yet"}), 404
+
+        return jsonify(diffs), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -4,6 +4,9 @@ from flask import Blueprint, request, jsonify
 from db import db
 import os
 from validators.swap_validator import validate_swap_against_risk_file
+from validators.batch_validator import validate_swaps_against_risk_file
+from validators.dispatcher import validate
+from validators.result_cache import VALIDATION_CACHE
 
 termsheet_collection = db["termsheet"]
 
@@ -54,4 +57,45 @@ def validate_swap():
         return jsonify(result), status
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+
+@termsheet_bp.route("/validate", methods=["POST"])
+def validate_any_swap():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        result, status = validate(data)
+        return jsonify(result), status
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@termsheet_bp.route("/validation_cache/stats", methods=["GET"])
+def validation_cache_stats():
+    return jsonify(VALIDATION_CACHE.stats()), 200
+
+
+@termsheet_bp.route("/validate_swaps", methods=["POST"])
+def validate_swaps():
+    try:
+        data = request.get_json()
+        # Accept either a bare array or {"swaps": [...]}
+        swaps = data.get("swaps") if isinstance(data, dict) else data
+        if not swaps or not isinstance(swaps, list):
+            return jsonify({"error": "A non-empty array of swaps is required"}), 400
+
+        results = validate_swaps_against_risk_file(swaps)
+        return jsonify({
+            "count": len(results),
+            "results": [
+                {"index": index, "status": status, "result": result}
+                for index, (result, status) in enumerate(results)
+            ]
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
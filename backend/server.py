@@ -9,14 +9,15 @@ from flask_apscheduler import APScheduler
 from routes.termsheet_routes import termsheet_bp
 from routes.trader_routes import trader_bp
 from routes.stats_routes import stats_bp
-from fetch_and_send import fetch_and_send_pdfs
-from fetch_and_send_text import fetch_and_process_emails
+from routes.reference_routes import reference_bp
+from routes.history_routes import history_bp
+from mailbox_scanner import scan_mailboxes
+from mail_listener import MAIL_IDLE, start_listeners
 from main import process_pdf_files
+from ingest import TEXT_FOLDER, ingest_pdf, ingest_text, pdf_extractor
+from reconcile import run_reconciliation
+from revalidate import register_revalidation, refresh_reference_data
 
-UPLOAD_FOLDER = 'uploads'
-TEXT_FOLDER = 'texts'
-
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(TEXT_FOLDER, exist_ok=True)
 
 class Config:
@@ -32,33 +33,62 @@ scheduler.init_app(app)
 scheduler.start()
 
 # Scheduled jobs
-@scheduler.task('interval', id='fetch_and_send_pdfs', minutes=5)
-def scheduled_fetch_and_send_pdfs():
-    fetch_and_send_pdfs()
-
-@scheduler.task('interval', id='fetch_and_process_emails', minutes=5)
-def scheduled_fetch_and_process_emails():
-    fetch_and_process_emails()
+# Mail is ingested as it arrives (IDLE), or by a scan every 5 minutes with
+# MAIL_IDLE=0; one pass per mailbox routes PDFs and termsheet emails alike
+if MAIL_IDLE:
+    start_listeners()
+else:
+    @scheduler.task('interval', id='scan_mailboxes', minutes=5)
+    def scheduled_scan_mailboxes():
+        scan_mailboxes()
 
 @scheduler.task('interval', id='process_pdf_files', minutes=5)
 def scheduled_process_pdf_files():
     process_pdf_files()
 
+@scheduler.task('interval', id='refresh_reference_data', minutes=1)
+def scheduled_refresh_reference_data():
+    refresh_reference_data()
+
+@scheduler.task('cron', id='reconcile_book', hour=22, minute=0)
+def scheduled_reconcile_book():
+    run_reconciliation()
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     file = request.files.get('file')
     if not file or not file.filename.endswith('.pdf'):
         return jsonify({'error': 'Invalid or no PDF uploaded'}), 400
 
-    save_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(save_path)
-    print(f"Saved: {save_path}")
+    filename = os.path.basename(file.filename)
+
+    # The upload is read into memory, hashed on the way, and extracted from
+    # there; its blob is written in the background. A document extracted
+    # before is not extracted again
+    try:
+        result = ingest_pdf(filename, file.stream)
+    except Exception as e:
+        print(f"Error processing {filename}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-    return jsonify({'message': 'File received and saved'}), 200
+    print(f"[OK] {result['message']}")
+    return jsonify({'message': 'File received and saved', 'result': result}), 200
+
+@app.route('/upload_stats', methods=['GET'])
+def upload_stats():
+    try:
+        return jsonify(pdf_extractor().blobs.stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 app.register_blueprint(termsheet_bp)
 app.register_blueprint(trader_bp)
 app.register_blueprint(stats_bp)
+app.register_blueprint(reference_bp)
+app.register_blueprint(history_bp)
+
+# Revalidate stored termsheets whenever the risk workbook changes
+register_revalidation()
 
 @app.route('/upload_text', methods=['POST'])
 def upload_text():
@@ -69,13 +99,7 @@ def upload_text():
     if not subject or not key_value_pairs:
         return jsonify({'error': 'Invalid data'}), 400
 
-    safe_subject = "".join(c if c.isalnum() or c in (' ', '-', '_') else '_' for c in subject)
-    save_path = os.path.join(TEXT_FOLDER, f"{safe_subject}.json")
-
-    with open(save_path, 'w') as f:
-        json.dump(key_value_pairs, f, indent=4)
-
-    print(f"Saved text key-values for: {subject}")
+    ingest_text(subject, key_value_pairs)
 
     return jsonify({'message': 'Text data received and saved'}), 200
 
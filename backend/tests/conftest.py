@@ -0,0 +1,9 @@
+# backend/tests/conftest.py
+#
+# The backend modules import each other as top-level modules (run from
+# backend/), so the tests put backend/ on the path the same way.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,112 @@
+# backend/tests/test_mail_checkpoints.py
+
+import re
+import pytest
+import mailbox_scanner
+from mail_checkpoints import MAX_ATTEMPTS, MailCheckpoints
+
+UIDVALIDITY = 7
+
+
+def test_failed_uids_are_kept_until_they_succeed(tmp_path):
+    path = str(tmp_path / "mail_checkpoints.json")
+    sync_state = MailCheckpoints(path)
+    sync_state.advance("primary", "INBOX", UIDVALIDITY, last_uid=4, failed=["4", "2"])
+    assert sync_state.failed("primary", "INBOX", UIDVALIDITY) == ["2", "4"]
+
+    sync_state.advance("primary", "INBOX", UIDVALIDITY, succeeded=["2"], failed=["4"])
+    reloaded = MailCheckpoints(path)
+    assert reloaded.failed("primary", "INBOX", UIDVALIDITY) == ["4"]
+    assert reloaded.get("primary", "INBOX", UIDVALIDITY)["failed"] == {"4": 2}
+    assert reloaded.get("primary", "INBOX", UIDVALIDITY)["last_uid"] == 4
+
+    # A new UIDVALIDITY makes the old UIDs meaningless
+    assert reloaded.failed("primary", "INBOX", UIDVALIDITY + 1) == []
+
+
+def test_failed_uid_is_dropped_after_max_attempts(tmp_path):
+    sync_state = MailCheckpoints(str(tmp_path / "mail_checkpoints.json"))
+    for _ in range(MAX_ATTEMPTS - 1):
+        sync_state.advance("primary", "INBOX", UIDVALIDITY, failed=["3"])
+    assert sync_state.failed("primary", "INBOX", UIDVALIDITY) == ["3"]
+    sync_state.advance("primary", "INBOX", UIDVALIDITY, failed=["3"])
+    assert sync_state.failed("primary", "INBOX", UIDVALIDITY) == []
+
+
+class FakeMessage:
+    def __init__(self, uid):
+        self.uid = uid
+        self.subject = f"message {uid}"
+
+
+class FakeMailbox:
+    """The parts of an imap_tools MailBox that sync_account uses, over a list of UIDs"""
+
+    def __init__(self, uids):
+        self.all_uids = list(uids)
+        self.folder = self
+
+    def status(self, folder, items):
+        return {"UIDVALIDITY": UIDVALIDITY, "UIDNEXT": int(self.all_uids[-1]) + 1}
+
+    def uids(self, criteria):
+        criteria = str(criteria)
+        if "UNSEEN" in criteria:
+            return list(self.all_uids)
+        matched = []
+        for part in re.search(r"UID ([\d:*,]+)", criteria).group(1).split(","):
+            if part.endswith(":*"):
+                start = int(part[:-2])
+                # "N:*" always matches the newest message, like a real server
+                matched += [uid for uid in self.all_uids if int(uid) >= start] or self.all_uids[-1:]
+            elif part in self.all_uids:
+                matched.append(part)
+        return matched
+
+    def fetch(self, uid_list, **kwargs):
+        return [FakeMessage(uid) for uid in uid_list]
+
+
+@pytest.fixture
+def sync_state(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(mailbox_scanner, "_checkpoints", None)
+    monkeypatch.setattr(mailbox_scanner, "wanted_uids", lambda mailbox, uids, metrics: (uids, {}))
+    return mailbox_scanner.checkpoints()
+
+
+def test_sync_retries_failed_messages_first(sync_state, monkeypatch):
+    failures = {"2": 1, "3": MAX_ATTEMPTS + 1}
+    routed = []
+
+    def route_message(msg, extractor, metrics, arrived=None):
+        routed.append(msg.uid)
+        if failures.get(msg.uid, 0) > 0:
+            failures[msg.uid] -= 1
+            if msg.uid == "3":
+                raise RuntimeError("delivery failed")
+            return False
+        return True
+
+    monkeypatch.setattr(mailbox_scanner, "route_message", route_message)
+    mailbox = FakeMailbox(["1", "2", "3"])
+
+    mailbox_scanner.sync_account(mailbox, "primary", None, mailbox_scanner.new_metrics("primary"))
+    assert routed == ["1", "2", "3"]
+    assert sync_state.failed("primary", "INBOX", UIDVALIDITY) == ["2", "3"]
+    assert sync_state.get("primary", "INBOX", UIDVALIDITY)["last_uid"] == 3
+
+    # No new mail: only the failed UIDs are fetched again; "2" now succeeds
+    routed.clear()
+    mailbox_scanner.sync_account(mailbox, "primary", None, mailbox_scanner.new_metrics("primary"))
+    assert routed == ["2", "3"]
+    assert sync_state.failed("primary", "INBOX", UIDVALIDITY) == ["3"]
+
+    # New mail is scanned after the retries; "3" is given up after MAX_ATTEMPTS
+    mailbox.all_uids.append("4")
+    for _ in range(MAX_ATTEMPTS):
+        routed.clear()
+        mailbox_scanner.sync_account(mailbox, "primary", None, mailbox_scanner.new_metrics("primary"))
+    assert sync_state.failed("primary", "INBOX", UIDVALIDITY) == []
+    assert sync_state.get("primary", "INBOX", UIDVALIDITY)["last_uid"] == 4
+    assert routed == []
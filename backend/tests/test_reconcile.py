@@ -0,0 +1,115 @@
+# backend/tests/test_reconcile.py
+
+import pandas as pd
+from reconcile import count_termsheets, reconcile_batch, stream_metadata_termsheets, termsheet_to_swap
+
+
+def write_risk_file(path, sheets):
+    with pd.ExcelWriter(path) as writer:
+        for name, rows in sheets.items():
+            pd.DataFrame(rows).to_excel(writer, sheet_name=name, index=False)
+    return str(path)
+
+
+def test_interest_rate_swap_labels_map_to_economic_fields():
+    swap = termsheet_to_swap({
+        "_id": "abc",
+        "derivative_type": "Interest Rate Swap",
+        "tradeId": "IRS1",
+        "Termination Date/Maturity": "2030-01-15",
+        "Notional Amount": {"value": "1000000", "validated": True},
+    })
+    assert swap == {
+        "derivative_type": "Interest Rate Swap",
+        "tradeId": "IRS1",
+        "maturity_date": "2030-01-15",
+        "notional_amount": "1000000",
+    }
+
+
+def test_cross_currency_labels_map_to_economic_fields():
+    swap = termsheet_to_swap({
+        "derivative_type": "Cross Currency Swap",
+        "Termination Date": "2030-01-15",
+        "Notional Amount (Currency 1)": "1000000",
+        "Exchange Rate": "1.1",
+        "Payment Frequency": "Quarterly",
+    })
+    assert swap["maturity_date"] == "2030-01-15"
+    assert swap["base_notional_amount"] == "1000000"
+    assert swap["fx_spot_rate"] == "1.1"
+    assert swap["base_payment_frequency"] == swap["quote_payment_frequency"] == "Quarterly"
+
+
+def test_matching_termsheets_reconcile_clean(tmp_path):
+    risk_file = write_risk_file(tmp_path / "risk_system.xlsx", {
+        "interest_risk_swap": [{
+            "tradeId": "IRS1",
+            "effective_date": "2025-01-15",
+            "maturity_date": "2030-01-15",
+            "notional_amount": 1000000,
+            "fixed_rate": 3.5,
+            "floating_rate_index": "SOFR",
+            "payment_frequency": "Quarterly",
+            "day_count_convention": "ACT/360",
+            "reset_dates": "Quarterly",
+            "discount_curve": "USD-SOFR",
+        }],
+        "currency_risk_swap": [{
+            "tradeId": "CCS1",
+            "effective_date": "2025-01-15",
+            "maturity_date": "2030-01-15",
+            "base_notional_amount": 1000000,
+            "quote_notional_amount": 1100000,
+            "fx_spot_rate": 1.1,
+            "base_leg_fixed_rate": 3.5,
+            "quote_leg_fixed_rate": 2.5,
+            "base_payment_frequency": "Quarterly",
+            "quote_payment_frequency": "Quarterly",
+        }],
+    })
+    documents = [
+        {
+            "derivative_type": "Interest Rate Swap",
+            "tradeId": "IRS1",
+            "Effective Date": "2025-01-15",
+            "Termination Date/Maturity": "2030-01-15",
+            "Notional Amount": "1000000",
+            "Fixed Rate": "3.5",
+            "Floating Rate Index": "SOFR",
+            "Payment Frequency": "Quarterly",
+            "Day Count Convention": "ACT/360",
+            "Reset Dates": "Quarterly",
+            "Discount Curve": "USD-SOFR",
+            "Counterparty Details": "HSBC",
+        },
+        {
+            "derivative_type": "Cross Currency Swap",
+            "tradeId": "CCS1",
+            "Effective Date": "2025-01-15",
+            "Termination Date": "2030-01-15",
+            "Notional Amount (Currency 1)": "1000000",
+            "Notional Amount (Currency 2)": "1100000",
+            "Exchange Rate": "1.1",
+            "Fixed Rate (Currency 1)": "3.5",
+            "Fixed Rate (Currency 2)": "2.5",
+            "Payment Frequency": "Quarterly",
+            "Counterparty Details": "HSBC",
+        },
+    ]
+
+    rows = reconcile_batch([termsheet_to_swap(document) for document in documents], risk_file)
+
+    for row in rows:
+        assert (row["status"], row["valid"], row["anomaly_fields"]) == (200, True, ""), row
+
+
+def test_count_termsheets_counts_what_is_streamed(tmp_path):
+    for trade_id, terms in (("T1", True), ("T2", True), ("T3", False)):
+        (tmp_path / trade_id).mkdir()
+        if terms:
+            (tmp_path / trade_id / "extracted_terms.json").write_text('{"data": {}}')
+    (tmp_path / "processed_files.json").write_text("{}")
+
+    streamed = sum(len(batch) for batch in stream_metadata_termsheets(str(tmp_path)))
+    assert count_termsheets("metadata", str(tmp_path)) == streamed == 2
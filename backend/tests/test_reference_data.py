@@ -0,0 +1,77 @@
+# backend/tests/test_reference_data.py
+
+import os
+import pandas as pd
+from validators.reference_data import ReferenceData
+from validators.reference_snapshot import DIFF_FILE, HANDLED_PREFIX, snapshot_root
+
+SHEET = "interest_risk_swap"
+
+
+def write_workbook(path, rows):
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame(rows).to_excel(writer, sheet_name=SHEET, index=False)
+    # Rewrites within the same mtime tick must still count as a change
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def start(risk_file):
+    """A fresh process's view of the workbook, and the diffs its listener is given"""
+    reference_data = ReferenceData(risk_file, sheet_names=[SHEET], sheet_fields={SHEET: ["notional_amount"]})
+    diffs = []
+    reference_data.add_listener(diffs.append)
+    reference_data.snapshot()
+    return reference_data, diffs
+
+
+def handled_markers(risk_file):
+    return sorted(entry for entry in os.listdir(snapshot_root(risk_file)) if entry.startswith(HANDLED_PREFIX))
+
+
+VERSION_1 = [{"tradeId": "T1", "notional_amount": 100}, {"tradeId": "T2", "notional_amount": 200}]
+VERSION_2 = [{"tradeId": "T1", "notional_amount": 150}, {"tradeId": "T3", "notional_amount": 300}]
+
+
+def test_diff_reports_added_removed_and_changed_rows(tmp_path):
+    risk_file = str(tmp_path / "risk_system.xlsx")
+    write_workbook(risk_file, VERSION_1)
+    reference_data, diffs = start(risk_file)
+    assert diffs == []
+
+    write_workbook(risk_file, VERSION_2)
+    reference_data.snapshot()
+
+    assert len(diffs) == 1
+    assert diffs[0]["sheets"][SHEET] == {"added": ["T3"], "removed": ["T2"], "changed": ["T1"]}
+    assert reference_data.lookup(SHEET, "T1")["notional_amount"] == 150
+
+
+def test_each_change_is_handled_once_across_restarts(tmp_path):
+    risk_file = str(tmp_path / "risk_system.xlsx")
+    write_workbook(risk_file, VERSION_1)
+    start(risk_file)
+
+    # Changed while no process was running: the next start handles it, the one after does not
+    write_workbook(risk_file, VERSION_2)
+    assert len(start(risk_file)[1]) == 1
+    assert start(risk_file)[1] == []
+
+
+def test_old_markers_and_diffs_are_pruned(tmp_path):
+    risk_file = str(tmp_path / "risk_system.xlsx")
+    write_workbook(risk_file, VERSION_1)
+    reference_data, diffs = start(risk_file)
+    first_hash = reference_data.snapshot().content_hash
+
+    write_workbook(risk_file, VERSION_2)
+    second_hash = reference_data.snapshot().content_hash
+    assert handled_markers(risk_file) == [f"{HANDLED_PREFIX}{second_hash}"]
+
+    # Back to the first version: a change of its own, handled again
+    write_workbook(risk_file, VERSION_1)
+    assert reference_data.snapshot().content_hash == first_hash
+    assert len(diffs) == 2
+    assert handled_markers(risk_file) == [f"{HANDLED_PREFIX}{first_hash}"]
+    root = snapshot_root(risk_file)
+    assert sorted(os.listdir(root)) == sorted([first_hash, DIFF_FILE, f"{HANDLED_PREFIX}{first_hash}"])
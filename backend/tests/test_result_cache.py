@@ -0,0 +1,105 @@
+# backend/tests/test_result_cache.py
+
+import os
+import time
+import pandas as pd
+import pytest
+from validators.result_cache import VALIDATION_CACHE, ValidationCache, cached_validation
+
+SHEET = "interest_risk_swap"
+
+
+def write_workbook(path, rows):
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame(rows).to_excel(writer, sheet_name=SHEET, index=False)
+    # Rewrites within the same mtime tick must still count as a change
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def risk_file(tmp_path):
+    path = str(tmp_path / "risk_system.xlsx")
+    write_workbook(path, [{"tradeId": "T1", "notional_amount": 100}, {"tradeId": "T2", "notional_amount": 200}])
+    VALIDATION_CACHE.clear()
+    return path
+
+
+def counting_validator(risk_file, status=200):
+    """A cached validator that records the trades it actually validated"""
+    calls = []
+
+    @cached_validation(lambda: (risk_file, SHEET))
+    def validate(current_swap):
+        calls.append(current_swap["tradeId"])
+        return {"valid": True, "tradeId": current_swap["tradeId"]}, status
+
+    return validate, calls
+
+
+def test_repeated_validation_is_served_from_the_cache(risk_file):
+    validate, calls = counting_validator(risk_file)
+    assert validate({"tradeId": "T1"}) == ({"valid": True, "tradeId": "T1"}, 200)
+    assert validate({"tradeId": "T1"}) == ({"valid": True, "tradeId": "T1"}, 200)
+    assert calls == ["T1"]
+
+    # A different payload for the same trade is validated on its own
+    validate({"tradeId": "T1", "fixed_rate": "3.5"})
+    assert calls == ["T1", "T1"]
+
+
+def test_changed_reference_row_invalidates_only_that_trade(risk_file):
+    validate, calls = counting_validator(risk_file)
+    validate({"tradeId": "T1"})
+    validate({"tradeId": "T2"})
+
+    write_workbook(risk_file, [{"tradeId": "T1", "notional_amount": 150}, {"tradeId": "T2", "notional_amount": 200}])
+    invalidations = VALIDATION_CACHE.stats()["invalidations"]
+    validate({"tradeId": "T1"})
+    validate({"tradeId": "T2"})
+
+    assert calls == ["T1", "T2", "T1"]
+    assert VALIDATION_CACHE.stats()["invalidations"] == invalidations + 1
+
+
+def test_trade_added_to_the_workbook_is_no_longer_a_cached_404(risk_file):
+    validate, calls = counting_validator(risk_file, status=404)
+    validate({"tradeId": "T3"})
+    validate({"tradeId": "T3"})
+    assert calls == ["T3"]
+
+    write_workbook(risk_file, [{"tradeId": "T1", "notional_amount": 100}, {"tradeId": "T3", "notional_amount": 300}])
+    validate({"tradeId": "T3"})
+    assert calls == ["T3", "T3"]
+
+
+def test_missing_workbook_is_not_cached(tmp_path):
+    validate, calls = counting_validator(str(tmp_path / "missing.xlsx"), status=404)
+    validate({"tradeId": "T1"})
+    validate({"tradeId": "T1"})
+    assert calls == ["T1", "T1"]
+
+
+def test_unreadable_workbook_skips_the_cache(tmp_path):
+    risk_file = tmp_path / "risk_system.xlsx"
+    risk_file.write_bytes(b"not a zip archive")
+    validate, calls = counting_validator(str(risk_file), status=500)
+
+    VALIDATION_CACHE.clear()
+    validate({"tradeId": "T1"})
+    validate({"tradeId": "T1"})
+    assert calls == ["T1", "T1"]
+    assert VALIDATION_CACHE.stats()["entries"] == 0
+
+
+def test_cache_is_bounded_and_entries_expire(monkeypatch):
+    cache = ValidationCache(max_entries=2, ttl_seconds=60)
+    for n in range(3):
+        cache.put(("key", n), ({}, 200), (SHEET, f"t{n}"))
+    assert cache.get(("key", 0)) is None
+    assert cache.stats()["evictions"] == 1
+
+    now = time.monotonic()
+    monkeypatch.setattr("validators.result_cache.time.monotonic", lambda: now + 61)
+    assert cache.get(("key", 2)) is None
+    assert cache.stats()["expirations"] == 1
@@ -0,0 +1,48 @@
+# backend/tests/test_streaming_loader.py
+
+import math
+from datetime import datetime
+import pandas as pd
+from openpyxl import Workbook
+from validators.streaming_loader import load_sheets
+
+# Bools alone, with blanks, numbers, numeric strings, text and dates
+MIXED_COLUMNS = {
+    "tradeId": ["T1", "T2", "T3", "T4", "T5"],
+    "flags": [True, False, True, False, True],
+    "flags_blank": [True, None, False, True, None],
+    "flags_int": [True, 2, 0, False, 1],
+    "flags_float": [True, 2.5, False, 1, 0],
+    "flags_numeric_text": [True, "3", False, "4", 1],
+    "flags_text": [True, "x", False, 1, 0],
+    "flags_text_blank": [True, None, "x", 2.5, False],
+    "flags_date": [True, datetime(2024, 1, 15), False, "x", None],
+    # In text columns a 1 or 0 takes the type of the first of its equals
+    "ints_first": [1, "x", True, False, 0],
+    "bools_first": [False, 0, "x", True, 1],
+}
+
+
+def cell(value):
+    """A cell as read_excel types it; bool is kept apart from the 0/1 it equals"""
+    if isinstance(value, float) and math.isnan(value):
+        return ("nan",)
+    return (type(value) is bool, value)
+
+
+def test_mixed_columns_match_read_excel(tmp_path):
+    path = str(tmp_path / "mixed.xlsx")
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = "mixed"
+    worksheet.append(list(MIXED_COLUMNS))
+    for row in zip(*MIXED_COLUMNS.values()):
+        worksheet.append(list(row))
+    workbook.save(path)
+
+    expected = pd.read_excel(path, sheet_name="mixed")
+    columns, data = load_sheets(path, ["mixed"])["mixed"]
+
+    assert columns == list(expected.columns)
+    for column in columns:
+        assert [cell(value) for value in data[column]] == [cell(value) for value in expected[column].tolist()], column
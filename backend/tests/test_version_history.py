@@ -0,0 +1,60 @@
+# backend/tests/test_version_history.py
+
+import json
+import os
+from json_patch import apply_patch, make_patch
+from json_store import JsonStore
+from version_history import CHANGES_FILE, VersionHistory
+from version_index import VersionIndex
+
+
+def test_patch_round_trip():
+    old = {"Notional": "1,000,000", "Rate": "3.5%", "a/b": 1, "c~d": {"x": 1}, "Dropped": None}
+    new = {"Notional": "2,000,000", "Rate": "3.5%", "a/b": 2, "c~d": {"x": 2}, "Added": ["Q1", "Q2"]}
+
+    patch = make_patch(old, new)
+    assert apply_patch(old, patch) == new
+    assert apply_patch(new, make_patch(new, old)) == old
+    assert make_patch(new, new) == []
+    # Keys with "/" and "~" are escaped as RFC 6901 pointers
+    assert {op["path"] for op in patch} == {"/Notional", "/a~1b", "/c~0d", "/Dropped", "/Added"}
+
+
+def test_apply_patch_leaves_its_input_untouched():
+    data = {"terms": {"Rate": "3.5%"}}
+    patched = apply_patch(data, [{"op": "replace", "path": "/terms/Rate", "value": "4%"}])
+    assert patched == {"terms": {"Rate": "4%"}}
+    assert data == {"terms": {"Rate": "3.5%"}}
+
+
+def test_every_version_is_rebuilt_across_checkpoints(tmp_path):
+    metadata_dir = str(tmp_path / "metadata")
+    store = JsonStore()
+    history = VersionHistory(metadata_dir, VersionIndex(metadata_dir), "filename", checkpoint_interval=3, store=store)
+
+    saved = []
+    for n in range(1, 8):
+        data = {"Trade ID": "T1", "Notional": str(n * 1000), "Rate": "3.5%"}
+        if n % 2:
+            data["Odd"] = n
+        saved.append(data)
+        assert history.save("T1", data, f"t1_{n}.pdf", f"t1_{n}.json") == ("created" if n == 1 else "updated", n)
+    store.flush()
+
+    for version, data in enumerate(saved, start=1):
+        assert history.version_data("T1", version) == data
+
+    # Versions 1, 4 and 7 start a chain with a full copy; the rest are patches
+    version_files = sorted(os.listdir(os.path.join(metadata_dir, "T1", "versions")))
+    checkpoints = []
+    for name in version_files:
+        with open(os.path.join(metadata_dir, "T1", "versions", name), encoding="utf-8") as f:
+            if "data" in json.load(f):
+                checkpoints.append(int(name[1:].split("_")[0]))
+    assert sorted(checkpoints) == [1, 4, 7]
+
+    changes = history.changes("T1")
+    assert [change["version"] for change in changes] == list(range(2, 8))
+    assert changes[0]["modified"] == {"Notional": {"old": "1000", "new": "2000"}}
+    assert changes[0]["removed"] == {"Odd": 1}
+    assert os.path.exists(os.path.join(metadata_dir, "T1", CHANGES_FILE))
@@ -1,7 +1,17 @@
-import pandas as pd
 import os
-import json
-from datetime import datetime
+import numpy as np
+from validators.reference_data import get_reference_data, register_sheet_fields
+from validators.comparators import EconomicComparator
+from validators.result_cache import cached_validation
+from validators.amortization_schedule import (
+    AMOUNT_RTOL,
+    is_chronological,
+    linear_reduction_amounts,
+    parse_reduction_amounts,
+    parse_reduction_dates,
+    parse_schedule_list,
+    remaining_notional
+)
 
 # Define economic fields specific to amortized schedule swaps
 ECONOMIC_FIELDS = [
@@ -23,8 +33,26 @@ ECONOMIC_FIELDS = [
     "spread"
 ]
 
+# Mismatches on these fields are high severity, all others medium
+HIGH_SEVERITY_FIELDS = [
+    "amortization_profile", "initial_notional", "reduction_dates",
+    "reduction_amounts", "effective_date", "maturity_date"
+]
+
+# Fields that may hold JSON lists and are compared structurally
+SCHEDULE_FIELDS = ["reduction_dates", "reduction_amounts"]
+
+COMPARATOR = EconomicComparator(
+    ECONOMIC_FIELDS,
+    HIGH_SEVERITY_FIELDS,
+    numeric_fields=["initial_notional", "fixed_rate", "residual_notional", "spread"],
+    date_fields=["effective_date", "maturity_date"],
+    list_fields=SCHEDULE_FIELDS
+)
+
 RISK_FILE = "C:\\Users\\SURBHI\\Termsheet_Validation\\backend\\risk_system.xlsx"
 SHEET_NAME = 'amortized_schedule_swap'
+register_sheet_fields(SHEET_NAME, ECONOMIC_FIELDS)
 
 def load_reference_swap(trade_id):
     print(f"Looking up amortized schedule swap with trade ID: {trade_id}")
@@ -32,100 +60,13 @@ def load_reference_swap(trade_id):
         print(f"Risk file not found: {RISK_FILE}")
         return None
     try:
-        df = pd.read_excel(RISK_FILE, sheet_name=SHEET_NAME)
-        print(f"Successfully loaded Excel file with sheet: {SHEET_NAME}")
-        
-        # Find the trade ID column (case-insensitive)
-        trade_id_col = None
-        print(f"Available columns: {df.columns.tolist()}")
-        
-        for col in df.columns:
-            if col.lower() == "tradeid":
-                trade_id_col = col
-                break
-                
-        # If we can't find a column with exactly "tradeid", check for similar names
-        if trade_id_col is None:
-            for col in df.columns:
-                if "trade" in col.lower() and "id" in col.lower():
-                    trade_id_col = col
-                    break
-        
-        if trade_id_col is None:
-            print(f"Couldn't find tradeId column. Available columns: {df.columns.tolist()}")
-            return None
-            
-        # Convert to string for comparison
-        df[trade_id_col] = df[trade_id_col].astype(str).str.strip()
-        trade_id_str = str(trade_id).strip()
-        
-        print(f"Looking for tradeId: {trade_id_str}")
-        print(f"Available tradeIds: {df[trade_id_col].tolist()}")
-        
-        match = df[df[trade_id_col] == trade_id_str]
-        if not match.empty:
-            return match.iloc[0].to_dict()
-        
-        # If no exact match, try case-insensitive comparison
-        match = df[df[trade_id_col].str.lower() == trade_id_str.lower()]
-        if not match.empty:
-            return match.iloc[0].to_dict()
-            
-        return None
+        return get_reference_data(RISK_FILE).lookup(SHEET_NAME, trade_id)
     except Exception as e:
         print(f"Error loading reference swap: {e}")
         return None
 
 def compare_economic_factors(current_swap, reference_swap):
-    anomalies = []
-    for field in ECONOMIC_FIELDS:
-        # Handle potential case differences in field names
-        current_field = next((k for k in current_swap.keys() if k.lower() == field.lower()), field)
-        reference_field = next((k for k in reference_swap.keys() if k.lower() == field.lower()), field)
-        
-        # Get values - handle special case for reduction_dates and reduction_amounts which might be arrays
-        if field in ["reduction_dates", "reduction_amounts"]:
-            cur_val = current_swap.get(current_field, "")
-            ref_val = reference_swap.get(reference_field, "")
-            
-            # Convert to lists if they are strings representing JSON
-            if isinstance(cur_val, str) and (cur_val.startswith('[') or cur_val.startswith('{')):
-                try:
-                    cur_val = json.loads(cur_val)
-                except:
-                    pass
-            if isinstance(ref_val, str) and (ref_val.startswith('[') or ref_val.startswith('{')):
-                try:
-                    ref_val = json.loads(ref_val)
-                except:
-                    pass
-                    
-            # Convert to string for comparison, but special handling for arrays
-            if isinstance(cur_val, (list, dict)) and isinstance(ref_val, (list, dict)):
-                cur_val_str = json.dumps(cur_val, sort_keys=True)
-                ref_val_str = json.dumps(ref_val, sort_keys=True)
-            else:
-                cur_val_str = str(cur_val).strip()
-                ref_val_str = str(ref_val).strip()
-        else:
-            cur_val_str = str(current_swap.get(current_field, "")).strip()
-            ref_val_str = str(reference_swap.get(reference_field, "")).strip()
-        
-        if cur_val_str != ref_val_str:
-            # Determine severity based on field importance
-            severity = "high" if field in [
-                "amortization_profile", "initial_notional", "reduction_dates", 
-                "reduction_amounts", "effective_date", "maturity_date"
-            ] else "medium"
-            
-            anomalies.append({
-                "field": field,
-                "current_value": cur_val_str,
-                "reference_value": ref_val_str,
-                "issue": f"Mismatch in {field}",
-                "severity": severity
-            })
-    return anomalies
+    return COMPARATOR.compare(current_swap, reference_swap)
 
 def validate_amortization_schedule(current_swap):
     """Validates that the amortization schedule is consistent"""
@@ -135,6 +76,7 @@ def validate_amortization_schedule(current_swap):
     amortization_profile = str(current_swap.get("amortization_profile", "")).strip().lower()
     
     # Check initial notional
+    initial_notional = None
     try:
         initial_notional = float(current_swap.get("initial_notional", 0))
         if initial_notional <= 0:
@@ -153,6 +95,7 @@ def validate_amortization_schedule(current_swap):
         })
     
     # Check residual notional if present
+    residual_notional = None
     if "residual_notional" in current_swap:
         try:
             residual_notional = float(current_swap.get("residual_notional", 0))
@@ -163,7 +106,7 @@ def validate_amortization_schedule(current_swap):
                     "issue": "Residual notional cannot be negative",
                     "severity": "high"
                 })
-            if residual_notional > initial_notional:
+            if initial_notional is not None and residual_notional > initial_notional:
                 anomalies.append({
                     "field": "residual_notional",
                     "current_value": str(residual_notional),
@@ -181,34 +124,26 @@ def validate_amortization_schedule(current_swap):
     
     # Check reduction dates and amounts if custom schedule
     if amortization_profile == "custom" or amortization_profile == "custom schedule":
-        # Get reduction dates and amounts
-        reduction_dates = current_swap.get("reduction_dates", [])
-        reduction_amounts = current_swap.get("reduction_amounts", [])
+        # Decode the schedule once; JSON strings become lists
+        raw_dates = current_swap.get("reduction_dates", [])
+        raw_amounts = current_swap.get("reduction_amounts", [])
+        reduction_dates, dates_valid_json = parse_schedule_list(raw_dates)
+        reduction_amounts, amounts_valid_json = parse_schedule_list(raw_amounts)
         
-        # Convert to lists if they are strings representing JSON
-        if isinstance(reduction_dates, str):
-            try:
-                reduction_dates = json.loads(reduction_dates)
-            except:
-                anomalies.append({
-                    "field": "reduction_dates",
-                    "current_value": reduction_dates,
-                    "issue": "Invalid JSON format for reduction dates",
-                    "severity": "high"
-                })
-                reduction_dates = []
-                
-        if isinstance(reduction_amounts, str):
-            try:
-                reduction_amounts = json.loads(reduction_amounts)
-            except:
-                anomalies.append({
-                    "field": "reduction_amounts",
-                    "current_value": reduction_amounts,
-                    "issue": "Invalid JSON format for reduction amounts",
-                    "severity": "high"
-                })
-                reduction_amounts = []
+        if not dates_valid_json:
+            anomalies.append({
+                "field": "reduction_dates",
+                "current_value": raw_dates,
+                "issue": "Invalid JSON format for reduction dates",
+                "severity": "high"
+            })
+        if not amounts_valid_json:
+            anomalies.append({
+                "field": "reduction_amounts",
+                "current_value": raw_amounts,
+                "issue": "Invalid JSON format for reduction amounts",
+                "severity": "high"
+            })
         
         # Check that both are lists
         if not isinstance(reduction_dates, list):
@@ -228,10 +163,12 @@ def validate_amortization_schedule(current_swap):
             })
             
         # Check that lists have the same length
-        if len(reduction_dates) != len(reduction_amounts):
+        dates_count = len(reduction_dates) if isinstance(reduction_dates, (list, dict)) else 0
+        amounts_count = len(reduction_amounts) if isinstance(reduction_amounts, (list, dict)) else 0
+        if dates_count != amounts_count:
             anomalies.append({
                 "field": "amortization_schedule",
-                "current_value": f"Dates: {len(reduction_dates)}, Amounts: {len(reduction_amounts)}",
+                "current_value": f"Dates: {dates_count}, Amounts: {amounts_count}",
                 "issue": "Reduction dates and amounts must have the same length",
                 "severity": "high"
             })
@@ -239,8 +176,8 @@ def validate_amortization_schedule(current_swap):
         # Check that dates are in chronological order
         if isinstance(reduction_dates, list) and len(reduction_dates) > 1:
             try:
-                dates = [datetime.strptime(date, "%Y-%m-%d") if isinstance(date, str) else date for date in reduction_dates]
-                if not all(dates[i] < dates[i+1] for i in range(len(dates)-1)):
+                dates = parse_reduction_dates(reduction_dates)
+                if not is_chronological(dates):
                     anomalies.append({
                         "field": "reduction_dates",
                         "current_value": str(reduction_dates),
@@ -256,9 +193,11 @@ def validate_amortization_schedule(current_swap):
                 })
                 
         # Check that amounts are positive
+        amounts = None
         if isinstance(reduction_amounts, list):
             try:
-                if not all(float(amount) > 0 for amount in reduction_amounts):
+                amounts = parse_reduction_amounts(reduction_amounts)
+                if not bool(np.all(amounts > 0)):
                     anomalies.append({
                         "field": "reduction_amounts",
                         "current_value": str(reduction_amounts),
@@ -273,19 +212,26 @@ def validate_amortization_schedule(current_swap):
                     "severity": "high"
                 })
                 
-        # Check if total reduction exceeds initial notional
-        if isinstance(reduction_amounts, list) and initial_notional > 0:
-            try:
-                total_reduction = sum(float(amount) for amount in reduction_amounts)
-                if total_reduction > initial_notional:
+        # Check cumulative reduction against initial and residual notional
+        if amounts is not None and initial_notional is not None and initial_notional > 0:
+            total_reduction = float(amounts.sum())
+            if total_reduction > initial_notional:
+                anomalies.append({
+                    "field": "amortization_schedule",
+                    "current_value": f"Total reduction: {total_reduction}, Initial notional: {initial_notional}",
+                    "issue": "Total reduction amount exceeds initial notional",
+                    "severity": "high"
+                })
+            elif residual_notional is not None and len(amounts):
+                final_notional = float(remaining_notional(initial_notional, amounts)[-1])
+                if not np.isclose(final_notional, residual_notional, rtol=AMOUNT_RTOL):
                     anomalies.append({
-                        "field": "amortization_schedule",
-                        "current_value": f"Total reduction: {total_reduction}, Initial notional: {initial_notional}",
-                        "issue": "Total reduction amount exceeds initial notional",
-                        "severity": "high"
+                        "field": "residual_notional",
+                        "current_value": str(residual_notional),
+                        "expected_value": str(final_notional),
+                        "issue": "Residual notional does not match initial notional less total reductions",
+                        "severity": "medium"
                     })
-            except (ValueError, TypeError):
-                pass  # Already handled above
     
     # For linear amortization, check if necessary fields are present
     elif amortization_profile == "linear":
@@ -295,6 +241,28 @@ def validate_amortization_schedule(current_swap):
                 "issue": "Payment frequency required for linear amortization",
                 "severity": "medium"
             })
+        
+        # If a schedule is given, it must match the expected linear one
+        reduction_amounts, _ = parse_schedule_list(current_swap.get("reduction_amounts", []))
+        if isinstance(reduction_amounts, list) and reduction_amounts and initial_notional is not None and initial_notional > 0:
+            try:
+                amounts = parse_reduction_amounts(reduction_amounts)
+                expected = linear_reduction_amounts(initial_notional, residual_notional or 0.0, len(amounts))
+                if not np.allclose(amounts, expected, rtol=AMOUNT_RTOL):
+                    anomalies.append({
+                        "field": "reduction_amounts",
+                        "current_value": str(reduction_amounts),
+                        "expected_value": str(expected.tolist()),
+                        "issue": "Reduction amounts do not follow a linear amortization profile",
+                        "severity": "medium"
+                    })
+            except (ValueError, TypeError):
+                anomalies.append({
+                    "field": "reduction_amounts",
+                    "current_value": str(reduction_amounts),
+                    "issue": "Invalid amount format in reduction amounts",
+                    "severity": "high"
+                })
     
     return anomalies
 
@@ -399,6 +367,14 @@ def validate_payment_adjustment(current_swap):
     
     return anomalies
 
+# Internal consistency checks run for every amortized swap, in report order
+INTERNAL_RULES = [
+    validate_amortization_schedule,
+    validate_rate_specifications,
+    validate_payment_adjustment
+]
+
+@cached_validation(lambda: (RISK_FILE, SHEET_NAME))
 def validate_amortized_swap_against_risk_file(current_swap):
     # First identify the trade ID field in the current swap (case-insensitive)
     trade_id_field = None
@@ -417,17 +393,29 @@ def validate_amortized_swap_against_risk_file(current_swap):
         return {"error": "tradeId is required"}, 400
 
     # Perform internal validations
-    amortization_anomalies = validate_amortization_schedule(current_swap)
-    rate_anomalies = validate_rate_specifications(current_swap)
-    payment_anomalies = validate_payment_adjustment(current_swap)
-    
-    internal_anomalies = amortization_anomalies + rate_anomalies + payment_anomalies
+    internal_anomalies = run_internal_validations(current_swap)
     
     # Check against reference data
     reference_swap = load_reference_swap(trade_id)
     print(f"Reference swap found: {reference_swap is not None}")
     
     if reference_swap is None:
+        return build_validation_result(trade_id, internal_anomalies, None)
+
+    # Compare with reference swap
+    reference_anomalies = compare_economic_factors(current_swap, reference_swap)
+    return build_validation_result(trade_id, internal_anomalies, reference_anomalies)
+
+def run_internal_validations(current_swap):
+    """Checks an amortized swap for internal consistency, without the risk file"""
+    anomalies = []
+    for rule in INTERNAL_RULES:
+        anomalies.extend(rule(current_swap))
+    return anomalies
+
+def build_validation_result(trade_id, internal_anomalies, reference_anomalies):
+    """Builds the response for a swap; reference_anomalies is None when the trade is not in the risk file"""
+    if reference_anomalies is None:
         if internal_anomalies:
             return {
                 "valid": False,
@@ -440,9 +428,6 @@ def validate_amortized_swap_against_risk_file(current_swap):
                 "message": f"No reference swap found in risk file for tradeId {trade_id}."
             }, 404
 
-    # Compare with reference swap
-    reference_anomalies = compare_economic_factors(current_swap, reference_swap)
-    
     # Combine all anomalies
     all_anomalies = internal_anomalies + reference_anomalies
     
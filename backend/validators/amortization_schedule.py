@@ -0,0 +1,65 @@
+import re
+import json
+from datetime import datetime
+import numpy as np
+
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# Relative tolerance when checking amounts that are derived from other amounts
+AMOUNT_RTOL = 1e-6
+
+
+def parse_schedule_list(value):
+    """
+    Decodes a reduction dates/amounts value once. Returns (values, valid_json);
+    strings that are not valid JSON come back as an empty list.
+    """
+    if isinstance(value, str):
+        try:
+            return json.loads(value), True
+        except ValueError:
+            return [], False
+    return value, True
+
+
+def parse_reduction_dates(values):
+    """
+    Converts reduction dates to a datetime64[us] array. ISO date strings are
+    parsed in one vectorized call; anything else falls back to strptime like
+    before. Raises ValueError or TypeError for dates that cannot be parsed.
+    """
+    if all(isinstance(value, str) and ISO_DATE.match(value) for value in values):
+        return np.array(values, dtype="datetime64[D]").astype("datetime64[us]")
+
+    parsed = [datetime.strptime(value, "%Y-%m-%d") if isinstance(value, str) else value for value in values]
+    dates = np.array(parsed, dtype="datetime64[us]")
+    if np.isnat(dates).any():
+        raise ValueError("missing reduction date")
+    return dates
+
+
+def parse_reduction_amounts(values):
+    """Converts reduction amounts to a float64 array, raising like float() would"""
+    if any(value is None for value in values):
+        raise TypeError("missing reduction amount")
+    amounts = np.array(values, dtype=np.float64)
+    if amounts.ndim != 1:
+        raise TypeError("reduction amounts must be scalars")
+    return amounts
+
+
+def is_chronological(dates):
+    """Strictly increasing dates"""
+    return bool(np.all(np.diff(dates) > np.timedelta64(0, "us")))
+
+
+def remaining_notional(initial_notional, amounts):
+    """Notional outstanding after each reduction"""
+    return initial_notional - np.cumsum(amounts)
+
+
+def linear_reduction_amounts(initial_notional, residual_notional, periods):
+    """Equal reductions taking the notional from initial to residual over the schedule"""
+    if periods <= 0:
+        return np.empty(0, dtype=np.float64)
+    return np.full(periods, (initial_notional - residual_notional) / periods, dtype=np.float64)
@@ -0,0 +1,163 @@
+import os
+import numpy as np
+import pandas as pd
+from validators.comparators import fold_keys, normalize_list_pair
+from validators.products import PRODUCT_VALIDATORS, get_trade_id, resolve_product
+from validators.reference_data import get_reference_data, normalize_trade_id
+
+
+def _reference_sheet(validator, risk_file=None):
+    risk_file = risk_file or validator.RISK_FILE
+    if not os.path.exists(risk_file):
+        print(f"Risk file not found: {risk_file}")
+        return None
+    try:
+        return get_reference_data(risk_file).sheet(validator.SHEET_NAME)
+    except Exception as e:
+        print(f"Error loading reference sheet {validator.SHEET_NAME}: {e}")
+        return None
+
+
+def _match_reference_rows(keys, sheet):
+    """
+    Joins trade IDs to row positions of the reference sheet with one merge,
+    then retries the misses case-insensitively. Returns an int array with -1
+    for trades that are not in the sheet.
+    """
+    reference = pd.DataFrame({
+        "_key": list(sheet.data[sheet.trade_id_col]),
+        "_pos": np.arange(len(sheet))
+    })
+    swaps = pd.DataFrame({"_key": keys})
+
+    # Keep the first row for duplicated trade IDs, like a single lookup does
+    exact = swaps.merge(reference.drop_duplicates("_key"), on="_key", how="left")
+    positions = exact["_pos"].fillna(-1).to_numpy(dtype=np.int64)
+
+    missing = positions < 0
+    if missing.any():
+        reference["_key"] = reference["_key"].str.lower()
+        folded = pd.DataFrame({"_key": swaps["_key"][missing].str.lower()})
+        folded = folded.merge(reference.drop_duplicates("_key"), on="_key", how="left")
+        positions[missing] = folded["_pos"].fillna(-1).to_numpy(dtype=np.int64)
+
+    return positions
+
+
+def _compare_batch(comparator, swaps, reference_frame, positions):
+    """
+    Compares all economic fields of matched swaps against their reference
+    rows column by column. Returns one anomaly list per swap, in field order.
+    """
+    accessors = comparator.accessors
+
+    reference_columns = fold_keys(reference_frame.columns)
+
+    current_raw = [[] for _ in accessors]
+    for swap in swaps:
+        folded = fold_keys(swap)
+        for j, (field, folded_field, _, _, _) in enumerate(accessors):
+            current_raw[j].append(swap.get(folded.get(folded_field, field), ""))
+
+    rows = reference_frame.iloc[positions]
+    current_matrix = np.empty((len(swaps), len(accessors)), dtype=object)
+    reference_matrix = np.empty((len(swaps), len(accessors)), dtype=object)
+    for j, (_, folded_field, kind, normalizer, _) in enumerate(accessors):
+        ref_col = reference_columns.get(folded_field)
+        reference_raw = rows[ref_col].tolist() if ref_col is not None else [""] * len(swaps)
+        if kind == "list":
+            pairs = [normalize_list_pair(cur, ref) for cur, ref in zip(current_raw[j], reference_raw)]
+            current_matrix[:, j] = [cur for cur, _ in pairs]
+            reference_matrix[:, j] = [ref for _, ref in pairs]
+        else:
+            current_matrix[:, j] = [normalizer(value) for value in current_raw[j]]
+            reference_matrix[:, j] = [normalizer(value) for value in reference_raw]
+
+    mismatches = current_matrix != reference_matrix
+
+    anomalies = []
+    for i in range(len(swaps)):
+        swap_anomalies = []
+        for j in np.flatnonzero(mismatches[i]):
+            field, _, _, _, severity = accessors[j]
+            swap_anomalies.append({
+                "field": field,
+                "current_value": current_matrix[i, j],
+                "reference_value": reference_matrix[i, j],
+                "issue": f"Mismatch in {field}",
+                "severity": severity
+            })
+        anomalies.append(swap_anomalies)
+    return anomalies
+
+
+def _validate_product_batch(validator, items, results, risk_file=None):
+    # A swap whose internal checks fail is reported on its own, not for the whole batch
+    checked = []
+    internal = []
+    for index, swap, trade_id in items:
+        try:
+            internal.append(validator.run_internal_validations(swap))
+            checked.append((index, swap, trade_id))
+        except Exception as e:
+            results[index] = ({"error": str(e)}, 500)
+    items = checked
+
+    sheet = _reference_sheet(validator, risk_file)
+    if sheet is None or sheet.trade_id_col is None or len(sheet) == 0:
+        for (index, _, trade_id), internal_anomalies in zip(items, internal):
+            results[index] = validator.build_validation_result(trade_id, internal_anomalies, None)
+        return
+
+    keys = [normalize_trade_id(trade_id) for _, _, trade_id in items]
+    positions = _match_reference_rows(keys, sheet)
+    matched = np.flatnonzero(positions >= 0)
+
+    reference_anomalies = [None] * len(items)
+    if len(matched):
+        compared = _compare_batch(
+            validator.COMPARATOR,
+            [items[i][1] for i in matched],
+            sheet.frame(),
+            positions[matched]
+        )
+        for i, anomalies in zip(matched, compared):
+            reference_anomalies[i] = anomalies
+
+    for (index, _, trade_id), internal_anomalies, anomalies in zip(items, internal, reference_anomalies):
+        results[index] = validator.build_validation_result(trade_id, internal_anomalies, anomalies)
+
+
+def validate_swaps_against_risk_file(swaps, risk_file=None):
+    """
+    Validates many swaps at once. Swaps are grouped by derivative_type, each
+    group is joined to its risk sheet in one merge, and economic fields are
+    compared column-wise. Returns a (result, status) pair per swap, in input
+    order, matching what the single-swap validators return. risk_file
+    replaces the validators' RISK_FILE for this call only.
+    """
+    results = [None] * len(swaps)
+    groups = {}
+
+    for index, swap in enumerate(swaps):
+        if not isinstance(swap, dict):
+            results[index] = ({"error": "Each swap must be a JSON object"}, 400)
+            continue
+
+        trade_id = get_trade_id(swap)
+        if not trade_id:
+            results[index] = ({"error": "tradeId is required"}, 400)
+            continue
+
+        product = resolve_product(swap)
+        if product is None:
+            results[index] = ({"error": "Unsupported derivative_type for swap validation"}, 400)
+            continue
+
+        groups.setdefault(product, []).append((index, swap, trade_id))
+
+    for product, items in groups.items():
+        print(f"Validating {len(items)} swaps of type {product}")
+        _validate_product_batch(PRODUCT_VALIDATORS[product], items, results, risk_file)
+
+    return results
@@ -0,0 +1,100 @@
+import json
+
+
+def fold_keys(record):
+    """Maps lowercased keys to the record's own keys, first occurrence wins"""
+    folded = {}
+    for key in record:
+        folded.setdefault(key.lower(), key)
+    return folded
+
+
+# Normalizers turn a raw value into the string that is compared and reported.
+# They must render values exactly like str(value).strip() did, so the anomaly
+# dicts stay the same; the typed ones only skip work they know is unnecessary.
+
+def normalize_text(value):
+    return str(value).strip()
+
+
+def normalize_numeric(value):
+    # str() of a number never has surrounding whitespace
+    if type(value) in (int, float):
+        return str(value)
+    return str(value).strip()
+
+
+def normalize_date(value):
+    if type(value) is str:
+        return value.strip()
+    return str(value).strip()
+
+
+def _parse_list(value):
+    # Convert to lists if they are strings representing JSON
+    if isinstance(value, str) and (value.startswith('[') or value.startswith('{')):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+    return value
+
+
+def normalize_list_pair(cur_val, ref_val):
+    """Lists are compared structurally only when both sides are lists/dicts"""
+    cur_val = _parse_list(cur_val)
+    ref_val = _parse_list(ref_val)
+    if isinstance(cur_val, (list, dict)) and isinstance(ref_val, (list, dict)):
+        return json.dumps(cur_val, sort_keys=True), json.dumps(ref_val, sort_keys=True)
+    return str(cur_val).strip(), str(ref_val).strip()
+
+
+class EconomicComparator:
+    """
+    Compares a swap with its reference row on a fixed list of economic fields.
+
+    Everything that only depends on the product schema (folded field names,
+    normalizers, severities) is worked out once when the comparator is built.
+    Each comparison then folds the keys of both records once instead of
+    scanning all keys for every field.
+    """
+
+    def __init__(self, fields, high_severity_fields, numeric_fields=(), date_fields=(), list_fields=()):
+        self.fields = list(fields)
+        self.accessors = []
+        for field in self.fields:
+            if field in list_fields:
+                kind, normalizer = "list", None
+            elif field in numeric_fields:
+                kind, normalizer = "numeric", normalize_numeric
+            elif field in date_fields:
+                kind, normalizer = "date", normalize_date
+            else:
+                kind, normalizer = "text", normalize_text
+            severity = "high" if field in high_severity_fields else "medium"
+            self.accessors.append((field, field.lower(), kind, normalizer, severity))
+
+    def compare(self, current_swap, reference_swap):
+        current_keys = fold_keys(current_swap)
+        reference_keys = fold_keys(reference_swap)
+
+        anomalies = []
+        for field, folded, kind, normalizer, severity in self.accessors:
+            cur_val = current_swap.get(current_keys.get(folded, field), "")
+            ref_val = reference_swap.get(reference_keys.get(folded, field), "")
+
+            if kind == "list":
+                cur_val_str, ref_val_str = normalize_list_pair(cur_val, ref_val)
+            else:
+                cur_val_str = normalizer(cur_val)
+                ref_val_str = normalizer(ref_val)
+
+            if cur_val_str != ref_val_str:
+                anomalies.append({
+                    "field": field,
+                    "current_value": cur_val_str,
+                    "reference_value": ref_val_str,
+                    "issue": f"Mismatch in {field}",
+                    "severity": severity
+                })
+        return anomalies
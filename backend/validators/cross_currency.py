@@ -1,5 +1,7 @@
-import pandas as pd
 import os
+from validators.reference_data import get_reference_data, register_sheet_fields
+from validators.comparators import EconomicComparator
+from validators.result_cache import cached_validation
 
 # Define economic fields specific to currency swaps
 ECONOMIC_FIELDS = [
@@ -27,8 +29,25 @@ ECONOMIC_FIELDS = [
     "maturity_date"
 ]
 
+# Mismatches on these fields are high severity, all others medium
+HIGH_SEVERITY_FIELDS = [
+    "base_currency", "quote_currency", "base_notional_amount",
+    "quote_notional_amount", "fx_spot_rate", "effective_date", "maturity_date"
+]
+
+COMPARATOR = EconomicComparator(
+    ECONOMIC_FIELDS,
+    HIGH_SEVERITY_FIELDS,
+    numeric_fields=[
+        "base_notional_amount", "quote_notional_amount", "base_leg_fixed_rate",
+        "quote_leg_fixed_rate", "basis_spread", "fx_spot_rate"
+    ],
+    date_fields=["effective_date", "maturity_date"]
+)
+
 RISK_FILE = "C:\\Users\\SURBHI\\Termsheet_Validation\\backend\\risk_system.xlsx"
 SHEET_NAME = 'currency_risk_swap'
+register_sheet_fields(SHEET_NAME, ECONOMIC_FIELDS)
 
 def load_reference_swap(trade_id):
     print(f"Looking up currency swap with trade ID: {trade_id}")
@@ -36,75 +55,13 @@ def load_reference_swap(trade_id):
         print(f"Risk file not found: {RISK_FILE}")
         return None
     try:
-        df = pd.read_excel(RISK_FILE, sheet_name=SHEET_NAME)
-        print(f"Successfully loaded Excel file with sheet: {SHEET_NAME}")
-        
-        # Find the trade ID column (case-insensitive)
-        trade_id_col = None
-        print(f"Available columns: {df.columns.tolist()}")
-        
-        for col in df.columns:
-            if col.lower() == "tradeid":
-                trade_id_col = col
-                break
-                
-        # If we can't find a column with exactly "tradeid", check for similar names
-        if trade_id_col is None:
-            for col in df.columns:
-                if "trade" in col.lower() and "id" in col.lower():
-                    trade_id_col = col
-                    break
-        
-        if trade_id_col is None:
-            print(f"Couldn't find tradeId column. Available columns: {df.columns.tolist()}")
-            return None
-            
-        # Convert to string for comparison
-        df[trade_id_col] = df[trade_id_col].astype(str).str.strip()
-        trade_id_str = str(trade_id).strip()
-        
-        print(f"Looking for tradeId: {trade_id_str}")
-        print(f"Available tradeIds: {df[trade_id_col].tolist()}")
-        
-        match = df[df[trade_id_col] == trade_id_str]
-        if not match.empty:
-            return match.iloc[0].to_dict()
-        
-        # If no exact match, try case-insensitive comparison
-        match = df[df[trade_id_col].str.lower() == trade_id_str.lower()]
-        if not match.empty:
-            return match.iloc[0].to_dict()
-            
-        return None
+        return get_reference_data(RISK_FILE).lookup(SHEET_NAME, trade_id)
     except Exception as e:
         print(f"Error loading reference swap: {e}")
         return None
 
 def compare_economic_factors(current_swap, reference_swap):
-    anomalies = []
-    for field in ECONOMIC_FIELDS:
-        # Handle potential case differences in field names
-        current_field = next((k for k in current_swap.keys() if k.lower() == field.lower()), field)
-        reference_field = next((k for k in reference_swap.keys() if k.lower() == field.lower()), field)
-        
-        cur_val = str(current_swap.get(current_field, "")).strip()
-        ref_val = str(reference_swap.get(reference_field, "")).strip()
-        
-        if cur_val != ref_val:
-            # Determine severity based on field importance
-            severity = "high" if field in [
-                "base_currency", "quote_currency", "base_notional_amount", 
-                "quote_notional_amount", "fx_spot_rate", "effective_date", "maturity_date"
-            ] else "medium"
-            
-            anomalies.append({
-                "field": field,
-                "current_value": cur_val,
-                "reference_value": ref_val,
-                "issue": f"Mismatch in {field}",
-                "severity": severity
-            })
-    return anomalies
+    return COMPARATOR.compare(current_swap, reference_swap)
 
 def validate_currency_notionals(current_swap, fx_tolerance=0.0001):
     """Validates that the notional amounts are consistent with the FX spot rate"""
@@ -142,6 +99,7 @@ def validate_currency_notionals(current_swap, fx_tolerance=0.0001):
             "severity": "high"
         }]
 
+@cached_validation(lambda: (RISK_FILE, SHEET_NAME))
 def validate_currency_swap_against_risk_file(current_swap):
     # First identify the trade ID field in the current swap (case-insensitive)
     trade_id_field = None
@@ -160,17 +118,33 @@ def validate_currency_swap_against_risk_file(current_swap):
         return {"error": "tradeId is required"}, 400
 
     # Internal validation for currency notionals consistency
-    notional_anomalies = validate_currency_notionals(current_swap)
+    notional_anomalies = run_internal_validations(current_swap)
     
     # Check against reference data
     reference_swap = load_reference_swap(trade_id)
     print(f"Reference swap found: {reference_swap is not None}")
     
     if reference_swap is None:
-        if notional_anomalies:
+        return build_validation_result(trade_id, notional_anomalies, None)
+
+    # Compare with reference swap
+    economic_anomalies = compare_economic_factors(current_swap, reference_swap)
+    return build_validation_result(trade_id, notional_anomalies, economic_anomalies)
+
+def run_internal_validations(current_swap):
+    """Checks a currency swap for internal consistency, without the risk file"""
+    anomalies = []
+    for rule in INTERNAL_RULES:
+        anomalies.extend(rule(current_swap))
+    return anomalies
+
+def build_validation_result(trade_id, internal_anomalies, reference_anomalies):
+    """Builds the response for a swap; reference_anomalies is None when the trade is not in the risk file"""
+    if reference_anomalies is None:
+        if internal_anomalies:
             return {
                 "valid": False,
-                "anomalies": notional_anomalies,
+                "anomalies": internal_anomalies,
                 "message": f"No reference swap found in risk file for tradeId {trade_id}, and internal validation found issues."
             }, 404
         else:
@@ -179,11 +153,8 @@ def validate_currency_swap_against_risk_file(current_swap):
                 "message": f"No reference swap found in risk file for tradeId {trade_id}."
             }, 404
 
-    # Compare with reference swap
-    economic_anomalies = compare_economic_factors(current_swap, reference_swap)
-    
     # Combine all anomalies
-    all_anomalies = notional_anomalies + economic_anomalies
+    all_anomalies = internal_anomalies + reference_anomalies
     
     if all_anomalies:
         return {
@@ -201,7 +172,7 @@ def validate_currency_swap_against_risk_file(current_swap):
 
 def validate_principal_exchange_consistency(current_swap):
     """Validates that principal exchange flags are consistent with amortization"""
-    has_amortization = current_swap.get("amortization_schedule", "").strip().lower() not in ["", "none", "bullet"]
+    has_amortization = str(current_swap.get("amortization_schedule", "")).strip().lower() not in ["", "none", "bullet"]
     initial_exchange = str(current_swap.get("principal_exchange_initial", "")).strip().lower() == "true"
     final_exchange = str(current_swap.get("principal_exchange_final", "")).strip().lower() == "true"
     
@@ -278,4 +249,11 @@ def validate_leg_rate_types(current_swap):
             "severity": "high"
         })
     
-    return anomalies
\ No newline at end of file
+    return anomalies
+
+# Internal consistency checks run for every currency swap, in report order
+INTERNAL_RULES = [
+    validate_currency_notionals,
+    validate_principal_exchange_consistency,
+    validate_leg_rate_types
+]
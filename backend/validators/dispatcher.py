@@ -0,0 +1,73 @@
+import time
+from validators.products import PRODUCT_VALIDATORS, get_trade_id, resolve_product
+
+
+def normalize_swap(swap):
+    """Lowercases every key once so rules and lookups can use plain field names"""
+    record = {}
+    for key, value in swap.items():
+        record.setdefault(key.lower(), value)
+    return record
+
+
+def _run_rule(name, rule, record, timings):
+    start = time.perf_counter()
+    try:
+        anomalies = rule(record)
+    except Exception as e:
+        anomalies = [{
+            "field": name,
+            "issue": f"Error running {name}: {str(e)}",
+            "severity": "high"
+        }]
+    timings.append({"rule": name, "ms": round((time.perf_counter() - start) * 1000, 3)})
+    return anomalies
+
+
+def validate(swap):
+    """
+    Validates a swap with every rule of its product, picked from derivative_type.
+
+    The swap is normalized once and looked up in the risk file once; the
+    internal rules and the reference comparison then run in one pass over a
+    single rule table, and each rule's run time is reported under "timings"
+    so slow checks stand out.
+    """
+    start = time.perf_counter()
+
+    trade_id = get_trade_id(swap)
+    if not trade_id:
+        return {"error": "tradeId is required"}, 400
+
+    product = resolve_product(swap)
+    if product is None:
+        return {"error": "Unsupported derivative_type for swap validation"}, 400
+
+    validator = PRODUCT_VALIDATORS[product]
+    record = normalize_swap(swap)
+    timings = []
+
+    lookup_start = time.perf_counter()
+    reference_swap = validator.load_reference_swap(trade_id)
+    timings.append({"rule": "load_reference_swap", "ms": round((time.perf_counter() - lookup_start) * 1000, 3)})
+
+    # (name, rule, whether its anomalies come from the reference comparison)
+    rules = [(rule.__name__, rule, False) for rule in validator.INTERNAL_RULES]
+    if reference_swap is not None:
+        rules.append((
+            "compare_economic_factors",
+            lambda current: validator.compare_economic_factors(current, reference_swap),
+            True
+        ))
+
+    internal_anomalies = []
+    reference_anomalies = [] if reference_swap is not None else None
+    for name, rule, is_reference in rules:
+        anomalies = _run_rule(name, rule, record, timings)
+        (reference_anomalies if is_reference else internal_anomalies).extend(anomalies)
+
+    result, status = validator.build_validation_result(trade_id, internal_anomalies, reference_anomalies)
+    result["derivative_type"] = product
+    result["timings"] = timings
+    result["total_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return result, status
@@ -0,0 +1,37 @@
+from validators import swap_validator, cross_currency, amortised_swaps
+
+# Validator module per derivative type, keyed like derivative_parameters.DERIVATIVE_PARAMETERS
+PRODUCT_VALIDATORS = {
+    "Interest Rate Swap": swap_validator,
+    "Cross Currency Swap": cross_currency,
+    "Amortised Schedule Swap": amortised_swaps
+}
+
+# /validate_swap has always treated untyped payloads as vanilla swaps
+DEFAULT_PRODUCT = "Interest Rate Swap"
+
+
+def find_field(record, name):
+    """Returns the key of a field in a record (case-insensitive), or None"""
+    for key in record:
+        if key.lower() == name.lower():
+            return key
+    return None
+
+
+def get_trade_id(record):
+    trade_id_field = find_field(record, "tradeId")
+    return record.get(trade_id_field) if trade_id_field is not None else None
+
+
+def resolve_product(record):
+    """Returns the product name for a swap payload, or None if it is not supported"""
+    type_field = find_field(record, "derivative_type")
+    derivative_type = record.get(type_field) if type_field is not None else None
+    if not derivative_type:
+        return DEFAULT_PRODUCT
+
+    for product in PRODUCT_VALIDATORS:
+        if product.lower() == str(derivative_type).strip().lower():
+            return product
+    return None
@@ -0,0 +1,331 @@
+import os
+import threading
+from datetime import datetime
+import pandas as pd
+from validators.streaming_loader import load_sheets
+from validators.reference_snapshot import (
+    claim_diff,
+    file_content_hash,
+    list_snapshots,
+    read_diff,
+    read_snapshot,
+    row_digests,
+    write_diff,
+    write_snapshot
+)
+
+# Sheets of the risk system workbook used by the validators
+RISK_SHEETS = [
+    "interest_risk_swap",
+    "currency_risk_swap",
+    "amortized_schedule_swap"
+]
+
+# Columns each sheet is loaded with besides tradeId, registered by the
+# validators that read it. Sheets nobody registered keep every column.
+SHEET_FIELDS = {}
+
+
+def register_sheet_fields(sheet_name, fields):
+    """Declares the reference columns a validator compares for a sheet"""
+    SHEET_FIELDS[sheet_name] = sorted(set(SHEET_FIELDS.get(sheet_name, [])) | set(fields))
+
+
+def find_trade_id_column(columns):
+    """Returns the trade ID column of a sheet (case-insensitive), or None"""
+    for col in columns:
+        if str(col).lower() == "tradeid":
+            return col
+
+    # If we can't find a column with exactly "tradeid", check for similar names
+    for col in columns:
+        if "trade" in str(col).lower() and "id" in str(col).lower():
+            return col
+
+    return None
+
+
+def normalize_trade_id(trade_id):
+    return str(trade_id).strip()
+
+
+class SheetIndex:
+    """Rows of one risk sheet indexed by normalized tradeId"""
+
+    def __init__(self, name, columns, data, trade_id_col, digests=None):
+        self.name = name
+        self.columns = columns
+        self.data = data
+        self.trade_id_col = trade_id_col
+        self.digests = digests
+        self.exact = {}
+        self.folded = {}
+        self._frame = None
+
+        if trade_id_col is not None:
+            for pos, trade_id in enumerate(data[trade_id_col]):
+                # Keep the first row for duplicated trade IDs, like the old mask scan did
+                self.exact.setdefault(trade_id, pos)
+                self.folded.setdefault(trade_id.lower(), pos)
+
+    def __len__(self):
+        return len(self.data[self.trade_id_col]) if self.trade_id_col is not None else 0
+
+    def row(self, pos):
+        return {col: self.data[col][pos] for col in self.columns}
+
+    def find(self, trade_id):
+        trade_id_str = normalize_trade_id(trade_id)
+        pos = self.exact.get(trade_id_str)
+        if pos is None:
+            # If no exact match, try case-insensitive comparison
+            pos = self.folded.get(trade_id_str.lower())
+        return pos
+
+    def lookup(self, trade_id):
+        pos = self.find(trade_id)
+        return self.row(pos) if pos is not None else None
+
+    def row_version(self, pos):
+        """Digest of a row's contents; changes whenever the row is edited"""
+        return self.digests[pos].hex() if self.digests is not None else None
+
+    def trade_versions(self):
+        """{tradeId: row digest} for the row each tradeId resolves to"""
+        if self.digests is None:
+            return {}
+        return {trade_id: bytes(self.digests[pos]) for trade_id, pos in self.exact.items()}
+
+    def frame(self):
+        """The whole sheet as a DataFrame, built on first use"""
+        if self._frame is None:
+            self._frame = pd.DataFrame({col: list(self.data[col]) for col in self.columns}, columns=self.columns)
+        return self._frame
+
+
+class ReferenceSnapshot:
+    """Immutable view of all risk sheets at one version of the workbook"""
+
+    def __init__(self, signature, content_hash, sheets, diff=None, notify=False):
+        self.signature = signature
+        self.content_hash = content_hash
+        self.sheets = sheets
+        # Changes relative to the previous workbook version, if known
+        self.diff = diff
+        # Whether listeners still have to handle diff
+        self.notify = notify
+
+
+def build_sheet_index(name, columns, data):
+    return SheetIndex(name, columns, data, find_trade_id_column(columns), row_digests(columns, data))
+
+
+def index_stored_sheets(stored):
+    return {
+        name: SheetIndex(name, columns, data, find_trade_id_column(columns), digests)
+        for name, (columns, data, digests) in stored.items()
+    }
+
+
+def diff_sheets(previous, current, from_hash, to_hash):
+    """
+    Row-level diff of two workbook versions, keyed by tradeId per sheet.
+    Returns {"from_hash", "to_hash", "detected_at", "sheets": {name: {"added", "removed", "changed"}}}.
+    """
+    sheets = {}
+    for name in sorted(set(previous) | set(current)):
+        old = previous[name].trade_versions() if name in previous else {}
+        new = current[name].trade_versions() if name in current else {}
+        sheets[name] = {
+            "added": sorted(trade_id for trade_id in new if trade_id not in old),
+            "removed": sorted(trade_id for trade_id in old if trade_id not in new),
+            "changed": sorted(trade_id for trade_id in new if trade_id in old and new[trade_id] != old[trade_id])
+        }
+    return {
+        "from_hash": from_hash,
+        "to_hash": to_hash,
+        "detected_at": datetime.now().isoformat(),
+        "sheets": sheets
+    }
+
+
+def affected_trade_ids(diff):
+    """{sheet: sorted tradeIds that were added, removed or changed}"""
+    return {
+        name: sorted(set(changes["added"]) | set(changes["removed"]) | set(changes["changed"]))
+        for name, changes in diff["sheets"].items()
+    }
+
+
+class ReferenceData:
+    """
+    Shared in-memory index of the risk system workbook.
+
+    The workbook is parsed once and re-parsed only when its mtime or size
+    changes. Parsing streams the sheets with openpyxl in read-only mode and
+    keeps only tradeId plus the registered SHEET_FIELDS, packed into typed
+    arrays as rows are read (see streaming_loader). A reload builds a complete
+    new snapshot before swapping it in, so readers always see either the old
+    or the new index, never a partial one.
+
+    The first parse of a workbook version also writes a columnar snapshot next
+    to it (see reference_snapshot). Other processes memory-map that snapshot
+    instead of parsing the .xlsx again, as long as the content hash matches.
+
+    When the content changes, the new version is diffed against the previous
+    one row by row and the diff is passed to every registered listener.
+    """
+
+    def __init__(self, risk_file, sheet_names=None, use_snapshot=True, sheet_fields=None):
+        self.risk_file = risk_file
+        self.sheet_names = sheet_names or RISK_SHEETS
+        self.use_snapshot = use_snapshot
+        self._sheet_fields = sheet_fields
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """Registers listener(diff), called after a changed workbook is swapped in"""
+        self._listeners.append(listener)
+
+    def _file_signature(self):
+        stat = os.stat(self.risk_file)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def sheet_fields(self):
+        """{sheet: fields to load, or None for every column}"""
+        fields = self._sheet_fields if self._sheet_fields is not None else SHEET_FIELDS
+        return {name: fields.get(name) for name in self.sheet_names}
+
+    def _parse_workbook(self, sheet_fields):
+        print(f"Parsing risk workbook: {self.risk_file}")
+        sheets = load_sheets(self.risk_file, self.sheet_names, sheet_fields, find_trade_id_column)
+        for name, (columns, _) in sheets.items():
+            if find_trade_id_column(columns) is None:
+                print(f"Couldn't find tradeId column in {name}. Available columns: {columns}")
+        return sheets
+
+    def _previous_sheets(self, content_hash, sheet_fields):
+        """Sheets of the last known workbook version, from memory or from disk"""
+        current = self._snapshot
+        if current is not None:
+            return current.content_hash, current.sheets
+        for previous_hash in list_snapshots(self.risk_file):
+            if previous_hash != content_hash:
+                stored = read_snapshot(self.risk_file, previous_hash, sheet_fields)
+                if stored is not None:
+                    return previous_hash, index_stored_sheets(stored)
+        return None, None
+
+    def _load(self, signature):
+        content_hash = file_content_hash(self.risk_file) if self.use_snapshot else None
+
+        # Touched but unchanged workbook: keep the current index
+        current = self._snapshot
+        if content_hash is not None and current is not None and current.content_hash == content_hash:
+            return ReferenceSnapshot(signature, content_hash, current.sheets)
+
+        sheet_fields = self.sheet_fields()
+
+        # Read the previous version before a new snapshot replaces it on disk
+        previous_hash, previous_sheets = self._previous_sheets(content_hash, sheet_fields)
+
+        stored = read_snapshot(self.risk_file, content_hash, sheet_fields) if content_hash else None
+        if stored is None:
+            parsed = self._parse_workbook(sheet_fields)
+            if content_hash is not None:
+                try:
+                    write_snapshot(self.risk_file, content_hash, parsed, sheet_fields)
+                    stored = read_snapshot(self.risk_file, content_hash, sheet_fields)
+                except OSError as e:
+                    print(f"Could not write risk workbook snapshot: {e}")
+            if stored is None:
+                sheets = {name: build_sheet_index(name, columns, data) for name, (columns, data) in parsed.items()}
+            else:
+                sheets = index_stored_sheets(stored)
+        else:
+            print(f"Loaded risk workbook snapshot: {content_hash[:12]}")
+            sheets = index_stored_sheets(stored)
+
+        # A change this process saw happen is always handled. One found on
+        # disk (a previous snapshot or another process's diff) is handled
+        # only if no process has yet, so a restart does not revalidate again.
+        diff = None
+        notify = False
+        if previous_sheets is not None:
+            diff = diff_sheets(previous_sheets, sheets, previous_hash, content_hash)
+            notify = current is not None
+            if content_hash is not None:
+                try:
+                    write_diff(self.risk_file, diff)
+                except OSError as e:
+                    print(f"Could not write risk workbook diff: {e}")
+        elif content_hash is not None:
+            stored_diff = read_diff(self.risk_file)
+            if stored_diff is not None and stored_diff.get("to_hash") == content_hash:
+                diff = stored_diff
+        if diff is not None and content_hash is not None:
+            try:
+                notify = claim_diff(self.risk_file, content_hash) or notify
+            except OSError as e:
+                print(f"Could not mark risk workbook diff as handled: {e}")
+
+        return ReferenceSnapshot(signature, content_hash, sheets, diff, notify)
+
+    def snapshot(self):
+        signature = self._file_signature()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+
+        changed = None
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.signature != signature:
+                snapshot = self._load(signature)
+                self._snapshot = snapshot
+                changed = snapshot.diff if snapshot.notify else None
+
+        # Listeners may be slow (revalidation), so they run outside the lock
+        if changed is not None:
+            for listener in self._listeners:
+                try:
+                    listener(changed)
+                except Exception as e:
+                    print(f"Error in reference data listener: {e}")
+        return snapshot
+
+    def last_diff(self):
+        """The most recent workbook diff seen by this process or stored on disk"""
+        snapshot = self.snapshot()
+        if snapshot.diff is not None:
+            return snapshot.diff
+        return read_diff(self.risk_file) if self.use_snapshot else None
+
+    def sheet(self, sheet_name):
+        return self.snapshot().sheets.get(sheet_name)
+
+    def lookup(self, sheet_name, trade_id):
+        sheet = self.sheet(sheet_name)
+        if sheet is None:
+            return None
+        return sheet.lookup(trade_id)
+
+
+_reference_data = {}
+_registry_lock = threading.Lock()
+
+
+def get_reference_data(risk_file):
+    """Returns the process-wide ReferenceData for a workbook path"""
+    key = os.path.abspath(risk_file)
+    reference_data = _reference_data.get(key)
+    if reference_data is None:
+        with _registry_lock:
+            reference_data = _reference_data.get(key)
+            if reference_data is None:
+                reference_data = ReferenceData(risk_file)
+                _reference_data[key] = reference_data
+    return reference_data
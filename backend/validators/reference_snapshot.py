@@ -0,0 +1,299 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Bump when the on-disk layout changes so stale snapshots are rebuilt
+SNAPSHOT_FORMAT = 3
+
+# Diff between the two most recent workbook versions, kept next to the snapshots
+DIFF_FILE = "last_diff.json"
+
+# Marker of a workbook version whose diff the listeners have handled
+HANDLED_PREFIX = "handled-"
+
+# Per-value type tags for object columns
+KIND_NULL = 0
+KIND_STR = 1
+KIND_INT = 2
+KIND_FLOAT = 3
+KIND_BOOL = 4
+KIND_TIMESTAMP = 5
+KIND_OTHER = 6
+
+
+def snapshot_root(risk_file):
+    """Snapshots live next to the workbook, e.g. risk_system.xlsx.snapshot/"""
+    return f"{risk_file}.snapshot"
+
+
+def file_content_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class NativeColumn:
+    """A numeric, boolean or datetime column stored as a plain NumPy array"""
+
+    def __init__(self, values):
+        self.values = values
+        self._is_datetime = values.dtype.kind == "M"
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, pos):
+        value = self.values[pos]
+        if self._is_datetime:
+            return pd.Timestamp(value)
+        return value.item()
+
+    def __iter__(self):
+        if self._is_datetime:
+            return iter(pd.Series(self.values).tolist())
+        return iter(self.values.tolist())
+
+
+class EncodedColumn:
+    """An object column stored as a type-tag array plus a text array"""
+
+    def __init__(self, kinds, text):
+        self.kinds = kinds
+        self.text = text
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, pos):
+        return decode_value(int(self.kinds[pos]), str(self.text[pos]))
+
+    def __iter__(self):
+        if len(self.kinds) and bool((self.kinds == KIND_STR).all()):
+            return iter(self.text.tolist())
+        return (decode_value(int(kind), str(text)) for kind, text in zip(self.kinds, self.text))
+
+
+def encode_value(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NaT:
+        return KIND_NULL, ""
+    if isinstance(value, str):
+        return KIND_STR, value
+    if isinstance(value, (bool, np.bool_)):
+        return KIND_BOOL, "1" if value else "0"
+    if isinstance(value, (int, np.integer)):
+        return KIND_INT, str(int(value))
+    if isinstance(value, (float, np.floating)):
+        return KIND_FLOAT, repr(float(value))
+    if isinstance(value, pd.Timestamp):
+        return KIND_TIMESTAMP, value.isoformat()
+    # Anything else only ever takes part in comparisons through str()
+    return KIND_OTHER, str(value)
+
+
+def decode_value(kind, text):
+    if kind == KIND_STR or kind == KIND_OTHER:
+        return text
+    if kind == KIND_NULL:
+        return float("nan")
+    if kind == KIND_INT:
+        return int(text)
+    if kind == KIND_FLOAT:
+        return float(text)
+    if kind == KIND_BOOL:
+        return text == "1"
+    if kind == KIND_TIMESTAMP:
+        return pd.Timestamp(text)
+    return text
+
+
+def row_digests(columns, data):
+    """A 16-byte digest per row, so changed rows can be found without comparing values"""
+    rows = len(data[columns[0]]) if columns else 0
+    digests = np.empty(rows, dtype="S16")
+    names = [str(col) for col in columns]
+    for pos, row in enumerate(zip(*(iter(data[col]) for col in columns))):
+        canonical = repr([(col,) + encode_value(value) for col, value in zip(names, row)])
+        digests[pos] = hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
+    return digests
+
+
+def column_arrays(column):
+    """Returns {file suffix: ndarray} for a NativeColumn or EncodedColumn"""
+    if isinstance(column, NativeColumn):
+        return {"values": column.values}
+    return {"kinds": column.kinds, "text": column.text}
+
+
+def covers(stored_fields, fields):
+    """Whether a sheet stored with stored_fields (None = every column) has all of fields"""
+    if stored_fields is None:
+        return True
+    if fields is None:
+        return False
+    return {str(field).lower() for field in fields} <= {str(field).lower() for field in stored_fields}
+
+
+def write_snapshot(risk_file, content_hash, sheets, sheet_fields=None):
+    """
+    Writes the parsed sheets ({sheet: (columns, data)}) as .npy column files
+    under <risk_file>.snapshot/<content_hash>/. The directory is built under a
+    temporary name and renamed into place, so readers never see a partial one.
+    """
+    sheet_fields = sheet_fields or {}
+    root = snapshot_root(risk_file)
+    os.makedirs(root, exist_ok=True)
+    target = os.path.join(root, content_hash)
+    tmp_dir = os.path.join(root, f".{content_hash}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest = {"format": SNAPSHOT_FORMAT, "content_hash": content_hash, "sheets": {}}
+    for sheet_index, (name, (sheet_columns, data)) in enumerate(sheets.items()):
+        columns = []
+        for col_index, col in enumerate(sheet_columns):
+            files = {}
+            for suffix, array in column_arrays(data[col]).items():
+                filename = f"s{sheet_index}_c{col_index}_{suffix}.npy"
+                np.save(os.path.join(tmp_dir, filename), array, allow_pickle=False)
+                files[suffix] = filename
+            columns.append({"name": col, "files": files})
+        digests_file = f"s{sheet_index}_digests.npy"
+        np.save(os.path.join(tmp_dir, digests_file), row_digests(sheet_columns, data), allow_pickle=False)
+        fields = sheet_fields.get(name)
+        manifest["sheets"][name] = {
+            "rows": len(data[sheet_columns[0]]) if sheet_columns else 0,
+            "fields": sorted(fields) if fields is not None else None,
+            "columns": columns,
+            "digests": digests_file
+        }
+
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    try:
+        os.rename(tmp_dir, target)
+    except OSError:
+        if read_snapshot(risk_file, content_hash, sheet_fields) is None:
+            # A snapshot in an older format or with fewer columns is in the way: replace it
+            shutil.rmtree(target, ignore_errors=True)
+            os.rename(tmp_dir, target)
+        else:
+            # Another worker published the same snapshot first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    prune_snapshots(risk_file, content_hash)
+    return target
+
+
+def prune_snapshots(risk_file, content_hash):
+    """
+    Drops what belongs to older workbook versions: their snapshots, their
+    handled markers and a diff to any version but content_hash. A workbook
+    reverted to an earlier version is then handled again.
+    """
+    root = snapshot_root(risk_file)
+    for entry in list_snapshots(risk_file):
+        if entry != content_hash:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+    for entry in os.listdir(root):
+        if entry.startswith(HANDLED_PREFIX) and entry != f"{HANDLED_PREFIX}{content_hash}":
+            try:
+                os.remove(os.path.join(root, entry))
+            except FileNotFoundError:
+                pass
+
+    try:
+        diff = read_diff(risk_file)
+    except ValueError:
+        diff = None
+    if diff is None or diff.get("to_hash") != content_hash:
+        try:
+            os.remove(os.path.join(root, DIFF_FILE))
+        except FileNotFoundError:
+            pass
+
+
+def list_snapshots(risk_file):
+    """Content hashes of the snapshots currently on disk"""
+    root = snapshot_root(risk_file)
+    if not os.path.isdir(root):
+        return []
+    return [
+        entry for entry in os.listdir(root)
+        if not entry.startswith(".") and os.path.isdir(os.path.join(root, entry))
+    ]
+
+
+def read_snapshot(risk_file, content_hash, sheet_fields=None):
+    """
+    Memory-maps the snapshot for a workbook version. Returns
+    {sheet: (columns, data, digests)} or None when no usable snapshot exists,
+    including one written with fewer columns than sheet_fields asks for.
+    """
+    snapshot_dir = os.path.join(snapshot_root(risk_file), content_hash)
+    manifest_path = os.path.join(snapshot_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("content_hash") != content_hash:
+        return None
+    sheet_fields = sheet_fields or {}
+    if not all(covers(sheet.get("fields"), sheet_fields.get(name)) for name, sheet in manifest["sheets"].items()):
+        return None
+
+    sheets = {}
+    for name, sheet in manifest["sheets"].items():
+        columns = []
+        data = {}
+        for column in sheet["columns"]:
+            arrays = {
+                suffix: np.load(os.path.join(snapshot_dir, filename), mmap_mode="r", allow_pickle=False)
+                for suffix, filename in column["files"].items()
+            }
+            col = column["name"]
+            columns.append(col)
+            if "values" in arrays:
+                data[col] = NativeColumn(arrays["values"])
+            else:
+                data[col] = EncodedColumn(arrays["kinds"], arrays["text"])
+        digests = np.load(os.path.join(snapshot_dir, sheet["digests"]), mmap_mode="r", allow_pickle=False)
+        sheets[name] = (columns, data, digests)
+    return sheets
+
+
+def write_diff(risk_file, diff):
+    path = os.path.join(snapshot_root(risk_file), DIFF_FILE)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(diff, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_diff(risk_file):
+    path = os.path.join(snapshot_root(risk_file), DIFF_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def claim_diff(risk_file, to_hash):
+    """
+    Marks the diff to a workbook version as handled; True only for the first
+    caller, in any process, so a change is revalidated once
+    """
+    path = os.path.join(snapshot_root(risk_file), f"{HANDLED_PREFIX}{to_hash}")
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    os.close(fd)
+    return True
@@ -0,0 +1,174 @@
+import copy
+import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from validators.reference_data import get_reference_data, normalize_trade_id
+
+CACHE_MAX_ENTRIES = 10000
+CACHE_TTL_SECONDS = 300
+
+# Only final answers are cached; 400s are cheap and 500s should be retried.
+# A 404 is final only when the workbook was read and the trade is not in it.
+CACHEABLE_STATUSES = (200, 404)
+MISSING_TRADE_VERSIONS = ("no-sheet", "no-row")
+
+
+def payload_hash(swap):
+    """Canonical hash of a swap payload: key order and whitespace do not matter"""
+    canonical = json.dumps(swap, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ValidationCache:
+    """
+    Bounded LRU cache of validation results with a TTL.
+
+    Keys include the version (row digest) of the reference row a result was
+    computed against, so an edited row can never serve a stale result. Entries
+    are also dropped eagerly when a workbook diff reports the trade changed.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._by_trade = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, trade_key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, trade_key)
+            self._by_trade.setdefault(trade_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, trade_key = self._entries.pop(key)
+        keys = self._by_trade.get(trade_key)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_trade[trade_key]
+
+    def invalidate_trade(self, sheet_name, trade_id):
+        with self._lock:
+            keys = self._by_trade.get((sheet_name, normalize_trade_id(trade_id).lower()), set())
+            for key in list(keys):
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_diff(self, diff):
+        """Reference data listener: drops results for every trade the diff touched"""
+        for sheet_name, changes in diff["sheets"].items():
+            for trade_id in changes["added"] + changes["removed"] + changes["changed"]:
+                self.invalidate_trade(sheet_name, trade_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_trade.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+
+VALIDATION_CACHE = ValidationCache()
+
+_listening = set()
+_listening_lock = threading.Lock()
+
+
+def _reference_row_version(risk_file, sheet_name, trade_id):
+    reference_data = get_reference_data(risk_file)
+    with _listening_lock:
+        if risk_file not in _listening:
+            reference_data.add_listener(VALIDATION_CACHE.invalidate_diff)
+            _listening.add(risk_file)
+
+    sheet = reference_data.sheet(sheet_name)
+    if sheet is None:
+        return "no-sheet"
+    pos = sheet.find(trade_id)
+    if pos is None:
+        return "no-row"
+    return sheet.row_version(pos)
+
+
+def cached_validation(reference):
+    """
+    Caches a validate_*_against_risk_file function. `reference` returns the
+    (risk_file, sheet_name) the validator looks trades up in, read at call
+    time so a changed RISK_FILE is honoured.
+    """
+    def decorator(validate):
+        @wraps(validate)
+        def wrapper(current_swap):
+            trade_id_field = next((field for field in current_swap if field.lower() == "tradeid"), None)
+            trade_id = current_swap.get(trade_id_field) if trade_id_field is not None else None
+            if not trade_id:
+                return validate(current_swap)
+
+            risk_file, sheet_name = reference()
+            try:
+                version = _reference_row_version(risk_file, sheet_name, trade_id)
+            except Exception as e:
+                # No readable workbook to compare against (missing, corrupt or
+                # mid-write): nothing is cached and the validator reports it
+                print(f"Not caching validation of {trade_id}: {e}")
+                return validate(current_swap)
+
+            key = (validate.__qualname__, risk_file, sheet_name, version, payload_hash(current_swap))
+            cached = VALIDATION_CACHE.get(key)
+            if cached is not None:
+                result, status = cached
+                return copy.deepcopy(result), status
+
+            result, status = validate(current_swap)
+            if status in CACHEABLE_STATUSES and (status != 404 or version in MISSING_TRADE_VERSIONS):
+                trade_key = (sheet_name, normalize_trade_id(trade_id).lower())
+                VALIDATION_CACHE.put(key, (copy.deepcopy(result), status), trade_key)
+            return result, status
+
+        wrapper.uncached = validate
+        return wrapper
+    return decorator
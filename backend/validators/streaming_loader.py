@@ -0,0 +1,275 @@
+import math
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from validators.reference_snapshot import (
+    KIND_BOOL,
+    KIND_FLOAT,
+    KIND_INT,
+    KIND_NULL,
+    KIND_OTHER,
+    KIND_STR,
+    KIND_TIMESTAMP,
+    EncodedColumn,
+    NativeColumn
+)
+
+try:
+    from pandas._libs.parsers import STR_NA_VALUES
+except ImportError:
+    STR_NA_VALUES = {
+        "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+        "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"
+    }
+
+# Rows buffered as Python values before they are packed into arrays
+CHUNK_ROWS = 10000
+
+NUMERIC_KINDS = {KIND_INT, KIND_FLOAT, KIND_BOOL}
+
+
+def encode_cell(value):
+    """
+    (kind, text) for a raw openpyxl value, converted the way pandas.read_excel
+    converts cells: whole floats become ints and NA strings become blanks.
+    """
+    if value is None:
+        return KIND_NULL, ""
+    if isinstance(value, str):
+        if value in STR_NA_VALUES:
+            return KIND_NULL, ""
+        return KIND_STR, value
+    if isinstance(value, bool):
+        return KIND_BOOL, "1" if value else "0"
+    if isinstance(value, int):
+        return KIND_INT, str(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return KIND_NULL, ""
+        if value.is_integer():
+            return KIND_INT, str(int(value))
+        return KIND_FLOAT, repr(value)
+    if isinstance(value, datetime):
+        return KIND_TIMESTAMP, value.isoformat()
+    return KIND_OTHER, str(value)
+
+
+def header_names(header):
+    """Column names as read_excel gives them: blanks become "Unnamed: n", repeats get .1, .2"""
+    names = []
+    seen = {}
+    for pos, value in enumerate(header):
+        name = f"Unnamed: {pos}" if value is None else value
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(name if count == 0 else f"{name}.{count}")
+    return names
+
+
+class ColumnBuilder:
+    """Accumulates one column as (kinds, text) array chunks while the sheet streams by"""
+
+    def __init__(self):
+        self.kinds = []
+        self.text = []
+        self._chunks = []
+
+    def append(self, value):
+        kind, text = encode_cell(value)
+        self.kinds.append(kind)
+        self.text.append(text)
+
+    def append_nulls(self, count):
+        self.kinds.extend([KIND_NULL] * count)
+        self.text.extend([""] * count)
+
+    def flush(self):
+        if self.kinds:
+            self._chunks.append((np.array(self.kinds, dtype=np.uint8), np.array(self.text, dtype=str)))
+            self.kinds = []
+            self.text = []
+
+    def finish(self):
+        """Packs the column into the narrowest NativeColumn/EncodedColumn read_excel would agree with"""
+        self.flush()
+        if not self._chunks:
+            return NativeColumn(np.empty(0, dtype=np.float64))
+        kinds = np.concatenate([chunk[0] for chunk in self._chunks])
+        text = np.concatenate([chunk[1] for chunk in self._chunks])
+        self._chunks = []
+        if text.dtype.kind != "U":
+            text = text.astype("U1")
+        return infer_column(kinds, text)
+
+
+def _as_numbers(kinds, text, present):
+    """Numeric values of a column whose cells are all numbers or numeric strings, else None"""
+    numbers = np.full(len(kinds), np.nan)
+    for kind in present:
+        mask = kinds == kind
+        if kind == KIND_BOOL:
+            numbers[mask] = text[mask] == "1"
+            continue
+        try:
+            numbers[mask] = text[mask].astype(np.float64)
+        except ValueError:
+            return None
+    return numbers
+
+
+def _int_literals(kinds, text, present):
+    """Numeric strings only give an int column when written as integers ("1e3" stays a float)"""
+    if KIND_STR not in present:
+        return True
+    try:
+        text[kinds == KIND_STR].astype(np.int64)
+    except (ValueError, OverflowError):
+        return False
+    return True
+
+
+def _first_seen_bools(kinds, text):
+    """
+    read_excel builds an object column through a hash table in which True
+    equals 1 and False equals 0, so each such cell takes the type (bool or
+    int) of the first of them in the column; kinds is updated to match
+    """
+    numeric = (kinds == KIND_BOOL) | (kinds == KIND_INT)
+    for value in ("0", "1"):
+        mask = numeric & (text == value)
+        positions = np.flatnonzero(mask)
+        if len(positions):
+            kinds[mask] = kinds[positions[0]]
+    return kinds
+
+
+def infer_column(kinds, text):
+    """
+    Applies read_excel's column typing: all-number columns become int64 (no
+    blanks) or float64, date columns become datetime64 with NaT for blanks and
+    anything mixed keeps each cell's own type, bools included.
+    """
+    present = set(np.unique(kinds).tolist())
+    has_null = KIND_NULL in present
+    present.discard(KIND_NULL)
+
+    if not present:
+        return NativeColumn(np.full(len(kinds), np.nan))
+
+    if present == {KIND_TIMESTAMP}:
+        values = np.full(len(kinds), np.datetime64("NaT"), dtype="datetime64[us]")
+        mask = kinds == KIND_TIMESTAMP
+        values[mask] = text[mask].astype("datetime64[us]")
+        return NativeColumn(values)
+
+    if present == {KIND_BOOL} and not has_null:
+        return NativeColumn(text == "1")
+
+    if present <= NUMERIC_KINDS | {KIND_STR}:
+        if present == {KIND_INT} and not has_null:
+            try:
+                return NativeColumn(text.astype(np.int64))
+            except OverflowError:
+                pass
+        numbers = _as_numbers(kinds, text, present)
+        if numbers is not None:
+            if not has_null and np.all(numbers == np.trunc(numbers)) and _int_literals(kinds, text, present):
+                return NativeColumn(numbers.astype(np.int64))
+            return NativeColumn(numbers)
+
+    if KIND_BOOL in present and KIND_INT in present:
+        kinds = _first_seen_bools(kinds, text)
+    return EncodedColumn(kinds, text)
+
+
+def trade_id_column(column):
+    """The tradeId column as stripped strings, like astype(str).str.strip() used to give"""
+    text = np.array([str(value).strip() for value in column], dtype=str)
+    if text.dtype.kind != "U":
+        text = text.astype("U1")
+    return EncodedColumn(np.full(len(text), KIND_STR, dtype=np.uint8), text)
+
+
+def stream_sheet(worksheet, fields=None, trade_id_finder=None, chunk_rows=CHUNK_ROWS):
+    """
+    Reads a read-only worksheet row by row, keeping only the tradeId column
+    and the given fields (matched case-insensitively; None keeps every column).
+    Returns (columns, data) with data values being NativeColumn/EncodedColumn.
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return [], {}
+
+    names = header_names(header)
+    trade_id_col = trade_id_finder(names) if trade_id_finder else None
+    wanted = None if fields is None else {str(field).lower() for field in fields}
+    selected = [
+        (pos, name) for pos, name in enumerate(names)
+        if wanted is None or name == trade_id_col or str(name).lower() in wanted
+    ]
+    builders = {name: ColumnBuilder() for _, name in selected}
+
+    row_count = 0
+    buffered = 0
+    blank_run = 0
+    for row in rows:
+        if all(value is None for value in row):
+            # Trailing blank rows are dropped; blank rows between data are kept
+            blank_run += 1
+            continue
+        if blank_run:
+            for builder in builders.values():
+                builder.append_nulls(blank_run)
+            row_count += blank_run
+            buffered += blank_run
+            blank_run = 0
+
+        width = len(row)
+        if width > len(names) and wanted is None:
+            # Data past the last header cell gets an unnamed column, blank in earlier rows
+            for pos in range(len(names), width):
+                name = f"Unnamed: {pos}"
+                names.append(name)
+                selected.append((pos, name))
+                builders[name] = ColumnBuilder()
+                builders[name].append_nulls(row_count)
+        for pos, name in selected:
+            builders[name].append(row[pos] if pos < width else None)
+        row_count += 1
+        buffered += 1
+
+        if buffered >= chunk_rows:
+            for builder in builders.values():
+                builder.flush()
+            buffered = 0
+
+    columns = [name for _, name in selected]
+    data = {name: builders.pop(name).finish() for name in columns}
+    if trade_id_col is not None:
+        data[trade_id_col] = trade_id_column(data[trade_id_col])
+    return columns, data
+
+
+def load_sheets(path, sheet_names, sheet_fields=None, trade_id_finder=None, chunk_rows=CHUNK_ROWS):
+    """
+    Streams the requested sheets of a workbook with openpyxl in read-only mode.
+    Returns {sheet: (columns, data)}; sheets missing from the workbook are skipped.
+    """
+    sheet_fields = sheet_fields or {}
+    sheets = {}
+    workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        for name in sheet_names:
+            if name not in workbook.sheetnames:
+                print(f"Sheet {name} not found in {path}")
+                continue
+            worksheet = workbook[name]
+            # The stored dimensions can be wrong; let openpyxl find the real extent
+            worksheet.reset_dimensions()
+            sheets[name] = stream_sheet(worksheet, sheet_fields.get(name), trade_id_finder, chunk_rows)
+    finally:
+        workbook.close()
+    return sheets
+
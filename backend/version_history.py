@@ -0,0 +1,134 @@
+# backend/version_history.py
+#
+# Version storage for the trade folders of a metadata tree. A version file
+# (versions/v<N>_*.json) holds a JSON patch against the version it was built
+# on, and a full copy (checkpoint) starts a new chain every
+# CHECKPOINT_INTERVAL versions, so rebuilding any version reads at most
+# CHECKPOINT_INTERVAL files. extracted_terms.json keeps the latest terms in
+# full and changes.jsonl gets one line per version with what it added,
+# removed and modified. Version files from before this layout are full
+# copies and read as checkpoints.
+#
+# Files are written through json_store: save() returns once they are queued,
+# and the VersionIndex lists a version once its file is on disk.
+
+import os
+from datetime import datetime
+import json_store
+from json_patch import apply_patch, make_patch
+from version_index import data_sha256
+
+CHECKPOINT_INTERVAL = 10
+TERMS_FILE = "extracted_terms.json"
+CHANGES_FILE = "changes.jsonl"
+
+
+def diff_terms(old, new):
+    """{"added", "removed", "modified"} between two sets of terms, as changes.json had it"""
+    differences = {"added": {}, "removed": {}, "modified": {}}
+    for key, value in old.items():
+        if key in new:
+            if value != new[key]:
+                differences["modified"][key] = {"old": value, "new": new[key]}
+        else:
+            differences["removed"][key] = value
+    for key, value in new.items():
+        if key not in old:
+            differences["added"][key] = value
+    return differences
+
+
+class VersionHistory:
+    """
+    Saves and rebuilds the versions of the trades under metadata_dir.
+    versions is the tree's VersionIndex, which numbers versions and finds
+    their files. source_field names what a version came from in its files
+    ("filename" for PDFs, "subject" for emails).
+    """
+
+    def __init__(self, metadata_dir, versions, source_field, checkpoint_interval=CHECKPOINT_INTERVAL, store=None):
+        self.metadata_dir = metadata_dir
+        self.versions = versions
+        self.store = store or json_store.store
+        self.source_field = source_field
+        self.checkpoint_interval = checkpoint_interval
+
+    def _trade_folder(self, trade_id):
+        trade_folder = os.path.join(self.metadata_dir, trade_id)
+        os.makedirs(os.path.join(trade_folder, "versions"), exist_ok=True)
+        return trade_folder
+
+    def _can_patch(self, trade_id, previous):
+        """Whether the next version may be a patch on previous rather than a checkpoint"""
+        if previous.get("depth", 0) + 1 >= self.checkpoint_interval:
+            return False
+        # Terms written here always have a version file of their own. Older
+        # terms need one too: a tree indexed from extracted_terms.json alone
+        # is about to overwrite it.
+        if "depth" in previous:
+            return True
+        base = self.versions.get(trade_id, previous["version"])
+        return base is not None and os.path.basename(base["path"]) != TERMS_FILE
+
+    def save(self, trade_id, data, source, version_name):
+        """
+        Writes data as the next version of trade_id, its file named
+        v<N>_<version_name>. Returns ("created" or "updated", N).
+        """
+        trade_folder = self._trade_folder(trade_id)
+        version = self.versions.allocate(trade_id)
+        timestamp = datetime.now().isoformat()
+
+        terms_file = os.path.join(trade_folder, TERMS_FILE)
+        version_file = os.path.join(trade_folder, "versions", f"v{version}_{version_name}")
+        previous = self.store.load(terms_file) if self.store.exists(terms_file) else None
+
+        version_info = {"version": version, "timestamp": timestamp, self.source_field: source}
+        if previous is not None and self._can_patch(trade_id, previous):
+            depth = previous.get("depth", 0) + 1
+            version_info.update(depth=depth, base=previous["version"], patch=make_patch(previous["data"], data))
+        else:
+            depth = 0
+            version_info.update(depth=depth, data=data)
+        # The index lists a version once its file is on disk
+        sha256 = data_sha256(data)
+        self.store.write(version_file, version_info, on_written=lambda: self.versions.record(
+            trade_id, version, timestamp, source, sha256, version_file))
+
+        if previous is not None:
+            change = {"version": version, "base": previous["version"], "timestamp": timestamp,
+                      self.source_field: source, **diff_terms(previous["data"], data)}
+            self.store.append(os.path.join(trade_folder, CHANGES_FILE), change)
+
+        self.store.write(terms_file, {"version": version, "timestamp": timestamp, self.source_field: source,
+                                      "depth": depth, "data": data})
+        return ("updated" if previous is not None else "created"), version
+
+    def version_data(self, trade_id, version):
+        """The terms of one version, rebuilt from its nearest checkpoint; None if unknown"""
+        patches = []
+        entry = self.versions.get(trade_id, version)
+        while entry is not None:
+            version_info = self.store.load(entry["path"])
+            if "data" in version_info:
+                data = version_info["data"]
+                for patch in reversed(patches):
+                    data = apply_patch(data, patch)
+                return data
+            patches.append(version_info["patch"])
+            entry = self.versions.get(trade_id, version_info["base"])
+        return None
+
+    def changes(self, trade_id, since=0, field=None):
+        """
+        The recorded diffs of a trade in version order, those after version
+        `since` only, and only those touching `field` when one is given
+        """
+        history = []
+        for change in self.store.load_lines(os.path.join(self.metadata_dir, trade_id, CHANGES_FILE)):
+            if change["version"] <= since:
+                continue
+            if field is not None and not any(field in change[kind] for kind in ("added", "removed", "modified")):
+                continue
+            history.append(change)
+        return history
@@ -0,0 +1,231 @@
+# backend/version_index.py
+#
+# SQLite index of the versions written under a metadata tree (metadata/ for
+# PDFs, email_metadata/ for emails). Allocating the next version number is
+# one atomic transaction, and latest / version-N lookups are primary-key
+# reads instead of listing and parsing versions/ on every ingest.
+#
+#   python version_index.py                  # rebuild both indexes from the trees
+#   python version_index.py email_metadata   # just one tree
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from json_patch import apply_patch
+
+INDEX_FILE = "versions.sqlite"
+VERSION_FILE_PATTERN = re.compile(r"^v(\d+)_.*\.json$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    trade_id TEXT PRIMARY KEY,
+    latest INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versions (
+    trade_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    source TEXT,
+    sha256 TEXT,
+    path TEXT NOT NULL,
+    PRIMARY KEY (trade_id, version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+VERSION_COLUMNS = "trade_id, version, timestamp, source, sha256, path"
+
+
+def data_sha256(data):
+    """Content hash of a version's extracted data, independent of key order"""
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class VersionIndex:
+    """
+    metadata_dir/versions.sqlite with one row per version:
+    (trade_id, version, timestamp, source, sha256, path), path relative to
+    metadata_dir. trades.latest is the last number handed out, so numbers
+    stay unique even if a save fails between allocate() and record().
+
+    A tree without an index (written before it existed) is indexed from its
+    version files the first time it is opened.
+    """
+
+    def __init__(self, metadata_dir):
+        self.metadata_dir = metadata_dir
+        self.path = os.path.join(metadata_dir, INDEX_FILE)
+        os.makedirs(metadata_dir, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+            # Readers do not block the single writer
+            conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'indexed_at'").fetchone() is None:
+                self._index_tree(conn)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """A write transaction; BEGIN IMMEDIATE takes the write lock up front"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _query(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _row(self, row):
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["path"] = os.path.join(self.metadata_dir, entry["path"])
+        return entry
+
+    def allocate(self, trade_id):
+        """Reserves and returns the next version number for a trade"""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO trades (trade_id, latest) VALUES (?, 1) "
+                "ON CONFLICT(trade_id) DO UPDATE SET latest = latest + 1",
+                (trade_id,)
+            )
+            return conn.execute("SELECT latest FROM trades WHERE trade_id = ?", (trade_id,)).fetchone()[0]
+
+    def record(self, trade_id, version, timestamp, source, sha256, path):
+        """Records a version once its files are written"""
+        with self._transaction() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO versions ({VERSION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                (trade_id, version, timestamp, source, sha256, os.path.relpath(path, self.metadata_dir))
+            )
+
+    def latest(self, trade_id):
+        rows = self._query(
+            f"SELECT {VERSION_COLUMNS} FROM versions WHERE trade_id = ? ORDER BY version DESC LIMIT 1", (trade_id,)
+        )
+        return self._row(rows[0] if rows else None)
+
+    def get(self, trade_id, version):
+        rows = self._query(
+            f"SELECT {VERSION_COLUMNS} FROM versions WHERE trade_id = ? AND version = ?", (trade_id, version)
+        )
+        return self._row(rows[0] if rows else None)
+
+    def history(self, trade_id):
+        rows = self._query(
+            f"SELECT {VERSION_COLUMNS} FROM versions WHERE trade_id = ? ORDER BY version", (trade_id,)
+        )
+        return [self._row(row) for row in rows]
+
+    def all_versions(self):
+        rows = self._query(f"SELECT {VERSION_COLUMNS} FROM versions ORDER BY trade_id, version")
+        return [self._row(row) for row in rows]
+
+    def rebuild(self):
+        """Drops the index and rebuilds it from the version files on disk"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM versions")
+            conn.execute("DELETE FROM trades")
+            return self._index_tree(conn)
+
+    def _index_tree(self, conn):
+        """Indexes <trade_id>/versions/v<N>_*.json under metadata_dir; returns the versions found"""
+        count = 0
+        for entry in os.scandir(self.metadata_dir):
+            if not entry.is_dir():
+                continue
+            rows = list(self._scan_trade(entry.name, entry.path))
+            conn.executemany(f"INSERT OR REPLACE INTO versions ({VERSION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            if rows:
+                conn.execute(
+                    "INSERT OR REPLACE INTO trades (trade_id, latest) VALUES (?, ?)",
+                    (entry.name, max(row[1] for row in rows))
+                )
+            count += len(rows)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('indexed_at', ?)", (datetime.now().isoformat(),)
+        )
+        if count:
+            print(f"Indexed {count} versions under {self.metadata_dir}")
+        return count
+
+    def _scan_trade(self, trade_id, trade_folder):
+        versions_folder = os.path.join(trade_folder, "versions")
+        files = {}
+        if os.path.isdir(versions_folder):
+            for name in os.listdir(versions_folder):
+                match = VERSION_FILE_PATTERN.match(name)
+                if match:
+                    version_info = self._load(os.path.join(versions_folder, name))
+                    if version_info is not None:
+                        files[int(match.group(1))] = (os.path.join(versions_folder, name), version_info)
+
+        # Trees written without per-version files still have the latest terms
+        terms_file = os.path.join(trade_folder, "extracted_terms.json")
+        if not files and os.path.exists(terms_file):
+            version_info = self._load(terms_file)
+            if version_info is not None:
+                files[version_info.get("version") or 1] = (terms_file, version_info)
+
+        # Patch versions (version_history) are hashed on their rebuilt terms
+        terms = {}
+        for version in sorted(files):
+            path, version_info = files[version]
+            if "data" in version_info:
+                terms[version] = version_info["data"]
+            elif version_info.get("base") in terms:
+                terms[version] = apply_patch(terms[version_info["base"]], version_info["patch"])
+            timestamp = version_info.get("timestamp") or datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+            source = version_info.get("filename") or version_info.get("subject")
+            sha256 = data_sha256(terms[version]) if version in terms else None
+            yield trade_id, version, timestamp, source, sha256, os.path.relpath(path, self.metadata_dir)
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {path}: {str(e)}")
+            return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the version index of metadata trees")
+    parser.add_argument("trees", nargs="*", default=["metadata", "email_metadata"])
+    args = parser.parse_args()
+
+    for tree in args.trees:
+        if not os.path.isdir(tree):
+            print(f"Skipping {tree}: directory not found")
+            continue
+        count = VersionIndex(tree).rebuild()
+        print(f"{tree}: {count} versions indexed")